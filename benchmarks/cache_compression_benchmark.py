@@ -0,0 +1,124 @@
+"""
+On-disk size and cache-hit latency of each cached result format
+
+Parses the saved Zoopla, Rightmove and OpenRent result pages in tests/fixtures
+the way the bots do, caches N pages of them through Database.cache_results
+with each format (plain JSON text as stored before, then every available
+codec and level), and reports the database size after VACUUM, the mean
+payload size, and write and cache-hit latency.
+
+Usage:
+    python benchmarks/cache_compression_benchmark.py [--pages N] [--lookups N]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import utils.database as database_module
+from scrapers.openrent import parse_openrent_html
+from scrapers.rightmove_scrape import parse_rightmove_dom
+from scrapers.zoopla import parse_zoopla_html
+from utils.database import Database
+from utils.listing import dumps
+from utils.logger import logger
+from utils.result_codec import ResultCodec, result_codec, zstandard
+
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+
+SEARCH = dict(min_price="", max_price="", min_beds="1", max_beds="3", keywords="", listing_type="sale")
+
+
+class PlainText(ResultCodec):
+    """JSON text, as cache_results stored it before compression"""
+
+    def encode(self, results):
+        return dumps(results).decode("utf-8")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def load_pages():
+    """(site, results) for each fixture page, shaped like the bots' results"""
+    # The scrapers print as they parse
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        listings, total_pages = parse_zoopla_html(fixture("zoopla_results.html"))
+        zoopla = {"listings": listings, "total_found": len(listings), "total_pages": total_pages, "current_page": 1}
+        rightmove = parse_rightmove_dom(fixture("rightmove_results.html"),
+                                        "https://www.rightmove.co.uk/property-for-sale/find.html")
+        openrent = parse_openrent_html(fixture("openrent_results.html"))
+    pages = [("Zoopla", zoopla), ("Rightmove", rightmove), ("OpenRent", openrent)]
+    for site, results in pages:
+        for listing in results["listings"]:
+            listing["source"] = site
+    return pages
+
+
+def run(codec, path, pages, count, lookups):
+    database_module.result_codec = codec
+    db = Database(path)
+
+    started = time.perf_counter()
+    for n in range(count):
+        site, results = pages[n % len(pages)]
+        db.cache_results(site=site, location=f"area{n}", page_number=1, results=results, **SEARCH)
+    write = (time.perf_counter() - started) / count
+
+    with sqlite3.connect(path, isolation_level=None) as conn:
+        payload = conn.execute("SELECT AVG(LENGTH(CAST(results AS BLOB))) FROM listings").fetchone()[0]
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    size = os.path.getsize(path)
+
+    timings = []
+    for _ in range(lookups):
+        n = random.randrange(count)
+        site = pages[n % len(pages)][0]
+        started = time.perf_counter()
+        assert db.get_cached_results(site=site, location=f"area{n}", page_number=1, **SEARCH)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return size, payload, write, statistics.median(timings), timings[int(len(timings) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000, help="cached pages per format")
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Time the database, not the log file
+    logger.setLevel(logging.ERROR)
+    pages = load_pages()
+
+    formats = [("text (before)", PlainText("none")), ("none", ResultCodec("none"))]
+    formats += [(f"zlib {level}", ResultCodec("zlib", level)) for level in (1, 6, 9)]
+    if zstandard is not None:
+        formats += [(f"zstd {level}", ResultCodec("zstd", level)) for level in (1, 3, 9, 19)]
+
+    print(f"{args.pages} pages of {', '.join(site for site, _ in pages)} results\n")
+    print(f"{'format':<14} {'db size':>9} {'payload':>9} {'write':>8} {'hit p50':>8} {'hit p95':>8}")
+    with tempfile.TemporaryDirectory() as scratch:
+        for n, (name, codec) in enumerate(formats):
+            random.seed(1)
+            size, payload, write, p50, p95 = run(codec, os.path.join(scratch, f"{n}.db"), pages, args.pages, args.lookups)
+            print(f"{name:<14} {size / 1024:7.0f}KB {payload / 1024:7.1f}KB {write * 1e6:6.0f}us "
+                  f"{p50 * 1e6:6.0f}us {p95 * 1e6:6.0f}us")
+    database_module.result_codec = result_codec
+
+
+if __name__ == "__main__":
+    main()
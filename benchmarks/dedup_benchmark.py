@@ -0,0 +1,167 @@
+"""
+Precision, recall and throughput of combined-results dedup
+
+Scores the exact DedupIndex and the FuzzyDedupIndex on:
+
+  * the labelled pairs in tests/fixtures/dedup_pairs.json
+  * a synthetic crawl: N listings on Rightmove, some of them relisted on
+    Zoopla the way the sites differ in practice (abbreviated street types,
+    house or flat numbers dropped, an extra area word, full postcode or a
+    sub-district, a small price change, weekly instead of monthly rent),
+    mixed with other homes on the same streets
+
+Every listing goes through scrapers.normalize first, as it does after a scrape.
+
+Usage:
+    python benchmarks/dedup_benchmark.py [--listings N] [--seed S]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from scrapers.normalize import normalize_listing
+from utils.dedup import DedupIndex, FuzzyDedupIndex
+
+STREET_NAMES = [
+    "High", "Church", "Station", "Victoria", "Park", "Mill", "Queens", "Kings", "Albert", "Manor",
+    "Oxford", "Clarendon", "Beech", "Oak", "Elm", "Chestnut", "Willow", "Grange", "Springfield", "Mount",
+    "Windsor", "York", "Cambridge", "Stanley", "Princess", "Canal", "Bridge", "Market", "Castle", "Abbey",
+    "Riverside", "Meadow", "Orchard", "Chapel", "School", "Hill", "North", "South", "West", "East"
+]
+STREET_TYPES = {"Street": "St", "Road": "Rd", "Avenue": "Ave", "Lane": "Ln", "Gardens": "Gdns", "Crescent": "Cres", "Close": "Cl"}
+AREAS = ["Didsbury", "Chorlton", "Withington", "Fallowfield", "Ancoats", "Hulme", "Salford Quays", "Levenshulme"]
+DISTRICTS = [f"M{n}" for n in range(1, 11)]  # one city's worth, so streets are shared
+TYPES = ["flat", "terraced house", "semi-detached house", "detached house"]
+
+
+def make_property(rng, group, rent):
+    street = f"{rng.choice(STREET_NAMES)} {rng.choice(list(STREET_TYPES))}"
+    kind = rng.choice(TYPES)
+    bedrooms = rng.randint(1, 2) if kind == "flat" else rng.randint(2, 5)
+    price = (rng.randrange(600, 3000, 25) if rent else rng.randrange(120_000, 900_000, 5_000))
+    return {
+        "group": group, "street": street, "number": rng.randint(1, 180),
+        "flat": rng.randint(1, 40) if kind == "flat" else None,
+        "district": rng.choice(DISTRICTS), "area": rng.choice(AREAS),
+        "kind": kind, "bedrooms": bedrooms, "price": price, "rent": rent
+    }
+
+
+def render(prop, source, rng, relisted=False):
+    street, price = prop["street"], prop["price"]
+    parts = []
+    show_number = rng.random() < (0.3 if relisted else 0.6)
+    if prop["flat"] and show_number:
+        parts.append(f"Flat {prop['flat']}")
+    if show_number:
+        parts.append(f"{prop['number']} {street}")
+    elif relisted and rng.random() < 0.5:
+        name, kind = street.rsplit(" ", 1)
+        parts.append(f"{name} {STREET_TYPES[kind]}")
+    else:
+        parts.append(street)
+    if rng.random() < (0.4 if relisted else 0.2):
+        parts.append(prop["area"])
+    postcode = prop["district"]
+    if relisted and rng.random() < 0.4:
+        postcode += f" {rng.randint(1, 9)}{rng.choice('ABDEFGHJLNPQRSTUWXYZ')}{rng.choice('ABDEFGHJLNPQRSTUWXYZ')}"
+    parts.append(f"Manchester {postcode}")
+
+    if relisted and rng.random() < 0.3:
+        price = round(price * rng.uniform(0.97, 1.0))
+    if prop["rent"]:
+        price_text = f"£{round(price * 12 / 52):,} pw" if relisted and rng.random() < 0.1 else f"£{price:,} pcm"
+        title = f"{prop['bedrooms']} bed {prop['kind']} to rent"
+    else:
+        price_text = f"£{price:,}"
+        title = f"{prop['bedrooms']} bedroom {prop['kind']} for sale"
+    listing = normalize_listing({
+        "title": title, "price": price_text, "address": ", ".join(parts),
+        "url": f"https://www.{source.lower()}.co.uk/{prop['group']}/{rng.random()}", "source": source
+    })
+    return listing
+
+
+def synthetic_crawl(count, seed):
+    """Rightmove and Zoopla listings with the group each belongs to"""
+    rng = random.Random(seed)
+    rightmove, zoopla, groups = [], [], {}
+    group = 0
+    while len(rightmove) + len(zoopla) < count:
+        prop = make_property(rng, group, rent=rng.random() < 0.5)
+        sites = rng.choices([("Rightmove",), ("Zoopla",), ("Rightmove", "Zoopla")], weights=[3, 3, 4])[0]
+        for site in sites:
+            listing = render(prop, site, rng, relisted=len(sites) == 2 and site == "Zoopla")
+            groups[id(listing)] = group
+            (rightmove if site == "Rightmove" else zoopla).append(listing)
+        group += 1
+    return rightmove, zoopla, groups
+
+
+def score(index_factory, rightmove, zoopla, groups):
+    """Precision and recall of the duplicates an index rejects, and its run time"""
+    listings = rightmove + zoopla
+    started = time.perf_counter()
+    index_factory().add_all(listings)
+    elapsed = time.perf_counter() - started
+
+    # Replay to see what each rejected listing was matched to (URLs are unique here)
+    index = index_factory()
+    accepted_groups = set()
+    true_duplicates = correct = predicted = 0
+    for listing in listings:
+        group = groups[id(listing)]
+        true_duplicates += group in accepted_groups
+        match = index.find_match(listing)
+        if match is not None:
+            predicted += 1
+            correct += groups[id(match)] == group
+            continue
+        index.add(listing)
+        accepted_groups.add(group)
+    precision = correct / predicted if predicted else 1.0
+    recall = correct / true_duplicates if true_duplicates else 1.0
+    return precision, recall, elapsed
+
+
+def score_pairs(pairs, index_factory):
+    tp = fp = fn = 0
+    for pair in pairs:
+        a = normalize_listing(dict(pair["a"], url="a"))
+        b = normalize_listing(dict(pair["b"], url="b"))
+        index = index_factory()
+        index.add(a)
+        found = index.is_duplicate(b)
+        tp += found and pair["duplicate"]
+        fp += found and not pair["duplicate"]
+        fn += not found and pair["duplicate"]
+    return tp / (tp + fp) if tp + fp else 1.0, tp / (tp + fn) if tp + fn else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=10000, help="listings in the synthetic crawl")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, "tests", "fixtures", "dedup_pairs.json"), encoding="utf-8") as f:
+        pairs = json.load(f)
+    rightmove, zoopla, groups = synthetic_crawl(args.listings, args.seed)
+
+    print(f"{'index':<10} {'pairs P':>8} {'pairs R':>8} {'crawl P':>8} {'crawl R':>8} {'time':>9} {'listings/s':>11}")
+    for name, factory in (("exact", DedupIndex), ("fuzzy", FuzzyDedupIndex)):
+        pair_precision, pair_recall = score_pairs(pairs, factory)
+        precision, recall, elapsed = score(factory, rightmove, zoopla, groups)
+        total = len(rightmove) + len(zoopla)
+        print(f"{name:<10} {pair_precision:8.2f} {pair_recall:8.2f} {precision:8.3f} {recall:8.3f} "
+              f"{elapsed * 1000:7.0f}ms {total / elapsed:11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Memory of a deep crawl held as dicts vs Listing records
+
+Parses the saved Rightmove results page over and over until it has N listings
+(a RightmoveBot.scrape_all_pages style crawl), keeps them all, then serializes
+them once as the API would. The "dict" mode turns every listing into the
+plain dict the pipeline used to carry and encodes with json; the "listing"
+mode keeps the slotted records and encodes with utils.listing.dumps. Each
+mode runs in its own process so peak RSS is not shared between them.
+
+Usage:
+    python benchmarks/listing_memory_benchmark.py [--listings N]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RIGHTMOVE_URL = "https://www.rightmove.co.uk/property-for-sale/find.html"
+
+
+def crawl(mode, count):
+    """Run one crawl in this process and print its measurements as JSON"""
+    logging.disable(logging.CRITICAL)
+    from scrapers.rightmove_scrape import parse_rightmove_html
+    from utils.listing import dumps
+
+    with open(os.path.join(ROOT, "tests", "fixtures", "rightmove_results.html"), encoding="utf-8") as f:
+        html = f.read()
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    listings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        page = 1
+        while len(listings) < count:
+            parsed = parse_rightmove_html(html, RIGHTMOVE_URL, page)["listings"]
+            if mode == "dict":
+                parsed = [listing.to_dict() for listing in parsed]
+            listings.extend(parsed)
+            page += 1
+    del listings[count:]
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    encoded = json.dumps({"listings": listings}).encode("utf-8") if mode == "dict" else dumps({"listings": listings})
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "held_mb": held / 2 ** 20,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "baseline_rss_mb": baseline_rss / 1024,
+        "json_kb": len(encoded) / 1024,
+        "seconds": elapsed
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=5000, help="listings to crawl")
+    parser.add_argument("--mode", choices=("dict", "listing"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        crawl(args.mode, args.listings)
+        return
+
+    print(f"{'mode':<8} {'listings held':>14} {'peak RSS':>10} {'RSS growth':>11} {'JSON':>9} {'time':>8}")
+    for mode in ("dict", "listing"):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode, "--listings", str(args.listings)],
+            capture_output=True, text=True, check=True, cwd=ROOT
+        ).stdout
+        stats = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<8} {stats['held_mb']:12.1f}MB {stats['peak_rss_mb']:8.1f}MB "
+              f"{stats['peak_rss_mb'] - stats['baseline_rss_mb']:9.1f}MB {stats['json_kb']:7.0f}KB {stats['seconds']:7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
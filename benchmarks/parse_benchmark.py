@@ -0,0 +1,109 @@
+"""
+Compare HTML parser backends on saved result pages
+
+Runs each scraper's DOM parser over the pages in tests/fixtures (or over the
+most recent pages in the raw page store) with every installed backend and
+reports the mean parse time per page, for full and partial (strained) parses.
+Peak Python heap use is shown for the BeautifulSoup backends; lexbor allocates
+outside the Python heap, so tracemalloc can't see it.
+
+Usage:
+    python benchmarks/parse_benchmark.py [--repeat N] [--from-store N]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapers import html_parser
+from scrapers.openrent import parse_openrent_html
+from scrapers.rightmove_scrape import parse_rightmove_dom
+from scrapers.zoopla import parse_zoopla_html
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures")
+
+PARSERS = {
+    "zoopla": lambda html: parse_zoopla_html(html),
+    "rightmove": lambda html: parse_rightmove_dom(html, "https://www.rightmove.co.uk/property-for-sale/find.html"),
+    "openrent": lambda html: parse_openrent_html(html)
+}
+
+
+def load_fixtures():
+    pages = []
+    for name in sorted(os.listdir(FIXTURES)):
+        site = name.split("_")[0]
+        if name.endswith(".html") and site in PARSERS:
+            with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+                pages.append((name, site, f.read()))
+    return pages
+
+
+def load_stored_pages(limit, db_path="listings.db"):
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("""
+            SELECT p.url, b.content FROM raw_pages p JOIN raw_blobs b ON b.content_hash = p.content_hash
+            ORDER BY p.fetched_at DESC LIMIT ?
+        """, (limit,)).fetchall()
+    pages = []
+    for url, content in rows:
+        site = next((s for s in PARSERS if s in url), None)
+        if site:
+            pages.append((url[:60], site, zlib.decompress(content).decode("utf-8")))
+    return pages
+
+
+def time_parse(site, html, backend, partial, repeat):
+    """Mean parse time in seconds and peak traced memory in bytes"""
+    html_parser.HTML_PARSER_BACKEND = backend
+    html_parser.PARTIAL_PARSE = partial
+    # The scrapers print and log as they go; keep that out of the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        PARSERS[site](html)  # warm up
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            PARSERS[site](html)
+        return (time.perf_counter() - started) / repeat, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="parses per page and backend")
+    parser.add_argument("--from-store", type=int, metavar="N", help="use the N newest pages from the raw page store")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    pages = load_stored_pages(args.from_store) if args.from_store else load_fixtures()
+    backends = [b for b in html_parser.BACKENDS if html_parser.resolve_backend(b) == b]
+    baseline = "html.parser"
+
+    print(f"{'page':<32} {'size':>8} {'mode':>8}  " + "  ".join(f"{b:>24}" for b in backends))
+    for name, site, html in pages:
+        timings = {
+            (b, partial): time_parse(site, html, b, partial, args.repeat)
+            for b in backends for partial in (False, True)
+        }
+        for partial in (False, True):
+            cells = []
+            for backend in backends:
+                seconds, peak = timings[(backend, partial)]
+                speedup = timings[(baseline, False)][0] / seconds
+                memory = f"{peak / 2 ** 20:5.1f}MB" if backend != "selectolax" else "      -"
+                cells.append(f"{seconds * 1000:7.1f}ms {speedup:5.1f}x {memory}")
+            mode = "partial" if partial else "full"
+            print(f"{name:<32} {len(html) // 1024:>6}KB {mode:>8}  " + "  ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
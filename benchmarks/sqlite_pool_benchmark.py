@@ -0,0 +1,138 @@
+"""
+Cache-hit latency and reader/writer throughput: per-call connections vs the pool
+
+Runs the real Database.get_cached_results / cache_results against a scratch
+database holding N cached pages, in two modes:
+
+  connect  a new sqlite3.connect() per call on a rollback-journal database
+           (how Database worked before utils.sqlite_pool)
+  pool     pooled WAL connections from utils.sqlite_pool
+
+For each mode it reports single-threaded cache-hit latency, then runs reader
+threads doing cache hits alongside writer threads caching new pages and
+reports the throughput of each and how many calls failed on a locked database.
+
+Usage:
+    python benchmarks/sqlite_pool_benchmark.py [--pages N] [--readers R] [--writers W] [--seconds S]
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import utils.database as database_module
+import utils.sqlite_pool as sqlite_pool_module
+from utils.database import Database
+from utils.logger import logger
+from utils.sqlite_pool import connection as pooled_connection
+
+SEARCH = dict(site="Zoopla", min_price="100000", max_price="500000", min_beds="1", max_beds="3",
+              keywords="", listing_type="sale")
+
+
+class ErrorCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+def page_results(n):
+    listings = [{"title": f"{n % 5 + 1} bed flat for sale", "price": f"£{200000 + i * 1000:,}",
+                 "address": f"{i} High Street, Manchester M{n % 20 + 1}", "url": f"https://www.zoopla.co.uk/{n}/{i}",
+                 "desc": "A well presented apartment close to the city centre " * 3, "source": "Zoopla"}
+                for i in range(25)]
+    return {"listings": listings, "total_found": 25, "total_pages": 10, "current_page": 1}
+
+
+def make_db(path, pages):
+    db = Database(path)
+    for n in range(pages):
+        db.cache_results(location=f"area{n}", page_number=1, results=page_results(n), **SEARCH)
+    return db
+
+
+def cache_hit_latency(db, pages, lookups):
+    timings = []
+    for _ in range(lookups):
+        location = f"area{random.randrange(pages)}"
+        started = time.perf_counter()
+        assert db.get_cached_results(location=location, page_number=1, **SEARCH)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95)]
+
+
+def mixed_load(db, pages, readers, writers, seconds):
+    stop = threading.Event()
+    counts = {"read": 0, "write": 0}
+    lock = threading.Lock()
+
+    def reader():
+        done = 0
+        while not stop.is_set():
+            db.get_cached_results(location=f"area{random.randrange(pages)}", page_number=1, **SEARCH)
+            done += 1
+        with lock:
+            counts["read"] += done
+
+    def writer(w):
+        done = 0
+        while not stop.is_set():
+            db.cache_results(location=f"new{w}-{done}", page_number=1, results=page_results(done), **SEARCH)
+            done += 1
+        with lock:
+            counts["write"] += done
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts["read"] / seconds, counts["write"] / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000, help="cached pages in the database")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    # Time the database, not the log file
+    logger.setLevel(logging.ERROR)
+    errors = ErrorCounter()
+    logger.addHandler(errors)
+
+    modes = {"connect": lambda path: sqlite3.connect(path), "pool": pooled_connection}
+    print(f"{'mode':<8} {'hit p50':>9} {'hit p95':>9} {'reads/s':>9} {'writes/s':>9} {'failed':>7}")
+    with tempfile.TemporaryDirectory() as scratch:
+        for mode, connect in modes.items():
+            database_module.connection = sqlite_pool_module.connection = connect
+            db = make_db(os.path.join(scratch, f"{mode}.db"), args.pages)
+            random.seed(1)
+            p50, p95 = cache_hit_latency(db, args.pages, args.lookups)
+            errors.count = 0
+            reads, writes = mixed_load(db, args.pages, args.readers, args.writers, args.seconds)
+            print(f"{mode:<8} {p50 * 1e6:7.0f}us {p95 * 1e6:7.0f}us {reads:9.0f} {writes:9.0f} {errors.count:7d}")
+    database_module.connection = sqlite_pool_module.connection = pooled_connection
+
+
+if __name__ == "__main__":
+    main()
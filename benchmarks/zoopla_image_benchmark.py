@@ -0,0 +1,103 @@
+"""
+Compare Zoopla card image lookups: per-card ancestor walk vs one-pass map
+
+The old lookup walked up to six ancestors from every card and searched each
+one's subtree for a picture; build_image_map indexes every picture's
+ancestors once per page. Both are timed on the cards of each saved Zoopla page
+(tests/fixtures or the raw page store) with every installed backend, and the
+images they pick are checked to match. Each page is also run with every other
+card's picture removed, the case where the walk climbs into the whole results
+list before giving up.
+
+Usage:
+    python benchmarks/zoopla_image_benchmark.py [--repeat N] [--from-store N]
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parse_benchmark import load_fixtures, load_stored_pages
+from scrapers import html_parser
+from scrapers.zoopla import IMAGE_SEARCH_DEPTH, ZOOPLA_CARDS, ZOOPLA_RESULTS_LIST, ZOOPLA_STRAINER, build_image_map, picture_url
+
+
+PICTURE_RE = re.compile(r"<picture\b.*?</picture>", re.S | re.I)
+
+
+def drop_alternate_pictures(html):
+    """The page with every other picture removed"""
+    count = iter(range(10 ** 9))
+    return PICTURE_RE.sub(lambda m: "" if next(count) % 2 else m.group(0), html)
+
+
+def walk_images(cards):
+    """The previous lookup: search each ancestor's subtree for a picture"""
+    found = []
+    for card in cards:
+        image = ""
+        parent = card
+        for _ in range(IMAGE_SEARCH_DEPTH):
+            parent = parent.parent if parent else None
+            if parent:
+                picture = parent.css_first("picture")
+                image = picture_url(picture) if picture else ""
+                if image:
+                    break
+        found.append(image)
+    return found
+
+
+def mapped_images(root, cards):
+    images = build_image_map(root.css_first(ZOOPLA_RESULTS_LIST) or root)
+    found = []
+    for card in cards:
+        image = ""
+        parent = card
+        for _ in range(IMAGE_SEARCH_DEPTH):
+            parent = parent.parent if parent else None
+            if parent and images.get(parent.key):
+                image = images[parent.key]
+                break
+        found.append(image)
+    return found
+
+
+def mean_seconds(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="lookups per page and backend")
+    parser.add_argument("--from-store", type=int, metavar="N", help="use the N newest pages from the raw page store")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    pages = load_stored_pages(args.from_store) if args.from_store else load_fixtures()
+    pages = [(name, html) for name, site, html in pages if site == "zoopla"]
+    pages += [(name[:22] + " (gaps)", drop_alternate_pictures(html)) for name, html in pages]
+    backends = [b for b in html_parser.BACKENDS if html_parser.resolve_backend(b) == b]
+
+    print(f"{'page':<32} {'backend':<12} {'cards':>5} {'walk':>10} {'map':>10} {'speedup':>8}")
+    for name, html in pages:
+        for backend in backends:
+            root = html_parser.parse_html(html, backend, only=ZOOPLA_STRAINER if backend != "selectolax" else None)
+            cards = ZOOPLA_CARDS.all(root)
+            if walk_images(cards) != mapped_images(root, cards):
+                print(f"{name:<32} {backend:<12} images differ between the two lookups")
+                continue
+            walk = mean_seconds(lambda: walk_images(cards), args.repeat)
+            mapped = mean_seconds(lambda: mapped_images(root, cards), args.repeat)
+            print(f"{name:<32} {backend:<12} {len(cards):>5} {walk * 1000:8.2f}ms {mapped * 1000:8.2f}ms {walk / mapped:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Rewrite cached results in the current storage format
+
+Rows cached as plain JSON text, or with a codec other than CACHE_COMPRESSION,
+are re-encoded by utils/result_codec.py, then the file is vacuumed so the
+space they freed is given back. --all re-encodes every row, e.g. after
+changing CACHE_COMPRESSION_LEVEL.
+
+Usage: python compress_cache.py [--all] [--no-vacuum]
+"""
+import os
+import sqlite3
+import sys
+from utils.result_codec import result_codec
+from utils.logger import logger
+from utils.sqlite_pool import database_path
+
+# Rows read and rewritten per transaction
+BATCH_SIZE = 200
+
+
+def compress_cache(db_path=None, force=False, vacuum=True, codec=result_codec):
+    """Re-encode out-of-date rows.
+
+    Returns (rewritten, payload bytes before, payload bytes after, file size
+    before, file size after).
+    """
+    db_path = db_path or database_path()
+    file_before = os.path.getsize(db_path)
+    rewritten = bytes_before = bytes_after = 0
+    last_id = 0
+    with sqlite3.connect(db_path) as conn:
+        while True:
+            rows = conn.execute(
+                "SELECT id, results FROM listings WHERE id > ? ORDER BY id LIMIT ?", (last_id, BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates = []
+            for row_id, payload in rows:
+                if payload is None or (codec.is_current(payload) and not force):
+                    continue
+                encoded = codec.encode(codec.decode(payload))
+                bytes_before += len(payload.encode('utf-8') if isinstance(payload, str) else payload)
+                bytes_after += len(encoded)
+                updates.append((encoded, row_id))
+            conn.executemany("UPDATE listings SET results = ? WHERE id = ?", updates)
+            conn.commit()
+            rewritten += len(updates)
+
+    if vacuum and rewritten:
+        # VACUUM can't run inside a transaction
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        try:
+            conn.execute("VACUUM")
+            # In WAL mode the vacuumed pages land in the -wal file until a checkpoint
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+
+    file_after = os.path.getsize(db_path)
+    logger.info(f"Cache compression completed: {rewritten} rows rewritten with {codec.codec} level {codec.level}, "
+                f"payloads {bytes_before} -> {bytes_after} bytes, file {file_before} -> {file_after} bytes")
+    return rewritten, bytes_before, bytes_after, file_before, file_after
+
+
+if __name__ == "__main__":
+    rewritten, bytes_before, bytes_after, file_before, file_after = compress_cache(
+        force="--all" in sys.argv, vacuum="--no-vacuum" not in sys.argv
+    )
+    print(f"{rewritten} rows rewritten: payloads {bytes_before / 1024:.0f} KB -> {bytes_after / 1024:.0f} KB, "
+          f"database {file_before / 1024:.0f} KB -> {file_after / 1024:.0f} KB")
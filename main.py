@@ -4,12 +4,22 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from dotenv import load_dotenv
 from scrapers.zoopla import scrape_zoopla, scrape_zoopla_first_page, scrape_zoopla_page
-from scrapers.rightmove_scrape import scrape_rightmove_from_url
+from scrapers.rightmove_scrape import async_scrape_rightmove_from_url
 from scrapers.rightmove_url import get_final_rightmove_results_url
 from scrapers.openrent import scrape_openrent
+from scrapers.proxy_rotator import get_proxy_rotator
+from scrapers.parser_version import parser_version_for
+from scrapers.extraction_rules import extraction_stats
 from utils.validators import validate_search_params, ValidationError, rate_limiter
 from utils.logger import logger
 from utils.database import Database
+from utils.listing import dumps as listing_dumps
+from utils.raw_store import raw_page_store
+from utils.singleflight import singleflight, search_key
+from utils.search_sessions import search_sessions
+from utils.combined_pager import decode_cursor
+from utils.property_registry import property_registry
+from utils.deadline import Deadline
 from utils.security import scraper_api_monitor, get_client_ip, sanitize_location, validate_price_limits
 from utils.lead_capture import (init_leads_table, capture_lead, get_all_leads, get_leads_stats, export_leads_csv,
                                 create_user, get_user_by_email, update_last_login,
@@ -28,6 +38,13 @@ import bcrypt
 
 load_dotenv(override=True)  # Force override any existing env vars
 app = Flask(__name__)
+
+
+def listing_json(results):
+    """JSON response for search results, encoding the Listing records straight to bytes"""
+    return app.response_class(listing_dumps(results), mimetype='application/json')
+
+
 app.secret_key = os.getenv('SECRET_KEY', os.urandom(24).hex())
 
 # Store verification codes temporarily (email -> {code, timestamp})
@@ -59,19 +76,26 @@ init_leads_table()
 cache = {}
 CACHE_DURATION = timedelta(minutes=5)
 
-def generate_listing_id(listing):
-    base = f"{listing.get('title', '')}_{listing.get('price', '')}_{listing.get('address', '')}"
-    return hashlib.md5(base.encode()).hexdigest()
-
-def deduplicate_listings(listings):
-    seen_ids = set()
-    deduped = []
-    for listing in listings:
-        listing['id'] = generate_listing_id(listing)
-        if listing['id'] not in seen_ids:
-            seen_ids.add(listing['id'])
-            deduped.append(listing)
-    return deduped
+def combined_search_key(params):
+    """Identify a combined search across its pages, for its dedup session"""
+    return search_key("Combined", params['location'], params['min_price'], params['max_price'],
+                      params['min_beds'], params['max_beds'], params['keywords'], params['listing_type'])
+
+def track_combined_page(results, data, params):
+    """Run a combined page through its search's dedup session.
+
+    A request carrying a session token or cursor continues a search: only
+    listings the session hasn't returned yet are kept, and they are added to
+    it. Otherwise the page starts a new session.
+    """
+    listings = results.get('listings', [])
+    key = combined_search_key(params)
+    if data.get('session_token') or data.get('cursor'):
+        results['session_token'], results['listings'] = search_sessions.filter(data.get('session_token'), listings, key)
+        results['total_found'] = len(results['listings'])
+    else:
+        results['session_token'] = search_sessions.create(listings, key)
+    return results
 
 def get_cache_key(site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type):
     """Generate a unique cache key for the search parameters"""
@@ -98,12 +122,20 @@ def cache_results(cache_key, results):
         if datetime.now() - timestamp > CACHE_DURATION:
             del cache[key]
 
-async def scrape_site(site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page=1, sort_by="newest"):
+async def scrape_site(site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page=1, sort_by="newest", deadline=None):
+    """Scrape a specific site, sharing one fetch between identical concurrent searches"""
+    key = "scrape_site:" + search_key(site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page, sort_by)
+    return await singleflight.do(
+        key, _scrape_site,
+        site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page, sort_by, deadline
+    )
+
+async def _scrape_site(site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page=1, sort_by="newest", deadline=None):
     """Scrape a specific site with the given parameters"""
     try:
         if site == "zoopla":
             logger.info("[Zoopla] Starting scrape...")
-            results = await scrape_zoopla(location, min_price, max_price, min_beds, max_beds, keywords, listing_type)
+            results = await scrape_zoopla(location, min_price, max_price, min_beds, max_beds, keywords, listing_type, deadline=deadline)
             logger.info("[Zoopla] Scrape completed. Found %d results", len(results))
             return results
         elif site == "rightmove":
@@ -123,7 +155,7 @@ async def scrape_site(site, location, min_price, max_price, min_beds, max_beds,
             if not url:
                 logger.error("[Rightmove] Failed to generate URL")
                 return []
-            results = scrape_rightmove_from_url(url, page=page)
+            results = await async_scrape_rightmove_from_url(url, page=page, deadline=deadline)
             logger.info("[Rightmove] Scrape completed. Found %d results", len(results["listings"]))
             return results
         elif site == "openrent":
@@ -151,6 +183,7 @@ def admin_dashboard():
 @limiter.limit("10 per minute")
 async def search():
     """Handle property search requests"""
+    deadline = Deadline.for_search()
     try:
         # Check ScraperAPI limits first
         can_proceed, error_msg = scraper_api_monitor.check_limits()
@@ -192,7 +225,7 @@ async def search():
                 return jsonify({'error': error_msg}), 429
             
             # Initialize scraper bot
-            scraper_bot = ScraperBot()
+            scraper_bot = ScraperBot(sort_by=validated_data['sort_by'])
             
             # Get current page from request or default to 1
             current_page = int(data.get('current_page', 1))
@@ -211,14 +244,17 @@ async def search():
                 max_beds=validated_data['max_beds'],
                 listing_type=validated_data['listing_type'],
                 page=current_page,
-                keywords=validated_data['keywords']
+                keywords=validated_data['keywords'],
+                deadline=deadline
             )
             
             # Add search parameters to response
             results['search_params'] = validated_data
+            # Later pages of this search are deduplicated against the ones already sent
+            track_combined_page(results, data, validated_data)
             
             logger.info(f"Combined search completed. Found {results.get('total_found', 0)} unique listings")
-            return jsonify(results)
+            return listing_json(results)
 
         # Check database cache first
         cached_results = db.get_cached_results(
@@ -236,7 +272,7 @@ async def search():
 
         if cached_results:
             logger.info("Found valid cached results in database")
-            return jsonify(cached_results)
+            return listing_json(cached_results)
         
         # Record ScraperAPI request (cache miss)
         scraper_api_monitor.record_request()
@@ -255,9 +291,12 @@ async def search():
                     validated_data['keywords'],
                     validated_data['listing_type'],
                     1,  # First page
-                    validated_data.get('sort_by', 'newest')  # Include sort_by
+                    validated_data.get('sort_by', 'newest'),  # Include sort_by
+                    deadline=deadline
                 )
 
+                property_registry.assign(first_page_results)
+
                 # Prepare response
                 response_data = {
                     "listings": first_page_results,
@@ -281,13 +320,14 @@ async def search():
                         validated_data['listing_type'],
                         1,  # First page
                         response_data,
-                        validated_data.get('sort_by', 'newest')  # Include sort_by
+                        validated_data.get('sort_by', 'newest'),  # Include sort_by
+                        parser_version=parser_version_for(validated_data['site'])
                     )
                     logger.info("Cached valid results with %d listings", len(first_page_results))
                 else:
                     logger.info("Skipping cache for empty results")
 
-                return jsonify(response_data)
+                return listing_json(response_data)
             except Exception as e:
                 logger.error("Error scraping Zoopla first page: %s", str(e))
                 return jsonify({
@@ -306,9 +346,12 @@ async def search():
                 validated_data['keywords'],
                 validated_data['listing_type'],
                 1,  # First page
-                validated_data.get('sort_by', 'newest')  # Pass sort_by
+                validated_data.get('sort_by', 'newest'),  # Pass sort_by
+                deadline=deadline
             )
 
+            property_registry.assign(results.get("listings", []) if isinstance(results, dict) else results)
+
             # Prepare response
             response_data = {
                 "listings": results.get("listings", []) if isinstance(results, dict) else results,
@@ -333,13 +376,14 @@ async def search():
                     validated_data['listing_type'],
                     1,  # First page
                     response_data,
-                    validated_data.get('sort_by', 'newest')  # Include sort_by
+                    validated_data.get('sort_by', 'newest'),  # Include sort_by
+                    parser_version=parser_version_for(validated_data['site'])
                 )
                 logger.info("Cached valid results with %d listings", len(listings))
             else:
                 logger.info("Skipping cache for empty results")
 
-            return jsonify(response_data)
+            return listing_json(response_data)
 
     except Exception as e:
         logger.error("Error processing search request: %s", str(e))
@@ -365,7 +409,7 @@ async def get_zoopla_json():
             validated_data['listing_type']
         )
 
-        return jsonify(results)
+        return listing_json(results)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -387,8 +431,8 @@ async def get_rightmove_json():
             listing_type=validated_data['listing_type']
         )
 
-        results = scrape_rightmove_from_url(url)
-        return jsonify(results)
+        results = await async_scrape_rightmove_from_url(url, deadline=Deadline.for_search())
+        return listing_json(results)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -399,7 +443,7 @@ async def get_combined_json():
         data = request.get_json()
         validated_data = validate_search_params(data)
 
-        scraper_bot = ScraperBot()
+        scraper_bot = ScraperBot(sort_by=validated_data['sort_by'])
         results = await scraper_bot.scrape_combined(
             location=validated_data['location'],
             min_price=validated_data['min_price'],
@@ -407,10 +451,11 @@ async def get_combined_json():
             min_beds=validated_data['min_beds'],
             max_beds=validated_data['max_beds'],
             listing_type=validated_data['listing_type'],
-            keywords=validated_data['keywords']
+            keywords=validated_data['keywords'],
+            deadline=Deadline.for_search()
         )
 
-        return jsonify(results)
+        return listing_json(results)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -447,6 +492,7 @@ async def get_combined_json():
 @limiter.limit("20 per minute")
 async def next_page():
     """Handle loading the next page of results"""
+    deadline = Deadline.for_search()
     try:
         # Check ScraperAPI limits
         can_proceed, error_msg = scraper_api_monitor.check_limits()
@@ -478,7 +524,14 @@ async def next_page():
         # If site is combined, use the scraper bot's scrape_combined method
         if validated_params['site'] == 'combined':
             logger.info("Processing combined search for page %d", current_page)
-            scraper_bot = ScraperBot()
+            # Where each source left off, from the previous page's results
+            cursor = data.get('cursor')
+            if cursor:
+                try:
+                    decode_cursor(cursor)
+                except ValueError as e:
+                    return jsonify({"error": "Invalid parameters", "details": str(e)}), 400
+            scraper_bot = ScraperBot(sort_by=validated_params['sort_by'])
             results = await scraper_bot.scrape_combined(
                 location=validated_params['location'],
                 min_price=validated_params['min_price'],
@@ -487,9 +540,14 @@ async def next_page():
                 max_beds=validated_params['max_beds'],
                 listing_type=validated_params['listing_type'],
                 page=current_page,
-                keywords=validated_params['keywords']
+                keywords=validated_params['keywords'],
+                deadline=deadline,
+                cursor=cursor
             )
-            return jsonify(results)
+            if results:
+                # Only send listings this search hasn't returned on an earlier page
+                track_combined_page(results, data, validated_params)
+            return listing_json(results)
 
         # Check cache for current page
         cached_results = db.get_cached_results(
@@ -510,7 +568,7 @@ async def next_page():
             logger.info("Rightmove cached page %d: has_next_page=%s, total_pages=%d", 
                        current_page, cached_results.get('has_next_page', True),
                        cached_results.get('total_pages', 1))
-            return jsonify(cached_results)
+            return listing_json(cached_results)
         
         # Record API usage (cache miss)
         scraper_api_monitor.record_request()
@@ -537,7 +595,7 @@ async def next_page():
                 }), 400
 
             logger.info("Scraping Rightmove URL: %s", url)
-            page_results = scrape_rightmove_from_url(url, page=current_page)
+            page_results = await async_scrape_rightmove_from_url(url, page=current_page, deadline=deadline)
 
             if not page_results or 'listings' not in page_results:
                 logger.error("Invalid response from Rightmove scraper")
@@ -546,6 +604,8 @@ async def next_page():
                     "details": "Failed to fetch page of results"
                 }), 500
 
+            property_registry.assign(page_results['listings'])
+
             # Ensure we have the has_next_page flag
             if 'has_next_page' not in page_results:
                 page_results['has_next_page'] = current_page < page_results.get('total_pages', 1)
@@ -566,10 +626,11 @@ async def next_page():
                 validated_params['listing_type'],
                 current_page,
                 page_results,
-                validated_params.get('sort_by', 'newest')  # Include sort_by
+                validated_params.get('sort_by', 'newest'),  # Include sort_by
+                parser_version=parser_version_for(validated_params['site'])
             )
 
-            return jsonify(page_results)
+            return listing_json(page_results)
         elif validated_params['site'] == 'zoopla':
             # Scrape the current page and get total pages
             page_results, total_pages = await scrape_zoopla_first_page(
@@ -581,9 +642,12 @@ async def next_page():
                 validated_params['keywords'],
                 validated_params['listing_type'],
                 current_page,
-                validated_params.get('sort_by', 'newest')  # Include sort_by
+                validated_params.get('sort_by', 'newest'),  # Include sort_by
+                deadline=deadline
             )
 
+            property_registry.assign(page_results)
+
             # Format Zoopla results to match the expected structure
             response_data = {
                 "listings": page_results,
@@ -607,13 +671,14 @@ async def next_page():
                     validated_params['listing_type'],
                     current_page,
                     response_data,
-                    validated_params.get('sort_by', 'newest')  # Include sort_by
+                    validated_params.get('sort_by', 'newest'),  # Include sort_by
+                    parser_version=parser_version_for(validated_params['site'])
                 )
                 logger.info("Cached results for page %d", current_page)
             else:
                 logger.info("Skipping cache for page %d - no valid results", current_page)
 
-            return jsonify(response_data)
+            return listing_json(response_data)
         else:
             return jsonify({
                 "error": "Unsupported site",
@@ -631,6 +696,7 @@ async def next_page():
 @limiter.limit("5 per minute")
 async def search_combined():
     """Handle combined property search requests from multiple sites"""
+    deadline = Deadline.for_search()
     try:
         # Check ScraperAPI limits (combined uses 2x requests)
         can_proceed, error_msg = scraper_api_monitor.check_limits()
@@ -662,10 +728,16 @@ async def search_combined():
             return jsonify({"error": str(e)}), 400
 
         # Initialize scraper bot
-        scraper_bot = ScraperBot()
+        scraper_bot = ScraperBot(sort_by=validated_data['sort_by'])
 
-        # Get current page from request or default to 1
+        # Get current page and cursor from request, or start from the top
         current_page = int(data.get('current_page', 1))
+        cursor = data.get('cursor')
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
         logger.info(f"Processing combined search for page {current_page}")
         
         # Record API usage (combined = 2 requests)
@@ -681,14 +753,18 @@ async def search_combined():
             max_beds=validated_data['max_beds'],
             listing_type=validated_data['listing_type'],
             page=current_page,
-            keywords=validated_data['keywords']
+            keywords=validated_data['keywords'],
+            deadline=deadline,
+            cursor=cursor
         )
 
         # Add search parameters to response
         results['search_params'] = validated_data
+        # Later pages of this search are deduplicated against the ones already sent
+        track_combined_page(results, data, validated_data)
 
         logger.info(f"Combined search completed. Found {results['total_found']} unique listings across {results['total_pages']} pages")
-        return jsonify(results)
+        return listing_json(results)
 
     except Exception as e:
         logger.error("Error processing combined search request: %s", str(e))
@@ -716,10 +792,17 @@ def health_check():
     """API health check and usage statistics"""
     try:
         usage_stats = scraper_api_monitor.get_usage_stats()
+        try:
+            provider_stats = get_proxy_rotator().get_stats()
+        except ValueError:
+            provider_stats = {}
         return jsonify({
             "status": "healthy",
             "timestamp": datetime.now().isoformat(),
-            "api_usage": usage_stats
+            "api_usage": usage_stats,
+            "providers": provider_stats,
+            "selectors": extraction_stats.snapshot(),
+            "search_sessions": len(search_sessions)
         })
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -1242,6 +1325,7 @@ def cleanup():
     """Clean up old results from the database"""
     try:
         db.cleanup_old_results()
+        raw_page_store.cleanup()
         return jsonify({"message": "Cleanup completed successfully"})
     except Exception as e:
         logger.error("Error during cleanup: %s", str(e))
@@ -0,0 +1,118 @@
+"""
+Re-parse cached results from stored raw pages
+
+After a parser fix, bump PARSER_VERSION in the scraper and run this job. Every
+cached Rightmove/Zoopla row built with an older parser is rebuilt from the raw
+HTML kept by utils/raw_store.py, without buying the page again. Stale combined
+rows are dropped; they are rebuilt from the per-source rows on the next search.
+
+Usage: python reparse_cache.py [--all]
+"""
+import sqlite3
+import sys
+from scrapers.parser_version import parser_version_for
+from scrapers.rightmove_scrape import parse_rightmove_html
+from scrapers.rightmove_url import get_final_rightmove_results_url, get_rightmove_search_api_url
+from scrapers.zoopla import build_zoopla_url, parse_zoopla_html
+from utils.result_codec import result_codec
+from utils.raw_store import RawPageStore
+from utils.logger import logger
+from utils.sqlite_pool import connection, database_path
+
+
+def source_url(site, row):
+    """Rebuild the upstream URL a cached row was scraped from"""
+    params = dict(
+        location=row['location'] or "",
+        min_price=row['min_price'] or "",
+        max_price=row['max_price'] or "",
+        min_beds=row['min_beds'] or "",
+        max_beds=row['max_beds'] or "",
+        listing_type=row['listing_type'] or "sale",
+        sort_by=row['sort_by'] or "newest"
+    )
+    if site == 'rightmove':
+        return get_final_rightmove_results_url(radius="0.0", include_sold=True, page=row['page_number'], **params)
+    return build_zoopla_url(page_number=row['page_number'], **params)
+
+
+def reparse_results(site, row, html, url):
+    """Return the cached results with listings re-extracted from the raw page"""
+    results = result_codec.decode(row['results'])
+    page = row['page_number'] or 1
+
+    if site == 'rightmove':
+        parsed = parse_rightmove_html(html, url, page)
+        listings, total_pages = parsed['listings'], parsed['total_pages']
+    else:
+        listings, total_pages = parse_zoopla_html(html, row['keywords'] or "")
+
+    # Keep the source tag the bots add to each listing
+    source = next((l['source'] for l in results.get('listings', []) if 'source' in l), None)
+    if source:
+        for listing in listings:
+            listing['source'] = source
+
+    results['listings'] = listings
+    if total_pages:
+        results['total_pages'] = total_pages
+        if 'has_next_page' in results:
+            results['has_next_page'] = page < total_pages
+    return results
+
+
+def reparse_cache(db_path=None, force=False):
+    """Rebuild cached rows whose parser version is out of date.
+
+    Returns (reparsed, dropped, missing) counts, where missing rows had no
+    stored raw page and are left to expire.
+    """
+    db_path = db_path or database_path()
+    # Raw pages live in the same database as the rows built from them
+    raw_pages = RawPageStore(db_path)
+    with connection(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("""
+            SELECT * FROM listings
+            WHERE created_at > datetime('now', '-24 hours')
+        """).fetchall()
+
+    dropped_ids, updates, missing = [], [], 0
+    for row in rows:
+        site = (row['site'] or "").lower()
+        current = parser_version_for(site)
+        if current is None or (row['parser_version'] == current and not force):
+            continue
+
+        if site == 'combined':
+            dropped_ids.append((row['id'],))
+            continue
+
+        url = source_url(site, row)
+        html = None
+        if url:
+            html = raw_pages.get(url)
+            if not html and site == 'rightmove':
+                # Fetched from the JSON search API rather than the results page
+                html = raw_pages.get(get_rightmove_search_api_url(url))
+        if not html:
+            missing += 1
+            continue
+
+        results = reparse_results(site, row, html, url)
+        updates.append((result_codec.encode(results), current, row['id']))
+
+    # Written in one transaction once every page is read: the raw page store
+    # creates its tables on first use and would wait on this job's write lock
+    with connection(db_path) as conn:
+        conn.executemany("DELETE FROM listings WHERE id = ?", dropped_ids)
+        conn.executemany("UPDATE listings SET results = ?, parser_version = ? WHERE id = ?", updates)
+    reparsed, dropped = len(updates), len(dropped_ids)
+
+    logger.info(f"Re-parse completed: {reparsed} rows rebuilt, {dropped} combined rows dropped, "
+                f"{missing} rows without a stored page")
+    return reparsed, dropped, missing
+
+
+if __name__ == "__main__":
+    reparse_cache(force="--all" in sys.argv)
@@ -5,8 +5,10 @@ import time
 from datetime import datetime
 from dotenv import load_dotenv
 from scrapers.rightmove_url import get_final_rightmove_results_url
-from scrapers.rightmove_scrape import scrape_rightmove_from_url
+from scrapers.rightmove_scrape import async_scrape_rightmove_from_url
+from scrapers.parser_version import parser_version_for
 from utils.database import Database
+from utils.dedup import DedupIndex
 from utils.logger import logger
 
 # Load environment variables
@@ -62,7 +64,7 @@ class RightmoveBot:
         """Scrape a page using ScraperAPI"""
         try:
             logger.info(f"[Rightmove Bot] Scraping page {page}")
-            results = scrape_rightmove_from_url(url, page=page)
+            results = await async_scrape_rightmove_from_url(url, page=page)
             if results and self.has_valid_listings(results):
                 logger.info(f"[Rightmove Bot] Successfully scraped page {page}")
                 return results
@@ -150,7 +152,8 @@ class RightmoveBot:
                     keywords="",  # Empty string for keywords
                     listing_type=listing_type,
                     page_number=page,
-                    results=results
+                    results=results,
+                    parser_version=parser_version_for("Rightmove")
                 )
                 logger.info(f"[Rightmove] Cached {len(results['listings'])} listings for page {page}")
             else:
@@ -170,6 +173,7 @@ class RightmoveBot:
         
         consecutive_empty = 0
         total_listings = 0
+        seen = DedupIndex()  # listings repeat across pages (featured slots, results shifting)
         page = 1
         
         while page <= self.max_pages and consecutive_empty < self.max_consecutive_empty:
@@ -184,9 +188,9 @@ class RightmoveBot:
             )
             
             if results and self.has_valid_listings(results):
-                total_listings += len(results["listings"])
+                total_listings += len(seen.add_all(results["listings"]))
                 consecutive_empty = 0
-                logger.info(f"[Rightmove Bot] Total listings so far: {total_listings}")
+                logger.info(f"[Rightmove Bot] Total unique listings so far: {total_listings}")
                 
                 # Check if we've reached the last page
                 if results.get("is_complete", False):
@@ -200,7 +204,7 @@ class RightmoveBot:
         
         logger.info(f"[Rightmove Bot] Finished scraping {location}")
         logger.info(f"Total pages scraped: {page - 1}")
-        logger.info(f"Total listings found: {total_listings}")
+        logger.info(f"Total unique listings found: {total_listings}")
         return total_listings
 
     async def scrape_all_combinations(self):
@@ -4,25 +4,54 @@ import asyncio
 from datetime import datetime
 from dotenv import load_dotenv
 from utils.database import Database
+from utils.combined_pager import CombinedPager
+from utils.dedup import DedupIndex, FuzzyDedupIndex
 from utils.logger import logger
+from utils.property_registry import property_registry
+from utils.singleflight import singleflight, search_key
+from scrapers.http_client import http_client
 from scrapers.rightmove_url import get_final_rightmove_results_url
-from scrapers.rightmove_scrape import scrape_rightmove_from_url
+from scrapers.rightmove_scrape import async_scrape_rightmove_from_url
+from scrapers.parser_version import parser_version_for
 
 # Load environment variables
 load_dotenv()
 
 class ScraperBot:
-    def __init__(self):
+    def __init__(self, sort_by="newest"):
         self.db = Database()
         self.radius = "0.0"  # Default radius for location search
-        self.sort_by = "newest"  # Default sort order
+        self.sort_by = sort_by or "newest"  # Sort order for every source and the combined merge
         self.include_sold = True  # Include sold properties
         self.max_retries = 3
         self.retry_delay = 5
+        self.http_client = http_client
+        # Match the same property across sites even when the addresses are written differently
+        self.fuzzy_dedup = os.getenv('FUZZY_DEDUP', 'true').lower() == 'true'
 
     async def scrape_rightmove(self, location, min_price, max_price, min_beds, max_beds, listing_type, page=1, keywords=""):
         """Scrape Rightmove listings"""
         try:
+            # Check cache first, off the loop: these coroutines run on the shared
+            # HTTP client loop, where a blocking query would stall every fetch
+            cached_results = await asyncio.to_thread(
+                self.db.get_cached_results,
+                site="Rightmove",
+                location=location,
+                min_price=min_price,
+                max_price=max_price,
+                min_beds=min_beds,
+                max_beds=max_beds,
+                keywords=keywords,
+                listing_type=listing_type,
+                page_number=page,
+                sort_by=self.sort_by
+            )
+
+            if cached_results:
+                logger.info("[Rightmove] Using cached results")
+                return cached_results
+
             # Generate Rightmove URL
             url = get_final_rightmove_results_url(
                 location=location,
@@ -41,12 +70,9 @@ class ScraperBot:
                 logger.error(f"[Rightmove] Failed to generate URL for {location}")
                 return None
 
-            # Add small delay between requests
-            await asyncio.sleep(2)
-
             # Direct scraping using rightmove_scrape
             logger.info("[Rightmove] Starting scraping...")
-            results = scrape_rightmove_from_url(url, page=page)
+            results = await async_scrape_rightmove_from_url(url, page=page)
             
             if results and isinstance(results, dict):
                 listings = results.get('listings', [])
@@ -55,6 +81,23 @@ class ScraperBot:
                 # Add source to listings
                 for listing in listings:
                     listing['source'] = 'Rightmove'
+
+                if listings:
+                    await asyncio.to_thread(
+                        self.db.cache_results,
+                        site="Rightmove",
+                        location=location,
+                        min_price=min_price,
+                        max_price=max_price,
+                        min_beds=min_beds,
+                        max_beds=max_beds,
+                        keywords=keywords,
+                        listing_type=listing_type,
+                        page_number=page,
+                        results=results,
+                        sort_by=self.sort_by,
+                        parser_version=parser_version_for("Rightmove")
+                    )
                 
                 return results
 
@@ -69,7 +112,8 @@ class ScraperBot:
         """Scrape Zoopla listings"""
         try:
             # Check cache first
-            cached_results = self.db.get_cached_results(
+            cached_results = await asyncio.to_thread(
+                self.db.get_cached_results,
                 site="Zoopla",
                 location=location,
                 min_price=min_price,
@@ -78,7 +122,8 @@ class ScraperBot:
                 max_beds=max_beds,
                 keywords=keywords,
                 listing_type=listing_type,
-                page_number=page
+                page_number=page,
+                sort_by=self.sort_by
             )
             
             if cached_results:
@@ -86,33 +131,20 @@ class ScraperBot:
                 return cached_results
 
             # Import Zoopla scraper dynamically to avoid circular imports
-            from scrapers.zoopla import scrape_zoopla_first_page, scrape_zoopla_page
+            from scrapers.zoopla import scrape_zoopla_first_page
 
-            await asyncio.sleep(2)  # Add delay between requests
-
-            if page == 1:
-                results, total_pages = await scrape_zoopla_first_page(
-                    location=location,
-                    min_price=min_price,
-                    max_price=max_price,
-                    min_beds=min_beds,
-                    max_beds=max_beds,
-                    keywords=keywords,
-                    listing_type=listing_type,
-                    page_number=page
-                )
-            else:
-                results = await scrape_zoopla_page(
-                    location=location,
-                    min_price=min_price,
-                    max_price=max_price,
-                    min_beds=min_beds,
-                    max_beds=max_beds,
-                    keywords=keywords,
-                    listing_type=listing_type,
-                    page_num=page
-                )
-                total_pages = page
+            # Any page reports the total, which the combined merge needs to know when Zoopla runs out
+            results, total_pages = await scrape_zoopla_first_page(
+                location=location,
+                min_price=min_price,
+                max_price=max_price,
+                min_beds=min_beds,
+                max_beds=max_beds,
+                keywords=keywords,
+                listing_type=listing_type,
+                page_number=page,
+                sort_by=self.sort_by
+            )
 
             if results:
                 # Add source to listings
@@ -129,7 +161,8 @@ class ScraperBot:
                 }
 
                 # Cache results
-                self.db.cache_results(
+                await asyncio.to_thread(
+                    self.db.cache_results,
                     site="Zoopla",
                     location=location,
                     min_price=min_price,
@@ -139,7 +172,9 @@ class ScraperBot:
                     keywords=keywords,
                     listing_type=listing_type,
                     page_number=page,
-                    results=structured_results
+                    results=structured_results,
+                    sort_by=self.sort_by,
+                    parser_version=parser_version_for("Zoopla")
                 )
 
                 return structured_results
@@ -150,100 +185,54 @@ class ScraperBot:
             logger.error(f"[Zoopla ERROR] {str(e)}")
             return None
 
-    def normalize_address(self, address):
-        """Normalize address for comparison by removing spaces, commas and converting to lowercase"""
-        if not address:
-            return ""
-        return ''.join(c.lower() for c in address if c.isalnum())
-
-    def is_duplicate_listing(self, listing, existing_listings):
-        """Check if listing is duplicate based on normalized address or URL"""
-        new_address = self.normalize_address(listing.get('address', ''))
-        new_url = listing.get('url', '').lower()
-        
-        for existing in existing_listings:
-            # Check for duplicate addresses
-            if new_address and new_address == self.normalize_address(existing.get('address', '')):
-                return True
-            # Check for duplicate URLs
-            if new_url and new_url == existing.get('url', '').lower():
-                return True
-        return False
-
-    async def scrape_combined(self, location, min_price, max_price, min_beds, max_beds, listing_type, page=1, keywords=""):
-        """Scrape both Rightmove and Zoopla and combine results with deduplication"""
+    async def scrape_combined(self, location, min_price, max_price, min_beds, max_beds, listing_type, page=1, keywords="", deadline=None, cursor=None):
+        """Merge Rightmove and Zoopla into one page in self.sort_by order, with deduplication.
+        cursor (from the previous page's results) says where each source left off;
+        None starts from the top. Identical concurrent searches share one scrape."""
+        key = "scrape_combined:" + search_key("Combined", location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page, self.sort_by)
+        if cursor:
+            key += ":" + cursor
+        return await singleflight.do(
+            key, self._scrape_combined,
+            location, min_price, max_price, min_beds, max_beds, listing_type, page, keywords, deadline, cursor
+        )
+
+    async def _scrape_combined(self, location, min_price, max_price, min_beds, max_beds, listing_type, page=1, keywords="", deadline=None, cursor=None):
         try:
-            # Check combined cache first
-            cached_results = self.db.get_cached_results(
-                site="Combined",
-                location=location,
-                min_price=min_price,
-                max_price=max_price,
-                min_beds=min_beds,
-                max_beds=max_beds,
-                keywords=keywords,
-                listing_type=listing_type,
-                page_number=page
-            )
-            
-            if cached_results:
-                logger.info("[Combined] Using cached results")
-                return cached_results
-
-            # Scrape both sites concurrently
-            rightmove_task = asyncio.create_task(
-                self.scrape_rightmove(location, min_price, max_price, min_beds, max_beds, listing_type, page, keywords)
-            )
-            zoopla_task = asyncio.create_task(
-                self.scrape_zoopla(location, min_price, max_price, min_beds, max_beds, listing_type, page, keywords)
-            )
-
-            rightmove_results, zoopla_results = await asyncio.gather(rightmove_task, zoopla_task)
-
-            # Combine results with deduplication
-            combined_listings = []
-            total_pages = 1
-            
-            # Add Rightmove listings first
-            if rightmove_results:
-                for listing in rightmove_results.get('listings', []):
-                    if not self.is_duplicate_listing(listing, combined_listings):
-                        combined_listings.append(listing)
-                total_pages = max(total_pages, rightmove_results.get('total_pages', 1))
-            
-            # Add non-duplicate Zoopla listings
-            if zoopla_results:
-                for listing in zoopla_results.get('listings', []):
-                    if not self.is_duplicate_listing(listing, combined_listings):
-                        combined_listings.append(listing)
-                total_pages = max(total_pages, zoopla_results.get('total_pages', 1))
-
-            # Create combined results structure
-            combined_results = {
+            scrapers = {"Rightmove": self.scrape_rightmove, "Zoopla": self.scrape_zoopla}
+
+            # Fetch on the app-lifetime loop rather than this request's loop, so
+            # a source that misses the deadline keeps running after we respond
+            # and caches its page for the next request
+            def fetch(source, source_page):
+                return asyncio.wrap_future(self.http_client.submit(
+                    scrapers[source](location, min_price, max_price, min_beds, max_beds, listing_type, source_page, keywords)
+                ))
+
+            # Each source is already sorted upstream; merge them on the same key
+            pager = CombinedPager(fetch, scrapers, dedup_factory=FuzzyDedupIndex if self.fuzzy_dedup else DedupIndex)
+            combined_listings, duplicates, next_cursor, timed_out_sources = await pager.page(self.sort_by, cursor, deadline)
+            if timed_out_sources:
+                logger.warning(f"[Combined] Deadline reached, returning partial results without {timed_out_sources}")
+
+            # Both sites' copies of a property resolve to one stable ID
+            property_registry.assign(combined_listings, duplicates)
+
+            # Per-source pages are cached, so the merged page isn't; the
+            # cursor makes it cheap to rebuild
+            return {
                 "listings": combined_listings,
                 "total_found": len(combined_listings),
-                "total_pages": total_pages,
+                "total_pages": page + 1 if next_cursor else page,
                 "current_page": page,
-                "has_next_page": page < total_pages,
-                "is_complete": page >= total_pages
+                "has_next_page": next_cursor is not None,
+                "is_complete": next_cursor is None,
+                "partial": bool(timed_out_sources),
+                "timed_out_sources": timed_out_sources,
+                "cursor": next_cursor,
+                "sort_by": self.sort_by
             }
 
-            # Cache combined results
-            self.db.cache_results(
-                site="Combined",
-                location=location,
-                min_price=min_price,
-                max_price=max_price,
-                min_beds=min_beds,
-                max_beds=max_beds,
-                keywords=keywords,
-                listing_type=listing_type,
-                page_number=page,
-                results=combined_results
-            )
-
-            return combined_results
-
         except Exception as e:
             logger.error(f"[Combined ERROR] {str(e)}")
             return None
@@ -0,0 +1,59 @@
+"""
+Sampled capture of pages the scrapers failed to parse
+
+Off by default. With SCRAPER_DIAGNOSTICS=true a sample of failing pages
+(SCRAPER_DIAGNOSTICS_SAMPLE_RATE) is written to SCRAPER_DIAGNOSTICS_DIR,
+which is capped at SCRAPER_DIAGNOSTICS_MAX_FILES by dropping the oldest
+captures. Nothing is traversed or written for pages that parse normally.
+"""
+import json
+import os
+import random
+import time
+from utils.logger import logger
+
+
+class ParseDiagnostics:
+    """Saves a bounded sample of failing pages for later inspection"""
+
+    def __init__(self):
+        self.enabled = os.getenv('SCRAPER_DIAGNOSTICS', 'false').lower() == 'true'
+        self.sample_rate = float(os.getenv('SCRAPER_DIAGNOSTICS_SAMPLE_RATE', '0.1'))
+        self.directory = os.getenv('SCRAPER_DIAGNOSTICS_DIR', os.path.join('logs', 'diagnostics'))
+        self.max_files = int(os.getenv('SCRAPER_DIAGNOSTICS_MAX_FILES', '50'))
+
+    def capture(self, site, reason, url, html):
+        """Maybe save a page that failed to parse. Returns the saved path, if any"""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stem = f"{time.strftime('%Y%m%d_%H%M%S')}_{site.lower()}_{os.getpid()}_{random.randrange(16 ** 6):06x}"
+            path = os.path.join(self.directory, stem + ".html")
+            with open(path, 'wb') as f:
+                f.write(html if isinstance(html, bytes) else html.encode('utf-8'))
+            with open(os.path.join(self.directory, stem + ".json"), 'w') as f:
+                json.dump({"site": site, "reason": reason, "url": url, "captured_at": time.time()}, f)
+            self._prune()
+            logger.warning(f"[Diagnostics] Saved {site} page ({reason}) to {path}")
+            return path
+        except Exception as e:
+            logger.error(f"[Diagnostics] Could not save {site} page: {str(e)}")
+            return None
+
+    def _prune(self):
+        """Keep only the newest max_files captures"""
+        pages = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".html")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in pages[:max(0, len(pages) - self.max_files)]:
+            for path in (entry.path, entry.path[:-len(".html")] + ".json"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+# Global instance
+diagnostics = ParseDiagnostics()
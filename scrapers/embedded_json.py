@@ -0,0 +1,58 @@
+"""
+Helpers for the JSON payloads property sites embed in their result pages
+
+Both sites render from a JSON blob shipped in a <script> tag; reading it is a
+single pass over the payload instead of a selector search per field per card.
+"""
+import json
+import re
+from collections import deque
+
+NEXT_DATA_RE = re.compile(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+
+
+def extract_next_data(html):
+    """Return the decoded Next.js __NEXT_DATA__ payload, or None if the page has none"""
+    match = NEXT_DATA_RE.search(html or "")
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except ValueError:
+        return None
+
+
+def extract_js_assignment(html, name):
+    """Return the decoded object assigned to a global in an inline script,
+    e.g. extract_js_assignment(html, "window.jsonModel")"""
+    match = re.search(re.escape(name) + r"\s*=\s*(\{.*?\})\s*;?\s*</script>", html or "", re.S)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except ValueError:
+        return None
+
+
+def find_key(data, key):
+    """Return the value stored under key closest to the top of a decoded payload"""
+    queue = deque([data])
+    while queue:
+        node = queue.popleft()
+        if isinstance(node, dict):
+            if key in node:
+                return node[key]
+            queue.extend(node.values())
+        elif isinstance(node, list):
+            queue.extend(node)
+    return None
+
+
+def to_int(value):
+    """Best-effort int from a JSON number or a display string like "£1,250 pcm" """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    digits = re.sub(r"[^\d]", "", str(value).split(".")[0])
+    return int(digits) if digits else None
@@ -0,0 +1,99 @@
+"""
+Selector cascades for the DOM parsers
+
+Most fields on a results page have moved between several layouts, so each is
+read with a list of alternative selectors. A rule tries the selector that
+matched last time first and only falls back to the others when it misses, so
+a page in the current layout costs one lookup per field instead of a scan per
+stale selector.
+
+Every lookup is counted per site, field and selector. A layout change shows up
+in /api/health as hits moving to a fallback selector (or to misses) rather
+than as slower parsing. Pages parsed in the parse pool count in the worker
+process; ParsePool sends those counts back to be merged here.
+"""
+import threading
+from collections import Counter
+
+
+class ExtractionStats:
+    """Hit counts per (site, field, selector); selector None counts misses"""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, site, field, selector):
+        with self._lock:
+            self._counts[(site, field, selector)] += 1
+
+    def drain(self):
+        """Return the counts gathered since the last drain and reset them"""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        return counts
+
+    def merge(self, counts):
+        """Add counts drained in another process"""
+        if counts:
+            with self._lock:
+                self._counts.update(counts)
+
+    def snapshot(self):
+        """Counts grouped as {site: {field: {"hits": {selector: n}, "misses": n}}}"""
+        with self._lock:
+            counts = list(self._counts.items())
+        stats = {}
+        for (site, field, selector), count in sorted(counts, key=lambda item: (item[0][0], item[0][1], -item[1])):
+            entry = stats.setdefault(site, {}).setdefault(field, {"hits": {}, "misses": 0})
+            if selector is None:
+                entry["misses"] += count
+            else:
+                entry["hits"][selector] = count
+        return stats
+
+
+class ExtractionRule:
+    """Alternative selectors for one field, tried last winner first.
+    The selectors are alternatives for different layouts, so whichever one
+    matches is taken as the field."""
+    __slots__ = ("site", "field", "selectors", "_preferred")
+
+    def __init__(self, site, field, *selectors):
+        self.site = site
+        self.field = field
+        self.selectors = selectors
+        self._preferred = 0
+
+    def _candidates(self):
+        preferred = self._preferred
+        yield preferred
+        for index in range(len(self.selectors)):
+            if index != preferred:
+                yield index
+
+    def first(self, node):
+        """First element matched by the rule inside node, or None"""
+        for index in self._candidates():
+            match = node.css_first(self.selectors[index])
+            if match is not None:
+                self._preferred = index
+                extraction_stats.record(self.site, self.field, self.selectors[index])
+                return match
+        extraction_stats.record(self.site, self.field, None)
+        return None
+
+    def all(self, node):
+        """Every element matched by the first selector that matches anything"""
+        for index in self._candidates():
+            matches = node.css(self.selectors[index])
+            if matches:
+                self._preferred = index
+                extraction_stats.record(self.site, self.field, self.selectors[index])
+                return matches
+        extraction_stats.record(self.site, self.field, None)
+        return []
+
+
+# Global instance
+extraction_stats = ExtractionStats()
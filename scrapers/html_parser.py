@@ -0,0 +1,217 @@
+"""
+HTML parser backends for the scrapers
+
+The scrapers only need CSS selection, text, attributes and parent links, so
+they go through a small Node interface and the backend is picked by config:
+
+    HTML_PARSER_BACKEND=selectolax   lexbor via selectolax (fastest)
+    HTML_PARSER_BACKEND=lxml         BeautifulSoup with the lxml tree builder
+    HTML_PARSER_BACKEND=html.parser  BeautifulSoup with the stdlib parser
+
+A backend whose package isn't installed falls back to the next one down.
+Run benchmarks/parse_benchmark.py to compare them on saved pages.
+
+Passing a Strainer parses only the parts of the page a scraper reads (the
+listing cards, pagination and result count): the BeautifulSoup backends build
+just the matching subtrees. lexbor has no partial mode and is already faster
+at building the whole tree than the others are at building part of it.
+"""
+import os
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+from utils.logger import logger
+
+BACKENDS = ("selectolax", "lxml", "html.parser")
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml  # noqa: F401 - only needed as a BeautifulSoup tree builder
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+class SoupNode:
+    """Node backed by a BeautifulSoup tag"""
+    __slots__ = ("_tag",)
+
+    def __init__(self, tag):
+        self._tag = tag
+
+    @property
+    def tag(self):
+        return self._tag.name
+
+    @property
+    def key(self):
+        """Identity of the underlying element, stable while the tree is alive"""
+        return id(self._tag)
+
+    @property
+    def parent(self):
+        parent = self._tag.parent
+        return SoupNode(parent) if parent is not None else None
+
+    @property
+    def html(self):
+        return str(self._tag)
+
+    def css(self, selector):
+        return [SoupNode(tag) for tag in self._tag.select(selector)]
+
+    def css_first(self, selector):
+        tag = self._tag.select_one(selector)
+        return SoupNode(tag) if tag is not None else None
+
+    def text(self):
+        return self._tag.get_text()
+
+    def attr(self, name, default=None):
+        value = self._tag.get(name, default)
+        # BeautifulSoup splits multi-valued attributes such as class
+        return " ".join(value) if isinstance(value, list) else value
+
+    def has_attr(self, name):
+        return self._tag.has_attr(name)
+
+
+class LexborNode:
+    """Node backed by a selectolax lexbor node"""
+    __slots__ = ("_node",)
+
+    def __init__(self, node):
+        self._node = node
+
+    @property
+    def tag(self):
+        return self._node.tag
+
+    @property
+    def key(self):
+        """Identity of the underlying element, stable while the tree is alive"""
+        return self._node.mem_id
+
+    @property
+    def parent(self):
+        parent = self._node.parent
+        return LexborNode(parent) if parent is not None else None
+
+    @property
+    def html(self):
+        return self._node.html
+
+    def css(self, selector):
+        # lexbor includes the node itself in its matches, BeautifulSoup doesn't
+        own_id = self._node.mem_id
+        return [LexborNode(node) for node in self._node.css(selector) if node.mem_id != own_id]
+
+    def css_first(self, selector):
+        node = self._node.css_first(selector)
+        if node is not None and node.mem_id == self._node.mem_id:
+            matches = self.css(selector)
+            return matches[0] if matches else None
+        return LexborNode(node) if node is not None else None
+
+    def text(self):
+        return self._node.text(deep=True)
+
+    def attr(self, name, default=None):
+        value = self._node.attributes.get(name, default)
+        # Valueless attributes come back as None
+        return "" if value is None and name in self._node.attributes else value
+
+    def has_attr(self, name):
+        return name in self._node.attributes
+
+
+SIMPLE_SELECTOR_RE = re.compile(r"^(?P<tag>[a-zA-Z][\w-]*)?(?P<parts>(?:\.[\w-]+|\[[^\]]+\])*)$")
+SELECTOR_PART_RE = re.compile(r"\.([\w-]+)|\[\s*([\w-]+)\s*(?:(\*?=)\s*[\"']?([^\"'\]]*)[\"']?)?\s*\]")
+
+
+class Strainer:
+    """Which elements to keep in a partial parse, given as simple CSS selectors
+    (tag, .class, [attr], [attr='value'] and [attr*='value'] combined)"""
+
+    def __init__(self, *selectors):
+        self.selectors = selectors
+        self._rules = [self._compile(selector) for selector in selectors]
+        self.soup_strainer = SoupStrainer(self.matches)
+
+    @staticmethod
+    def _compile(selector):
+        match = SIMPLE_SELECTOR_RE.match(selector.strip())
+        if not match:
+            raise ValueError(f"Unsupported strainer selector: {selector!r}")
+        classes, attrs = [], []
+        for class_name, attr, op, value in SELECTOR_PART_RE.findall(match.group("parts")):
+            if class_name:
+                classes.append(class_name)
+            else:
+                attrs.append((attr, op, value))
+        return (match.group("tag") or "").lower(), classes, attrs
+
+    def matches(self, name, attrs):
+        """Whether a start tag opens a subtree we want to keep"""
+        for tag, classes, rule_attrs in self._rules:
+            if tag and tag != name:
+                continue
+            if classes:
+                element_classes = attrs.get("class") or ""
+                element_classes = element_classes.split() if isinstance(element_classes, str) else element_classes
+                if not all(c in element_classes for c in classes):
+                    continue
+            if all(self._attr_matches(attrs.get(attr), op, value) for attr, op, value in rule_attrs):
+                return True
+        return False
+
+    @staticmethod
+    def _attr_matches(actual, op, value):
+        if actual is None:
+            return False
+        if isinstance(actual, list):
+            actual = " ".join(actual)
+        if op == "=":
+            return actual == value
+        if op == "*=":
+            return value in actual
+        return True
+
+
+def resolve_backend(name):
+    """The requested backend, or the nearest one that is installed"""
+    name = (name or BACKENDS[0]).lower()
+    if name not in BACKENDS:
+        logger.warning(f"[Parser] Unknown HTML parser backend {name!r}, using {BACKENDS[0]}")
+        name = BACKENDS[0]
+    if name == "selectolax" and LexborHTMLParser is None:
+        name = "lxml"
+    if name == "lxml" and not HAS_LXML:
+        name = "html.parser"
+    return name
+
+
+HTML_PARSER_BACKEND = resolve_backend(os.getenv("HTML_PARSER_BACKEND", "selectolax"))
+PARTIAL_PARSE = os.getenv("HTML_PARTIAL_PARSE", "true").lower() == "true"
+
+
+def parse_html(html, backend=None, only=None):
+    """Parse a page and return its root node. With a Strainer in only, just the
+    matching subtrees are built (where the backend supports it)."""
+    backend = resolve_backend(backend) if backend else HTML_PARSER_BACKEND
+    if backend == "selectolax":
+        return LexborNode(LexborHTMLParser(html).root)
+    return SoupNode(BeautifulSoup(html, backend, parse_only=only.soup_strainer if only else None))
+
+
+def parse_partial(html, only, required):
+    """Parse only the parts of a page picked out by a Strainer, falling back to
+    the whole page if the partial tree has nothing matching required"""
+    if PARTIAL_PARSE:
+        root = parse_html(html, only=only)
+        if root.css_first(required):
+            return root
+    return parse_html(html)
@@ -0,0 +1,198 @@
+"""
+Shared HTTP client for all scrapers
+
+Owns one aiohttp session (keep-alive connection pool with per-host limits and
+DNS caching) for the lifetime of the process. Flask runs every async view on a
+fresh event loop, so the session lives on its own event loop in a background
+thread and callers submit requests to it from whatever loop or thread they are on.
+"""
+import asyncio
+import atexit
+import os
+import threading
+import time
+import aiohttp
+from scrapers.proxy_rotator import get_proxy_rotator
+from utils.logger import logger
+from utils.security import scraper_api_monitor
+
+# Upstream statuses that count against a provider's health. Other non-200s
+# (e.g. a 404 from the target site) are the site's answer, not a provider fault.
+PROVIDER_FAILURE_STATUSES = {403, 429}
+
+
+class HTTPClient:
+    """Connection-pooled HTTP client shared by the scrapers and bots"""
+
+    def __init__(self):
+        self.limit = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+        self.limit_per_host = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '20'))
+        self.dns_cache_ttl = int(os.getenv('HTTP_DNS_CACHE_TTL', '300'))
+        self.keepalive_timeout = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '60'))
+        self.timeout = float(os.getenv('HTTP_TIMEOUT', '60'))
+        # Hedging: if a fetch is slower than this percentile of the provider's
+        # recent latency, race a second request through another provider
+        self.hedge_enabled = os.getenv('HEDGE_REQUESTS', 'true').lower() == 'true'
+        self.hedge_percentile = float(os.getenv('HEDGE_PERCENTILE', '95'))
+        self.hedge_min_delay = float(os.getenv('HEDGE_MIN_DELAY', '2'))
+        self.hedge_default_delay = float(os.getenv('HEDGE_DEFAULT_DELAY', '15'))
+        self.hedged_count = 0
+        self.hedge_wins = 0
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        """Start the background loop and open the session (once per process)"""
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="http-client", daemon=True)
+            thread.start()
+            asyncio.run_coroutine_threadsafe(self._open_session(), loop).result()
+
+            self._loop, self._thread = loop, thread
+            atexit.register(self.close)
+            logger.info("[HTTP] Client started (limit=%d, per_host=%d, dns_ttl=%ds)",
+                        self.limit, self.limit_per_host, self.dns_cache_ttl)
+            return loop
+
+    async def _open_session(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_timeout
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": "Mozilla/5.0"}
+        )
+
+    async def _get(self, url, headers=None, timeout=None, raw=False):
+        client_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+        async with self._session.get(url, headers=headers, timeout=client_timeout) as response:
+            return response.status, await (response.read() if raw else response.text())
+
+    async def _get_upstream(self, url, timeout=None, provider=None, raw=False):
+        """Fetch a target URL through the provider chosen by the rotator and
+        record the outcome and latency against that provider"""
+        rotator = get_proxy_rotator()
+        provider = provider or rotator.choose_provider()
+        started = time.monotonic()
+        succeeded = False
+        abandoned = False
+        try:
+            status, text = await self._get(rotator.build_proxy_url(provider, url), timeout=timeout, raw=raw)
+            succeeded = status < 500 and status not in PROVIDER_FAILURE_STATUSES
+            return status, text
+        except asyncio.CancelledError:
+            abandoned = True
+            raise
+        finally:
+            rotator.record_result(provider, succeeded, time.monotonic() - started, abandoned=abandoned)
+
+    def _hedge_delay(self, rotator, provider):
+        """How long to wait for the primary request before hedging it"""
+        delay = rotator.latency_percentile(provider, self.hedge_percentile)
+        if delay is None:
+            delay = self.hedge_default_delay
+        return max(delay, self.hedge_min_delay)
+
+    async def _get_hedged(self, url, timeout=None, raw=False):
+        """Fetch via the preferred provider, racing a second request through
+        another provider if the first is slower than usual. The first good
+        response wins and the other request is cancelled."""
+        if not self.hedge_enabled:
+            return await self._get_upstream(url, timeout, raw=raw)
+
+        rotator = get_proxy_rotator()
+        primary_provider = rotator.choose_provider()
+        primary = asyncio.ensure_future(self._get_upstream(url, timeout, primary_provider, raw))
+
+        done, _ = await asyncio.wait({primary}, timeout=self._hedge_delay(rotator, primary_provider))
+        if done or not scraper_api_monitor.reserve_hedge():
+            return await primary
+
+        # Falls back to a fresh request on the same provider if it is the only one
+        hedge_provider = rotator.choose_provider(exclude=(primary_provider,))
+        logger.info("[HTTP] Hedging slow %s request via %s", primary_provider, hedge_provider)
+        self.hedged_count += 1
+        hedge = asyncio.ensure_future(self._get_upstream(url, timeout, hedge_provider, raw))
+
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.exception() and task.result()[0] == 200:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Neither returned a page; report the primary's outcome
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the client loop and return a concurrent future"""
+        loop = self._start()
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    async def fetch(self, url, headers=None, timeout=None):
+        """Fetch a URL from any event loop. Returns (status, text)"""
+        loop = self._start()
+        if asyncio.get_running_loop() is loop:
+            return await self._get(url, headers, timeout)
+        return await asyncio.wrap_future(self.submit(self._get(url, headers, timeout)))
+
+    async def fetch_upstream(self, url, timeout=None, raw=False):
+        """Fetch a target site URL via the best scraping provider. Returns (status, text),
+        or (status, bytes) with raw=True"""
+        loop = self._start()
+        if asyncio.get_running_loop() is loop:
+            return await self._get_hedged(url, timeout, raw)
+        return await asyncio.wrap_future(self.submit(self._get_hedged(url, timeout, raw)))
+
+    def fetch_upstream_sync(self, url, timeout=None):
+        """Blocking variant of fetch_upstream for synchronous callers"""
+        loop = self._start()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("fetch_upstream_sync cannot be called from the HTTP client loop")
+        return asyncio.run_coroutine_threadsafe(self._get_hedged(url, timeout), loop).result()
+
+    def fetch_sync(self, url, headers=None, timeout=None):
+        """Blocking fetch for synchronous callers. Returns (status, text)"""
+        loop = self._start()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("fetch_sync cannot be called from the HTTP client loop")
+        return asyncio.run_coroutine_threadsafe(self._get(url, headers, timeout), loop).result()
+
+    def close(self):
+        """Close the session and stop the background loop"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None:
+                return
+            self._loop = self._thread = None
+
+        try:
+            if self._session is not None:
+                asyncio.run_coroutine_threadsafe(self._session.close(), loop).result(timeout=5)
+        except Exception as e:
+            logger.error("[HTTP] Error closing session: %s", str(e))
+        finally:
+            self._session = None
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=5)
+            loop.close()
+
+
+# Global instance
+http_client = HTTPClient()
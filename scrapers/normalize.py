@@ -0,0 +1,115 @@
+"""
+Typed listing fields, extracted once per page
+
+Scrapers produce listings of display strings ("£1,250 pcm", "3 beds 2 baths").
+normalize_listings() runs over a parsed page and adds typed fields so sorting,
+filtering and dedup don't re-parse those strings:
+
+    price_value     int, or None for "POA" and the like
+    price_period    "pcm", "pw" or "total"
+    bedrooms        int (a studio is 0), or None
+    bathrooms       int, or None
+    outcode         postcode outcode from the address, e.g. "M14", or ""
+    property_type   flat, studio, maisonette, detached, semi-detached,
+                    terraced, bungalow, house, land, or ""
+
+Values a scraper already read from structured data are kept; only missing
+ones are parsed from the text.
+"""
+import re
+
+PRICE_RE = re.compile(r"£\s*(\d[\d,]*)")
+NUMBER_RE = re.compile(r"\d[\d,]*")
+PERIOD_RE = re.compile(r"\b(pcm|per\s+(?:calendar\s+)?month|monthly|pw|p/w|per\s+week|weekly)\b", re.I)
+BEDROOMS_RE = re.compile(r"(\d+)\s*(?:-\s*)?bed(?:room)?s?\b", re.I)
+BATHROOMS_RE = re.compile(r"(\d+)\s*(?:-\s*)?bath(?:room)?s?\b", re.I)
+STUDIO_RE = re.compile(r"\bstudio\b", re.I)
+# Listing addresses end with the postcode or its outcode, when they have one
+OUTCODE_RE = re.compile(r"\b([A-Z]{1,2}\d[A-Z\d]?)(?:\s*\d[A-Z]{2})?[\s.,]*$")
+
+# First match wins, so the more specific types come first
+PROPERTY_TYPE_RE = re.compile(
+    r"\b(semi[\s_-]?detached|end[\s_-]of[\s_-]terrace|mid[\s_-]terrace|terrace[ds]?|detached"
+    r"|maisonette|studio|flat|apartment|penthouse|bungalow|cottage|town[\s_-]?house|house|land|plot)\b",
+    re.I
+)
+PROPERTY_TYPES = {
+    "apartment": "flat", "penthouse": "flat", "terrace": "terraced", "terraces": "terraced",
+    "cottage": "house", "townhouse": "house", "plot": "land"
+}
+
+
+def price_period(price):
+    """pcm, pw or total for a price string"""
+    match = PERIOD_RE.search(price)
+    if not match:
+        return "total"
+    unit = match.group(1).lower()
+    return "pw" if unit in ("pw", "p/w") or "week" in unit else "pcm"
+
+
+def price_value(price):
+    """The pound amount in a price string, or None if it has no number"""
+    match = PRICE_RE.search(price)
+    digits = match.group(1) if match else (NUMBER_RE.findall(price) or [None])[0]
+    return int(digits.replace(",", "")) if digits else None
+
+
+def property_type(*texts):
+    """Canonical property type from the first text that names one"""
+    for text in texts:
+        match = PROPERTY_TYPE_RE.search(text) if text else None
+        if match:
+            found = re.sub(r"[\s_-]+", "-", match.group(1).lower())
+            if found.startswith("semi"):
+                return "semi-detached"
+            if "terrace" in found:
+                return "terraced"
+            return PROPERTY_TYPES.get(found.replace("-", ""), found)
+    return ""
+
+
+def first_count(pattern, *texts):
+    for text in texts:
+        match = pattern.search(text) if text else None
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def normalize_listing(listing):
+    """Add the typed fields to one listing in place"""
+    title = listing.get("title") or ""
+    desc = listing.get("desc") or listing.get("description") or ""
+    specs = listing.get("specs") or ""
+
+    if listing.get("price_value") is None:
+        listing["price_value"] = price_value(listing.get("price") or "")
+    if not listing.get("price_period"):
+        listing["price_period"] = price_period(listing.get("price") or "")
+
+    if listing.get("bedrooms") is None:
+        bedrooms = first_count(BEDROOMS_RE, specs, title, desc)
+        if bedrooms is None and STUDIO_RE.search(f"{title} {specs}"):
+            bedrooms = 0
+        listing["bedrooms"] = bedrooms
+    if listing.get("bathrooms") is None:
+        listing["bathrooms"] = first_count(BATHROOMS_RE, specs, title, desc)
+    if not specs and listing["bedrooms"]:
+        listing["specs"] = " ".join(
+            f"{n} {label}{'s' if n != 1 else ''}"
+            for n, label in ((listing["bedrooms"], "bed"), (listing["bathrooms"], "bath"))
+            if n is not None
+        )
+
+    outcode = OUTCODE_RE.search((listing.get("address") or "").upper())
+    listing["outcode"] = outcode.group(1) if outcode else ""
+    listing["property_type"] = property_type(listing.get("property_type"), title, desc)
+    return listing
+
+
+def normalize_listings(listings):
+    """Add the typed fields to every listing on a page, in place"""
+    for listing in listings:
+        normalize_listing(listing)
+    return listings
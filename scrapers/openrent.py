@@ -11,18 +11,16 @@ TODO: Implement proper solution using:
 """
 
 import os
-import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 import logging
 import time
 from urllib.parse import urlencode
+from scrapers.http_client import http_client
+from scrapers.html_parser import parse_html
+from scrapers.normalize import normalize_listings
+from utils.listing import Listing
 
 load_dotenv()
-SCRAPER_API_KEY = os.getenv("SCRAPER_API_KEY")
-
-def get_proxy_url(url):
-    return f"http://api.scraperapi.com?api_key={SCRAPER_API_KEY}&url={url}"
 
 def scrape_openrent(location, min_price="", max_price="", min_beds="", keywords="", page=1):
     try:
@@ -45,20 +43,15 @@ def scrape_openrent(location, min_price="", max_price="", min_beds="", keywords=
         if page > 1:
             search_url += f"&page={page}"
 
-        # Use proxy
-        proxy_url = get_proxy_url(search_url)
         logging.info(f"[OpenRent] Scraping page {page}: {search_url}")
 
         # Make request with retry mechanism
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                response = requests.get(
-                    proxy_url,
-                    headers={"User-Agent": "Mozilla/5.0"},
-                    timeout=30
-                )
-                response.raise_for_status()
+                status, html = http_client.fetch_upstream_sync(search_url, timeout=30)
+                if status != 200:
+                    raise Exception(f"HTTP {status}")
                 break
             except Exception as e:
                 if attempt == max_retries - 1:
@@ -73,76 +66,7 @@ def scrape_openrent(location, min_price="", max_price="", min_beds="", keywords=
                     }
                 time.sleep(2 ** attempt)  # Exponential backoff
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract total results and pages
-        total_results = 0
-        total_results_elem = soup.select_one('.searchTitle')
-        if total_results_elem:
-            try:
-                total_text = total_results_elem.text
-                total_results = int(''.join(filter(str.isdigit, total_text)))
-            except:
-                logging.warning("[OpenRent] Could not parse total results")
-
-        # Calculate total pages (24 results per page)
-        total_pages = (total_results + 23) // 24 if total_results > 0 else 1
-        
-        # Find all property listings
-        listings = []
-        property_cards = soup.select("a.pli")
-        
-        for card in property_cards:
-            try:
-                # Extract image
-                img_elem = card.select_one("img.propertyPic")
-                image_url = img_elem.get('data-src') or img_elem.get('src') if img_elem else ""
-
-                # Extract price
-                price_elem = card.select_one(".price")
-                price = price_elem.text.strip() if price_elem else "Price not specified"
-
-                # Extract title and address
-                title_elem = card.select_one(".banda")
-                title = title_elem.text.strip() if title_elem else ""
-
-                # Extract description
-                desc_elem = card.select_one(".description")
-                description = desc_elem.text.strip() if desc_elem else ""
-
-                # Extract property link
-                property_url = "https://www.openrent.co.uk" + card['href'] if card.has_attr('href') else ""
-
-                # Extract property ID from URL
-                property_id = property_url.split('/')[-1] if property_url else None
-
-                listing = {
-                    "title": title,
-                    "price": price,
-                    "address": title,  # OpenRent combines address in title
-                    "description": description,
-                    "image": image_url,
-                    "url": property_url,
-                    "property_id": property_id,
-                    "source": "OpenRent"
-                }
-                
-                listings.append(listing)
-
-            except Exception as e:
-                logging.error(f"[OpenRent] Error parsing listing: {str(e)}")
-                continue
-
-        results = {
-            "listings": listings,
-            "total_found": total_results,
-            "total_pages": total_pages,
-            "current_page": page,
-            "has_next_page": page < total_pages,
-            "is_complete": page >= total_pages
-        }
-
-        return results
+        return parse_openrent_html(html, page)
 
     except Exception as e:
         logging.error(f"[OpenRent] Scraping error: {str(e)}")
@@ -154,3 +78,78 @@ def scrape_openrent(location, min_price="", max_price="", min_beds="", keywords=
             "has_next_page": False,
             "is_complete": True
         }
+
+
+def parse_openrent_html(html, page=1):
+    """Parse an OpenRent results page into our results structure"""
+    root = parse_html(html)
+
+    # Extract total results and pages
+    total_results = 0
+    total_results_elem = root.css_first('.searchTitle')
+    if total_results_elem:
+        try:
+            total_text = total_results_elem.text()
+            total_results = int(''.join(filter(str.isdigit, total_text)))
+        except:
+            logging.warning("[OpenRent] Could not parse total results")
+
+    # Calculate total pages (24 results per page)
+    total_pages = (total_results + 23) // 24 if total_results > 0 else 1
+
+    # Find all property listings
+    listings = []
+    property_cards = root.css("a.pli")
+
+    for card in property_cards:
+        try:
+            # Extract image
+            img_elem = card.css_first("img.propertyPic")
+            image_url = img_elem.attr('data-src') or img_elem.attr('src') if img_elem else ""
+
+            # Extract price
+            price_elem = card.css_first(".price")
+            price = price_elem.text().strip() if price_elem else "Price not specified"
+
+            # Extract title and address
+            title_elem = card.css_first(".banda")
+            title = title_elem.text().strip() if title_elem else ""
+
+            # Extract description
+            desc_elem = card.css_first(".description")
+            description = desc_elem.text().strip() if desc_elem else ""
+
+            # Extract property link
+            property_url = "https://www.openrent.co.uk" + card.attr('href') if card.has_attr('href') else ""
+
+            # Extract property ID from URL
+            property_id = property_url.split('/')[-1] if property_url else None
+
+            listing = Listing(
+                title=title,
+                price=price,
+                address=title,  # OpenRent combines address in title
+                desc=description,
+                image=image_url,
+                url=property_url,
+                property_id=property_id,
+                source="OpenRent"
+            )
+
+            listings.append(listing)
+
+        except Exception as e:
+            logging.error(f"[OpenRent] Error parsing listing: {str(e)}")
+            continue
+
+    normalize_listings(listings)
+    results = {
+        "listings": listings,
+        "total_found": total_results,
+        "total_pages": total_pages,
+        "current_page": page,
+        "has_next_page": page < total_pages,
+        "is_complete": page >= total_pages
+    }
+
+    return results
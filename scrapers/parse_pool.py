@@ -0,0 +1,76 @@
+"""
+Process pool for CPU-bound page parsing
+
+Parsing a results page is pure CPU, so running it on a thread still holds the
+GIL and concurrent searches queue behind each other. Pages are handed to a
+pool of worker processes as raw bytes and only the parsed results come back.
+PARSE_POOL_SIZE=0 keeps parsing on a thread in this process.
+
+Workers send their selector hit counts back with each result, so
+/api/health reports the same extraction stats with or without the pool.
+"""
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from scrapers.extraction_rules import extraction_stats
+from utils.logger import logger
+
+
+def _run_counted(fn, *args):
+    """Run fn in a worker and return its result with the selector hits it recorded"""
+    return fn(*args), extraction_stats.drain()
+
+
+class ParsePool:
+    """Lazily started worker pool shared by the scrapers"""
+
+    def __init__(self):
+        self.size = int(os.getenv('PARSE_POOL_SIZE', str(min(4, os.cpu_count() or 1))))
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawned workers don't inherit the HTTP client's loop thread or held locks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                atexit.register(self.shutdown)
+                logger.info("[Parser] Started parse pool with %d workers", self.size)
+            return self._executor
+
+    async def run(self, fn, *args):
+        """Run a module-level parse function on the pool and await its result"""
+        if self.size <= 0:
+            return await asyncio.to_thread(fn, *args)
+
+        executor = self._get_executor()
+        try:
+            result, counts = await asyncio.get_running_loop().run_in_executor(executor, _run_counted, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool next time
+            logger.error("[Parser] Parse pool broke, restarting it")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            return await asyncio.to_thread(fn, *args)
+        extraction_stats.merge(counts)
+        return result
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global instance
+parse_pool = ParsePool()
@@ -0,0 +1,24 @@
+"""
+Parser versions recorded against cached results
+
+Each cached row stores the version of the parser(s) that built it, e.g.
+"zoopla:1", or "rightmove:1+zoopla:1" for combined pages. reparse_cache.py
+compares these against the current versions to find stale rows.
+"""
+from scrapers.rightmove_scrape import PARSER_VERSION as RIGHTMOVE_PARSER_VERSION
+from scrapers.zoopla import PARSER_VERSION as ZOOPLA_PARSER_VERSION
+
+PARSER_VERSIONS = {
+    "rightmove": RIGHTMOVE_PARSER_VERSION,
+    "zoopla": ZOOPLA_PARSER_VERSION
+}
+
+
+def parser_version_for(site):
+    """Current parser version string for a site, or None if it isn't versioned"""
+    site = (site or "").lower()
+    if site == "combined":
+        return "+".join(f"{name}:{version}" for name, version in sorted(PARSER_VERSIONS.items()))
+    if site in PARSER_VERSIONS:
+        return f"{site}:{PARSER_VERSIONS[site]}"
+    return None
@@ -1,18 +1,72 @@
 import os
 import random
+import threading
+import time
+from collections import deque
+from urllib.parse import quote
 from dotenv import load_dotenv
 from utils.logger import logger
 
 # Load environment variables
 load_dotenv()
 
+class ProviderStats:
+    """Rolling health and latency statistics for one scraping provider"""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)  # (succeeded, latency_seconds); succeeded is None for abandoned requests
+        self.state = "closed"  # closed -> open -> half_open -> closed
+        self.opened_at = None
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def outcomes(self):
+        """Whether each finished request succeeded, leaving out abandoned ones"""
+        return [ok for ok, _ in self.samples if ok is not None]
+
+    def success_rate(self):
+        outcomes = self.outcomes()
+        if not outcomes:
+            return 1.0
+        return sum(outcomes) / len(outcomes)
+
+    def latency_percentile(self, percentile):
+        """Latency of successful and abandoned requests at the given percentile (0-100)"""
+        latencies = sorted(latency for ok, latency in self.samples if ok is not False)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def to_dict(self):
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        return {
+            "state": self.state,
+            "samples": len(self.outcomes()),
+            "success_rate": round(self.success_rate(), 3),
+            "p50_latency": round(p50, 3) if p50 is not None else None,
+            "p95_latency": round(p95, 3) if p95 is not None else None,
+            "consecutive_failures": self.consecutive_failures
+        }
+
 class ProxyRotator:
+    """Route upstream fetches to the fastest healthy scraping provider"""
+
     def __init__(self):
         self.scraper_api_key = os.getenv("SCRAPER_API_KEY")
         self.brightdata_key = os.getenv("BRIGHTDATA_KEY")
         self.scrapingbee_key = os.getenv("SCRAPINGBEE_KEY")
-        self.proxy_scrape_key = os.getenv("PROXY_SCRAPE_KEY")
-        
+
+        # Circuit breaker and scoring settings
+        self.window = int(os.getenv("PROXY_STATS_WINDOW", "50"))
+        self.failure_threshold = int(os.getenv("PROXY_FAILURE_THRESHOLD", "5"))
+        self.min_success_rate = float(os.getenv("PROXY_MIN_SUCCESS_RATE", "0.5"))
+        self.min_samples = int(os.getenv("PROXY_MIN_SAMPLES", "10"))
+        self.open_seconds = float(os.getenv("PROXY_OPEN_SECONDS", "60"))
+        self.explore_rate = float(os.getenv("PROXY_EXPLORE_RATE", "0.05"))
+        self._lock = threading.Lock()
+
         # Initialize available scrapers
         self.scrapers = []
         if self.scraper_api_key:
@@ -21,48 +75,127 @@ class ProxyRotator:
             self.scrapers.append("brightdata")
         if self.scrapingbee_key:
             self.scrapers.append("scrapingbee")
-        if self.proxy_scrape_key:
-            self.scrapers.append("proxyscrape")
-            
+
         if not self.scrapers:
             logger.error("No scraping services configured. Please add API keys to .env file")
             raise ValueError("No scraping services available")
 
+        self.stats = {scraper: ProviderStats(self.window) for scraper in self.scrapers}
+
+    def build_proxy_url(self, scraper, url):
+        """Wrap a target URL in the API call for the given scraping service"""
+        target = quote(url, safe="")
+        if scraper == "scraperapi":
+            return f"http://api.scraperapi.com?api_key={self.scraper_api_key}&url={target}"
+        elif scraper == "brightdata":
+            return f"http://brd.superproxy.io:22225?api_key={self.brightdata_key}&url={target}"
+        elif scraper == "scrapingbee":
+            return f"https://app.scrapingbee.com/api/v1/?api_key={self.scrapingbee_key}&url={target}"
+        raise ValueError(f"Unknown scraper service: {scraper}")
+
+    def choose_provider(self, exclude=()):
+        """Pick the provider for the next request.
+
+        Open circuits whose cooldown has passed get a single half-open probe.
+        Otherwise traffic goes to the healthy provider with the lowest p50
+        latency, with a small share spread over the others so their stats
+        stay fresh. If every circuit is open the least recently tripped
+        provider is used rather than failing the search outright.
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [s for s in self.scrapers if s not in exclude] or list(self.scrapers)
+
+            for scraper in candidates:
+                stats = self.stats[scraper]
+                if stats.state == "open" and now - stats.opened_at >= self.open_seconds:
+                    stats.state = "half_open"
+                if stats.state == "half_open" and not stats.probe_in_flight:
+                    stats.probe_in_flight = True
+                    logger.info(f"[ProxyRotator] Probing {scraper} (half-open)")
+                    return scraper
+
+            healthy = [s for s in candidates if self.stats[s].state == "closed"]
+            if not healthy:
+                return min(candidates, key=lambda s: self.stats[s].opened_at or 0)
+
+            # Providers without latency data rank first so they get measured
+            ranked = sorted(healthy, key=lambda s: self.stats[s].latency_percentile(50) or 0.0)
+            if len(ranked) > 1 and random.random() < self.explore_rate:
+                return random.choice(ranked[1:])
+            return ranked[0]
+
+    def record_result(self, scraper, succeeded, latency, abandoned=False):
+        """Feed the outcome of a request back into the provider's health.
+
+        Abandoned requests (the loser of a hedged pair) only contribute their
+        elapsed time as a latency sample; they say nothing about health.
+        """
+        with self._lock:
+            stats = self.stats.get(scraper)
+            if stats is None:
+                return
+            stats.probe_in_flight = False
+            if abandoned:
+                stats.samples.append((None, latency))
+                return
+            stats.samples.append((succeeded, latency))
+
+            if succeeded:
+                stats.consecutive_failures = 0
+                if stats.state != "closed":
+                    stats.state = "closed"
+                    stats.opened_at = None
+                    logger.info(f"[ProxyRotator] {scraper} recovered, circuit closed")
+                return
+
+            stats.consecutive_failures += 1
+            if stats.state == "half_open":
+                stats.state = "open"
+                stats.opened_at = time.monotonic()
+                logger.warning(f"[ProxyRotator] {scraper} failed its probe, circuit re-opened")
+            elif stats.state == "closed" and (
+                stats.consecutive_failures >= self.failure_threshold or
+                (len(stats.outcomes()) >= self.min_samples and stats.success_rate() < self.min_success_rate)
+            ):
+                stats.state = "open"
+                stats.opened_at = time.monotonic()
+                logger.warning(f"[ProxyRotator] Circuit opened for {scraper} "
+                               f"(success rate {stats.success_rate():.0%}, {stats.consecutive_failures} consecutive failures)")
+
+    def latency_percentile(self, scraper, percentile):
+        """Recent latency of a provider at the given percentile, if known"""
+        with self._lock:
+            stats = self.stats.get(scraper)
+            return stats.latency_percentile(percentile) if stats else None
+
     def get_proxy_url(self, url):
-        """Get a proxy URL using a randomly selected scraping service"""
-        if not self.scrapers:
-            logger.error("No scraping services available")
-            return url
-            
-        # Randomly select a scraper
-        scraper = random.choice(self.scrapers)
-        
-        try:
-            if scraper == "scraperapi":
-                return f"http://api.scraperapi.com?api_key={self.scraper_api_key}&url={url}"
-            elif scraper == "brightdata":
-                return f"http://brd.superproxy.io:22225?api_key={self.brightdata_key}&url={url}"
-            elif scraper == "scrapingbee":
-                return f"https://app.scrapingbee.com/api/v1/?api_key={self.scrapingbee_key}&url={url}"
-            elif scraper == "proxyscrape":
-                return f"https://api.proxyscrape.com/v2/?request=getproxies&protocol=http&timeout=10000&country=all&ssl=all&anonymity=all&url={url}"
-            else:
-                logger.error(f"Unknown scraper service: {scraper}")
-                return url
-        except Exception as e:
-            logger.error(f"Error generating proxy URL for {scraper}: {str(e)}")
-            # If one service fails, try another
-            self.scrapers.remove(scraper)
-            if self.scrapers:
-                return self.get_proxy_url(url)
-            return url
+        """Get a proxy URL using the currently preferred scraping service"""
+        return self.build_proxy_url(self.choose_provider(), url)
 
     def get_available_scrapers(self):
         """Return list of available scraping services"""
         return self.scrapers.copy()
 
+    def get_stats(self):
+        """Per-provider health and latency statistics"""
+        with self._lock:
+            return {scraper: self.stats[scraper].to_dict() for scraper in self.scrapers}
+
     def remove_scraper(self, scraper):
         """Remove a scraper from the rotation if it's failing"""
-        if scraper in self.scrapers:
-            self.scrapers.remove(scraper)
-            logger.warning(f"Removed {scraper} from rotation due to failures") 
\ No newline at end of file
+        with self._lock:
+            if scraper in self.scrapers and len(self.scrapers) > 1:
+                self.scrapers.remove(scraper)
+                logger.warning(f"Removed {scraper} from rotation due to failures")
+
+_proxy_rotator = None
+_proxy_rotator_lock = threading.Lock()
+
+def get_proxy_rotator():
+    """Shared rotator used for every upstream fetch (created on first use)"""
+    global _proxy_rotator
+    with _proxy_rotator_lock:
+        if _proxy_rotator is None:
+            _proxy_rotator = ProxyRotator()
+        return _proxy_rotator
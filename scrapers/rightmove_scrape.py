@@ -1,41 +1,214 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import json
 import os
+import re
 from dotenv import load_dotenv
+from scrapers.http_client import http_client
+from scrapers.html_parser import Strainer, parse_partial
+from scrapers.parse_pool import parse_pool
+from scrapers.diagnostics import diagnostics
+from scrapers.extraction_rules import ExtractionRule
+from scrapers.normalize import normalize_listings
+from scrapers.embedded_json import extract_js_assignment, extract_next_data, find_key, to_int
+from scrapers.rightmove_url import get_rightmove_search_api_url
+from utils.listing import Listing
+from utils.raw_store import raw_page_store
 
 # Load environment variables
 load_dotenv()
 
-def get_proxy_url(url):
-    """Get the proxy URL for ScraperAPI"""
-    api_key = os.getenv("SCRAPER_API_KEY")
-    if not api_key:
-        raise ValueError("SCRAPER_API_KEY not found in environment variables")
-    return f"http://api.scraperapi.com?api_key={api_key}&url={url}"
+# Bump whenever parse_rightmove_html changes what it extracts, so
+# reparse_cache.py rebuilds cached results from the stored raw pages
+PARSER_VERSION = 4
+
+# Listings per Rightmove results page
+RIGHTMOVE_PAGE_SIZE = 24
+
+# Property ID in a card link, e.g. /properties/123456789#/?channel=RES_BUY
+PROPERTY_ID_RE = re.compile(r"/properties/(\d+)")
+
+# Card containers the card parser looks for, plus the other parts of a results
+# page it reads; partial parses keep only these
+RIGHTMOVE_CARD_SELECTORS = (
+    "[data-test='propertyCard']", ".propertyCard", ".l-searchResult",
+    ".PropertyCard_propertyCardContainer__VSRSA", ".is-list", "[data-test='property-details']"
+)
+RIGHTMOVE_STRAINER = Strainer(*RIGHTMOVE_CARD_SELECTORS, ".searchHeader-resultCount", ".no-results-message")
+
+# Selector cascades for the card parser, newest layout first
+RIGHTMOVE_CARDS = ExtractionRule("rightmove", "cards", *RIGHTMOVE_CARD_SELECTORS)
+RIGHTMOVE_PRICE = ExtractionRule("rightmove", "price", "[data-test='property-price']", ".PropertyPrice_price__VL65t", ".propertyCard-priceValue", ".price-text")
+RIGHTMOVE_TITLE = ExtractionRule("rightmove", "title", "[data-test='property-title']", ".PropertyAddress_address__LYRPq", ".propertyCard-title", ".property-title")
+RIGHTMOVE_ADDRESS = ExtractionRule("rightmove", "address", "[data-test='property-address']", ".propertyCard-address", ".property-address")
+RIGHTMOVE_DESC = ExtractionRule("rightmove", "desc", "[data-test='property-description']", ".PropertyCardSummary_summary__oIv57", ".propertyCard-description", ".property-description")
+RIGHTMOVE_LINK = ExtractionRule("rightmove", "link", "[data-test='property-link']", "a.propertyCard-link", "a[href*='/properties/']")
+RIGHTMOVE_IMAGE = ExtractionRule("rightmove", "image", "[data-test='property-image'] img", ".PropertyCardImage_slide__B8bBX img", 'img[itemprop="image"]', ".property-image img")
+
+# Rent frequencies in the search model; sale prices are "not specified"
+RIGHTMOVE_PRICE_PERIODS = {"monthly": "pcm", "weekly": "pw"}
+
+# Ask Rightmove's JSON search API directly, falling back to the results page
+USE_SEARCH_API = os.getenv('RIGHTMOVE_SEARCH_API', 'false').lower() == 'true'
+
+def error_results(page):
+    """Results returned when a page could not be fetched or parsed"""
+    return {
+        "listings": [],
+        "total_found": 0,
+        "total_pages": page,
+        "current_page": page,
+        "has_next_page": False,
+        "is_complete": True
+    }
+
+def fetch_targets(url):
+    """Upstream URLs to try for a results page, in order"""
+    if USE_SEARCH_API:
+        return [get_rightmove_search_api_url(url), url]
+    return [url]
 
 def scrape_rightmove_from_url(url, page=1, get_total_only=False):
+    """Fetch and parse a Rightmove results page (blocking)"""
     try:
-        # Remove URL modification since we handle it in URL generation
-        proxy_url = get_proxy_url(url)
-        print(f"[Rightmove] Scraping page {page}:", proxy_url)
-
-        res = requests.get(proxy_url, headers={"User-Agent": "Mozilla/5.0"})
-        soup = BeautifulSoup(res.text, "html.parser")
+        print(f"[Rightmove] Scraping page {page}:", url)
+        for target in fetch_targets(url):
+            status, html = http_client.fetch_upstream_sync(target)
+            if status == 200:
+                raw_page_store.save(target, html)
+                break
+    except Exception as e:
+        print("[Rightmove ERROR]", e)
+        return error_results(page)
 
-        # Debug: Print all available classes in the HTML
-        print("\n[Rightmove DEBUG] Available classes in HTML:")
-        for element in soup.find_all(class_=True):
-            print(f"Class: {element['class']}")
+    return parse_rightmove_html(html, url, page, get_total_only)
 
-        # Debug: Print the full HTML if no cards are found
-        cards = soup.select(".PropertyCard_propertyCardContainer__VSRSA")
-        if not cards:
-            print("\n[Rightmove DEBUG] No property cards found. Full HTML:")
-            print(soup.prettify())
+async def async_scrape_rightmove_from_url(url, page=1, get_total_only=False, deadline=None):
+    """Fetch and parse a Rightmove results page without blocking the event loop"""
+    try:
+        print(f"[Rightmove] Scraping page {page}:", url)
+        for target in fetch_targets(url):
+            if deadline and deadline.expired:
+                raise TimeoutError("deadline passed before fetching page")
+            status, html = await http_client.fetch_upstream(target, timeout=deadline.remaining() if deadline else None, raw=True)
+            if status == 200:
+                await asyncio.to_thread(raw_page_store.save, target, html)
+                break
+    except Exception as e:
+        print("[Rightmove ERROR]", e)
+        return error_results(page)
+
+    # Parse in a worker process so concurrent searches don't queue on the GIL
+    return await parse_pool.run(parse_rightmove_html, html, url, page, get_total_only)
+
+def extract_rightmove_json(body):
+    """Find the search results model in a results page or search API response"""
+    stripped = (body or "").lstrip()
+    if stripped.startswith("{"):
+        try:
+            model = json.loads(stripped)
+        except ValueError:
+            model = None
+        if isinstance(model, dict) and "properties" in model:
+            return model
+
+    model = extract_js_assignment(body, "window.jsonModel")
+    if isinstance(model, dict) and "properties" in model:
+        return model
+
+    data = extract_next_data(body)
+    model = find_key(data, "searchResults") if data else None
+    if isinstance(model, dict) and "properties" in model:
+        return model
+    return None
+
+def parse_json_property(prop):
+    """Convert one property from Rightmove's search model into a listing"""
+    price = prop.get("price") or {}
+    display_prices = price.get("displayPrices") or [{}]
+    bedrooms = to_int(prop.get("bedrooms"))
+    bathrooms = to_int(prop.get("bathrooms"))
+    specs = " ".join(
+        f"{count} {label}{'s' if count != 1 else ''}"
+        for count, label in ((bedrooms, "bed"), (bathrooms, "bath"))
+        if count is not None
+    )
+    images = prop.get("propertyImages") or {}
+    location = prop.get("location") or {}
+    property_url = prop.get("propertyUrl") or f"/properties/{prop.get('id')}"
+    if not property_url.startswith("http"):
+        property_url = "https://www.rightmove.co.uk" + property_url
+
+    return Listing(
+        title=prop.get("propertyTypeFullDescription") or prop.get("displayAddress") or "",
+        price=display_prices[0].get("displayPrice") or "",
+        address=prop.get("displayAddress") or "",
+        desc=prop.get("summary") or "",
+        specs=specs,
+        image=images.get("mainImageSrc") or "",
+        url=property_url,
+        property_id=str(prop.get("id") or ""),
+        source="Rightmove",
+        price_value=to_int(price.get("amount")),
+        price_period=RIGHTMOVE_PRICE_PERIODS.get(price.get("frequency")),
+        bedrooms=bedrooms,
+        bathrooms=bathrooms,
+        latitude=location.get("latitude"),
+        longitude=location.get("longitude"),
+        property_type=prop.get("propertySubType") or ""
+    )
+
+def parse_rightmove_json(model, page=1, get_total_only=False):
+    """Build our results structure straight from Rightmove's search model"""
+    total_results = to_int(model.get("resultCount")) or 0
+    pagination = model.get("pagination") or {}
+    total_pages = to_int(pagination.get("total")) or -(-total_results // RIGHTMOVE_PAGE_SIZE)
+    if get_total_only:
+        return total_pages
+
+    listings = []
+    for prop in model.get("properties") or []:
+        try:
+            listings.append(parse_json_property(prop))
+        except Exception as e:
+            print("[Rightmove Listing Error]", e)
+
+    if not total_pages:
+        # No count in the model; only a full page suggests there is another
+        total_pages = page + 1 if len(listings) >= RIGHTMOVE_PAGE_SIZE else page
+
+    print(f"[Rightmove] Parsed {len(listings)} listings from the search model ({total_results} results, {total_pages} pages)")
+    return {
+        "listings": listings,
+        "total_found": total_results,
+        "total_pages": total_pages,
+        "current_page": page,
+        "has_next_page": page < total_pages,
+        "is_complete": page >= total_pages,
+        "no_results": not listings
+    }
+
+def parse_rightmove_html(html, url, page=1, get_total_only=False):
+    """Parse a Rightmove results page or search API response (text or raw bytes)
+    into our results structure"""
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+    model = extract_rightmove_json(html)
+    if model is not None:
+        results = parse_rightmove_json(model, page, get_total_only)
+    else:
+        results = parse_rightmove_dom(html, url, page, get_total_only)
+    if isinstance(results, dict):
+        normalize_listings(results["listings"])
+    return results
+
+def parse_rightmove_dom(html, url, page=1, get_total_only=False):
+    """Parse the rendered property cards of a results page without an embedded model"""
+    try:
+        root = parse_partial(html, RIGHTMOVE_STRAINER, required=", ".join(RIGHTMOVE_CARD_SELECTORS + (".no-results-message",)))
 
         # Check for "no results" message
-        no_results_message = soup.select_one(".no-results-message")
-        if no_results_message and "This isn't the place you're looking for" in no_results_message.text:
+        no_results_message = root.css_first(".no-results-message")
+        if no_results_message and "This isn't the place you're looking for" in no_results_message.text():
             print("[Rightmove] No results found for this search combination")
             return {
                 "listings": [],
@@ -49,157 +222,81 @@ def scrape_rightmove_from_url(url, page=1, get_total_only=False):
 
         # Check if this is a rental listing
         is_rental = "property-to-rent" in url
-        print(f"[Rightmove] Is rental listing: {is_rental}")
 
         # Get total number of results first
         total_results = 0
-        results_count = soup.select_one(".searchHeader-resultCount")
+        results_count = root.css_first(".searchHeader-resultCount")
         if results_count:
             try:
-                total_results = int(results_count.text.strip().replace(",", "").split()[0])
-                print(f"[Rightmove] Total results found: {total_results}")
+                total_results = int(results_count.text().strip().replace(",", "").split()[0])
             except:
                 print("[Rightmove] Could not parse total results count")
-        else:
-            print("[Rightmove] Could not find results count element")
 
         # If we only need the total, return early
         if get_total_only:
-            total_pages = (total_results + 23) // 24 if total_results > 0 else 247
-            return total_pages
-
-        # Improved selectors for property cards
-        cards = (
-            soup.select("[data-test='propertyCard']") or
-            soup.select(".propertyCard") or 
-            soup.select(".l-searchResult") or
-            soup.select(".PropertyCard_propertyCardContainer__VSRSA") or
-            soup.select(".is-list") or
-            soup.select(".l-searchResult") or
-            soup.select("[data-test='property-details']")
-        )
-
-        # Log the search attempt
-        print(f"[Rightmove] Found {len(cards)} property cards using improved selectors")
+            return -(-total_results // RIGHTMOVE_PAGE_SIZE) if total_results > 0 else None
 
-        print(f"[Rightmove] Found {len(cards)} property cards on page {page}")
+        cards = RIGHTMOVE_CARDS.all(root)
 
-        # Debug: Print first card HTML if found
-        if cards:
-            print("\n[Rightmove DEBUG] First card HTML:")
-            print(cards[0].prettify())
+        print(f"[Rightmove] Found {len(cards)} property cards on page {page}")
+        if not cards:
+            diagnostics.capture("Rightmove", "no property cards", url, html)
 
         listings = []
         for idx, card in enumerate(cards):
             try:
                 # Unified selectors for both rental and sale
-                price = (
-                    card.select_one("[data-test='property-price']") or
-                    card.select_one(".PropertyPrice_price__VL65t") or
-                    card.select_one(".propertyCard-priceValue") or
-                    card.select_one(".price-text")
-                )
-
-                title = (
-                    card.select_one("[data-test='property-title']") or
-                    card.select_one(".PropertyAddress_address__LYRPq") or
-                    card.select_one(".propertyCard-title") or
-                    card.select_one(".property-title")
-                )
-
-                address = (
-                    card.select_one("[data-test='property-address']") or
-                    card.select_one(".propertyCard-address") or
-                    card.select_one(".property-address")
-                )
-
-                desc = (
-                    card.select_one("[data-test='property-description']") or
-                    card.select_one(".PropertyCardSummary_summary__oIv57") or
-                    card.select_one(".propertyCard-description") or
-                    card.select_one(".property-description")
-                )
-
-                link_tag = (
-                    card.select_one("[data-test='property-link']") or
-                    card.select_one("a.propertyCard-link") or
-                    card.select_one("a[href*='/properties/']")
-                )
+                price = RIGHTMOVE_PRICE.first(card)
+                title = RIGHTMOVE_TITLE.first(card)
+                address = RIGHTMOVE_ADDRESS.first(card)
+                desc = RIGHTMOVE_DESC.first(card)
+                link_tag = RIGHTMOVE_LINK.first(card)
 
                 # Get image
                 image = ""
-                img = (
-                    card.select_one("[data-test='property-image'] img") or
-                    card.select_one(".PropertyCardImage_slide__B8bBX img") or
-                    card.select_one('img[itemprop="image"]') or
-                    card.select_one(".property-image img")
-                )
+                img = RIGHTMOVE_IMAGE.first(card)
                 if img and img.has_attr("src"):
-                    image = img["src"]
-
-                # Debug: Print extracted elements
-                print(f"\n[Rightmove DEBUG] Card {idx + 1} elements:")
-                print(f"Price element: {price}")
-                print(f"Title element: {title}")
-                print(f"Link element: {link_tag}")
+                    image = img.attr("src")
 
                 # Extract property ID from URL
                 property_id = None
                 property_url = None
                 if link_tag and link_tag.has_attr("href"):
-                    href = link_tag["href"]
+                    href = link_tag.attr("href")
                     # Handle both relative and absolute URLs
                     if href.startswith("http"):
                         property_url = href
                     else:
                         property_url = "https://www.rightmove.co.uk" + href
 
-                    # Extract property ID from URL (e.g., /properties/123456789.html)
-                    try:
-                        property_id = href.split("/")[-1].split(".")[0]
-                    except:
-                        print(f"[Rightmove DEBUG] Card {idx + 1}: Could not extract property ID from URL")
-                        print(f"[Rightmove DEBUG] URL: {property_url}")
-
-                listing = {
-                    "title": title.text.strip() if title else "",
-                    "price": price.text.strip() if price else "",
-                    "address": title.text.strip() if title else "" if is_rental else address.text.strip() if address else "",
-                    "desc": desc.text.strip() if desc else "",
-                    "specs": "",  # Optional: parse bed count here
-                    "image": image,
-                    "url": property_url,
-                    "property_id": property_id,
-                    "source": "Rightmove"
-                }
+                    match = PROPERTY_ID_RE.search(href)
+                    property_id = match.group(1) if match else None
+
+                listing = Listing(
+                    title=title.text().strip() if title else "",
+                    price=price.text().strip() if price else "",
+                    address=title.text().strip() if title else "" if is_rental else address.text().strip() if address else "",
+                    desc=desc.text().strip() if desc else "",
+                    specs="",  # filled in from the title by normalize_listings
+                    image=image,
+                    url=property_url,
+                    property_id=property_id,
+                    source="Rightmove"
+                )
 
                 listings.append(listing)
 
-                # Print each listing as it's scraped
-                print(f"\n[Rightmove] Scraped listing {idx + 1}:")
-                print(f"Title: {listing['title']}")
-                print(f"Price: {listing['price']}")
-                print(f"Property ID: {listing['property_id']}")
-                print(f"URL: {listing['url']}")
-
             except Exception as e:
                 print(f"[Rightmove Listing Error] Card {idx + 1}:", e)
 
         # Calculate total pages (24 items per page)
         if total_results > 0:
-            total_pages = (total_results + 23) // 24
+            total_pages = -(-total_results // RIGHTMOVE_PAGE_SIZE)
         else:
-            # If we can't find total results, estimate based on current page and results
-            if len(listings) > 0:
-                # If we have results on this page, assume there are more pages
-                total_pages = max(page + 1, 247)  # At least current page + 1, or default to 247
-            else:
-                # If no results on this page, we're probably at the end
-                total_pages = page
-
-        print(f"[Rightmove] Total pages: {total_pages}")
-        print(f"[Rightmove] Current page: {page}")
-        print(f"[Rightmove] Has next page: {page < total_pages}")
+            # No count on the page; only a full page suggests there is another
+            total_pages = page + 1 if len(listings) >= RIGHTMOVE_PAGE_SIZE else page
+
+        print(f"[Rightmove] Page {page} of {total_pages}")
 
         # If we found listings, mark the results as valid
         if len(listings) > 0:
@@ -227,11 +324,4 @@ def scrape_rightmove_from_url(url, page=1, get_total_only=False):
 
     except Exception as e:
         print("[Rightmove ERROR]", e)
-        return {
-            "listings": [],
-            "total_found": 0,
-            "total_pages": 247,  # Default to 247 even on error
-            "current_page": page,
-            "has_next_page": page < 247,  # Default to 247 even on error
-            "is_complete": page >= 247  # Default to 247 even on error
-        }
\ No newline at end of file
+        return error_results(page)
\ No newline at end of file
@@ -1,4 +1,4 @@
-﻿from urllib.parse import urlencode
+﻿from urllib.parse import urlencode, urlsplit, parse_qsl
 
 # ✅ Correct Rightmove region codes (same for sale and rent in these cities)
 REGION_IDS = {
@@ -117,3 +117,17 @@ def get_final_rightmove_results_url(
     except Exception as e:
         print("[Rightmove URL ERROR]", e)
         return None
+
+def get_rightmove_search_api_url(results_url):
+    """Turn a results page URL into the equivalent request to Rightmove's JSON search API"""
+    parts = urlsplit(results_url)
+    params = dict(parse_qsl(parts.query))
+    params.setdefault("index", "0")
+    params["channel"] = "RENT" if "property-to-rent" in parts.path else "BUY"
+    params["numberOfPropertiesPerPage"] = "24"
+    params["viewType"] = "LIST"
+    if "_includeSSTC" in params:
+        params["includeSSTC"] = "true" if params.pop("_includeSSTC") == "on" else "false"
+    if "_includeLetAgreed" in params:
+        params["includeLetAgreed"] = "true" if params.pop("_includeLetAgreed") == "on" else "false"
+    return "https://www.rightmove.co.uk/api/_search?" + urlencode(params)
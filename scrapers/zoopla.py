@@ -2,13 +2,48 @@
 import os
 from dotenv import load_dotenv
 from utils.logger import logger
-from bs4 import BeautifulSoup
 import time
 import random
 import asyncio
-import aiohttp
-from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor
+from scrapers.http_client import http_client
+from scrapers.html_parser import Strainer, parse_partial
+from scrapers.parse_pool import parse_pool
+from scrapers.diagnostics import diagnostics
+from scrapers.extraction_rules import ExtractionRule
+from scrapers.normalize import normalize_listings
+from scrapers.embedded_json import extract_next_data, find_key, to_int
+from utils.listing import Listing
+from utils.raw_store import raw_page_store
+from utils.singleflight import singleflight, search_key
+
+# Bump whenever parse_card/parse_zoopla_html change what they extract, so
+# reparse_cache.py rebuilds cached results from the stored raw pages
+PARSER_VERSION = 3
+
+# Listings per Zoopla results page, used when only a result count is available
+ZOOPLA_PAGE_SIZE = 25
+
+# Parts of a results page the card parser reads. Cards are kept inside their
+# results list so the image lookup can still reach each card's picture.
+ZOOPLA_RESULTS_LIST = '[data-testid="regular-listings"]'
+ZOOPLA_STRAINER = Strainer(
+    ZOOPLA_RESULTS_LIST,
+    'a[data-testid="listing-card-content"]',
+    'div.listing-results-wrapper',
+    'div[data-listing-id]',
+    'div[data-testid="pagination"]'
+)
+
+# How many ancestors up from a card to look for its picture
+IMAGE_SEARCH_DEPTH = 6
+
+# Selector cascades for the DOM fallback, newest layout first
+ZOOPLA_CARDS = ExtractionRule("zoopla", "cards", 'a[data-testid="listing-card-content"]', "div.listing-results-wrapper", "div[data-listing-id]")
+ZOOPLA_PRICE = ExtractionRule("zoopla", "price", '[data-testid="listing-price"]', ".listing-details .price", ".text-price")
+ZOOPLA_SPECS = ExtractionRule("zoopla", "specs", "p._1wickv3", "ul.listing-details", "span.num-beds")
+ZOOPLA_ADDRESS = ExtractionRule("zoopla", "address", "address", "a.listing-results-address")
+ZOOPLA_IMAGE = ExtractionRule("zoopla", "image", "img[data-src]", "img[src]", "source[srcset]")
 
 # Zoopla sort options mapping
 ZOOPLA_SORT_OPTIONS = {
@@ -39,132 +74,95 @@ load_dotenv(override=True)  # Force reload of environment variables
 logger.info("[Zoopla] Environment variables loaded")
 logger.info("[Zoopla] All environment variables: %s", dict(os.environ))
 
-# Cache for proxy URLs to avoid regenerating them
-@lru_cache(maxsize=100)
-def get_proxy_url(url):
-    """Get ScraperAPI URL with API key"""
-    logger.info("[Zoopla] Getting ScraperAPI key...")
-    api_key = os.getenv('SCRAPER_API_KEY')
-    logger.info("[Zoopla] ScraperAPI key found: %s", "Yes" if api_key else "No")
-    if api_key:
-        logger.info("[Zoopla] ScraperAPI key length: %d", len(api_key))
-    
-    if not api_key:
-        logger.error("[Zoopla] No ScraperAPI key found in environment variables")
-        logger.error("[Zoopla] Available environment variables: %s", list(os.environ.keys()))
-        # Try to load the .env file directly
-        try:
-            with open('.env', 'r') as f:
-                for line in f:
-                    if line.startswith('SCRAPER_API_KEY='):
-                        api_key = line.strip().split('=')[1]
-                        logger.info("[Zoopla] Found ScraperAPI key in .env file")
-                        break
-        except Exception as e:
-            logger.error("[Zoopla] Error reading .env file: %s", str(e))
-        
-        if not api_key:
-            raise ValueError("SCRAPER_API_KEY not found in environment variables or .env file")
-    
-    proxy_url = f"http://api.scraperapi.com?api_key={api_key}&url={url}"
-    logger.info("[Zoopla] Using ScraperAPI URL (key masked): %s", proxy_url.replace(api_key, "XXXXX"))
-    return proxy_url
-
-async def fetch_page(session, url):
-    """Fetch a single page asynchronously"""
+async def fetch_page(url, deadline=None):
+    """Fetch a single page asynchronously via the best available scraping provider.
+    Returns the raw bytes of the page, or None"""
     try:
-        proxy_url = get_proxy_url(url)
-        async with session.get(proxy_url) as response:
-            if response.status == 200:
-                return await response.text()
-            logger.error(f"[Zoopla] Request failed with status code: {response.status}")
+        if deadline and deadline.expired:
+            logger.warning("[Zoopla] Deadline passed before fetching page")
             return None
+        status, html = await http_client.fetch_upstream(url, timeout=deadline.remaining() if deadline else None, raw=True)
+        if status == 200:
+            await asyncio.to_thread(raw_page_store.save, url, html)
+            return html
+        logger.error(f"[Zoopla] Request failed with status code: {status}")
+        return None
     except Exception as e:
         logger.error(f"[Zoopla] Error fetching page: {str(e)}")
         return None
 
-def parse_card(card):
-    """Parse a single card into a listing"""
+def picture_url(picture):
+    """First URL in a picture's first source srcset ("url width, url width, ..."), or ''"""
+    source = picture.css_first("source")
+    if source and source.has_attr("srcset"):
+        return source.attr("srcset").split(",")[0].split()[0]
+    return ""
+
+def build_image_map(container):
+    """Map every element that contains a picture to the image of the first
+    picture inside it, in one pass over the container's pictures. Pictures come
+    in document order, so once an ancestor is mapped everything above it is too."""
+    images = {}
+    for picture in container.css("picture"):
+        image = picture_url(picture)
+        node = picture.parent
+        while node is not None and node.key not in images:
+            images[node.key] = image
+            node = node.parent
+    return images
+
+def parse_card(card, images):
+    """Parse a single card into a listing, taking its image from build_image_map"""
     try:
-        # Try multiple selectors for price
-        price = (
-            card.select_one('[data-testid="listing-price"]') or
-            card.select_one('.listing-details .price') or
-            card.select_one('.text-price')
-        )
-        price = price.text.strip() if price else ""
+        price = ZOOPLA_PRICE.first(card)
+        price = price.text().strip() if price else ""
 
-        # Try multiple selectors for specs
-        specs_raw = (
-            card.find("p", class_="_1wickv3") or
-            card.find("ul", class_="listing-details") or
-            card.find("span", class_="num-beds")
-        )
-        specs = " ".join(span.text.strip() for span in specs_raw.find_all(["span", "li"])) if specs_raw else ""
+        specs_raw = ZOOPLA_SPECS.first(card)
+        specs = " ".join(span.text().strip() for span in specs_raw.css("span, li")) if specs_raw else ""
 
-        # Try multiple selectors for address
-        address = (
-            card.find("address") or
-            card.find("a", class_="listing-results-address")
-        )
-        address = address.text.strip() if address else ""
+        address = ZOOPLA_ADDRESS.first(card)
+        address = address.text().strip() if address else ""
 
         # Get description
-        desc = card.find_all("p")[-1].text.strip() if card.find_all("p") else ""
+        paragraphs = card.css("p")
+        desc = paragraphs[-1].text().strip() if paragraphs else ""
 
         # Get link
-        url = "https://www.zoopla.co.uk" + (
-            card.get("href", "") if card.name == "a" 
-            else card.find("a").get("href", "") if card.find("a") 
-            else ""
-        )
+        link = card if card.tag == "a" else card.css_first("a")
+        url = "https://www.zoopla.co.uk" + (link.attr("href", "") if link else "")
 
-        # Search for image - Zoopla has images in a sibling structure
+        # Zoopla puts the picture in a sibling of the card, so use the first
+        # picture under the nearest of the card's ancestors that has one
         image = ""
-        # The card and picture are siblings within a common parent container
-        # Walk up to find the common ancestor (usually 5-6 levels up)
         parent = card
-        for _ in range(6):
+        for _ in range(IMAGE_SEARCH_DEPTH):
             parent = parent.parent if parent else None
-            if parent:
-                # Look for picture tag with srcset in this container
-                picture_tag = parent.find("picture")
-                if picture_tag:
-                    source_tag = picture_tag.find("source")
-                    if source_tag and source_tag.has_attr("srcset"):
-                        srcset = source_tag["srcset"]
-                        # Extract first URL from srcset (format: "url width, url width, ...")
-                        image = srcset.split(",")[0].split()[0]
-                        break
-        
+            if parent and images.get(parent.key):
+                image = images[parent.key]
+                break
+
         if not image:
             # Fallback to other image selectors if parent walk fails
-            img_tag = (
-                card.find("img", {"data-src": True}) or
-                card.find("img", {"src": True}) or
-                card.find("source", {"srcset": True})
-            )
+            img_tag = ZOOPLA_IMAGE.first(card)
             if img_tag:
-                image = img_tag.get("data-src") or img_tag.get("src") or img_tag.get("srcset", "").split(",")[0].split()[0]
-
-        return {
-            "title": desc or address,
-            "price": price,
-            "address": address,
-            "desc": desc,
-            "specs": specs,
-            "image": image,
-            "url": url,
-            "source": "Zoopla"
-        }
+                image = img_tag.attr("data-src") or img_tag.attr("src") or img_tag.attr("srcset", "").split(",")[0].split()[0]
+
+        return Listing(
+            title=desc or address,
+            price=price,
+            address=address,
+            desc=desc,
+            specs=specs,
+            image=image,
+            url=url,
+            source="Zoopla"
+        )
     except Exception as e:
         logger.error(f"[Zoopla] Failed to parse card: {str(e)}")
         return None
 
-async def scrape_zoopla_first_page(location, min_price="", max_price="", min_beds="", max_beds="", keywords="", listing_type="sale", page_number=1, sort_by="newest"):
-    """Scrape only the first page of Zoopla listings and return total pages"""
-    logger.info("[Zoopla] Starting scrape_zoopla_first_page function with sort_by: %s", sort_by)
-    
+def build_zoopla_url(location, min_price="", max_price="", min_beds="", max_beds="", listing_type="sale", page_number=1, sort_by="newest"):
+    """Build the Zoopla search results URL for the given filters and page"""
     location_url = location.strip().replace(" ", "-").lower()
 
     base_url = (
@@ -193,116 +191,181 @@ async def scrape_zoopla_first_page(location, min_price="", max_price="", min_bed
     ])
 
     query = "?" + "&".join(filters) if filters else ""
-    full_url = base_url + query
-    
-    logger.info(f"[Zoopla] Full URL: {full_url}")
-    
-    async with aiohttp.ClientSession() as session:
-        html = await fetch_page(session, full_url)
-        if not html:
-            logger.error("[Zoopla] Failed to fetch page")
-            return [], 0
-
-        soup = BeautifulSoup(html, "html.parser")
-        cards = (
-            soup.find_all("a", {"data-testid": "listing-card-content"}) or
-            soup.find_all("div", class_="listing-results-wrapper") or
-            soup.find_all("div", {"data-listing-id": True})
+    return base_url + query
+
+def parse_json_listing(item):
+    """Convert one listing from Zoopla's __NEXT_DATA__ payload into a listing"""
+    try:
+        features = {
+            feature.get("iconId"): feature.get("content")
+            for feature in item.get("features") or []
+            if isinstance(feature, dict)
+        }
+        bedrooms = to_int(features.get("bed"))
+        bathrooms = to_int(features.get("bath"))
+        receptions = to_int(features.get("chair"))
+        specs = " ".join(
+            f"{count} {label}{'s' if count != 1 else ''}"
+            for count, label in ((bedrooms, "bed"), (bathrooms, "bath"), (receptions, "reception"))
+            if count is not None
         )
-        
-        logger.info(f"[Zoopla] Found {len(cards)} cards on page")
-
-        first_page_listings = []
-        for card in cards:
-            listing = parse_card(card)
-            if listing:
-                text_to_search = " ".join([listing["price"], listing["specs"], listing["address"], listing["desc"]]).lower()
-                if not keywords or keywords.lower() in text_to_search:
-                    first_page_listings.append(listing)
-
-        logger.info(f"[Zoopla] Parsed {len(first_page_listings)} listings")
-
-        # Get total pages
-        total_pages = 1
-        pagination = soup.find("div", {"data-testid": "pagination"})
-        if pagination:
-            page_links = pagination.find_all("a")
-            if page_links:
-                for link in reversed(page_links):
-                    try:
-                        total_pages = int(link.text.strip())
-                        break
-                    except ValueError:
-                        continue
-
-        logger.info(f"[Zoopla] Total pages found: {total_pages}")
-        return first_page_listings, total_pages
-
-async def scrape_zoopla_page(location, min_price="", max_price="", min_beds="", max_beds="", keywords="", listing_type="sale", page_num=1, sort_by="newest"):
-    """Scrape a specific page of Zoopla listings"""
-    logger.info(f"[Zoopla] Starting scrape_zoopla_page function for page {page_num} with sort_by: {sort_by}")
-    
-    location_url = location.strip().replace(" ", "-").lower()
 
-    base_url = (
-        f"https://www.zoopla.co.uk/to-rent/property/{location_url}/"
-        if listing_type == "rent"
-        else f"https://www.zoopla.co.uk/for-sale/property/{location_url}/"
+        price = item.get("price") or ""
+        address = item.get("address") or ""
+        desc = item.get("summaryDescription") or ""
+
+        detail = (item.get("listingUris") or {}).get("detail")
+        if not detail and item.get("listingId"):
+            detail = f"/for-sale/details/{item['listingId']}/"
+        url = "https://www.zoopla.co.uk" + (detail or "")
+
+        image = item.get("image") or {}
+        image = image.get("src", "") if isinstance(image, dict) else str(image)
+        if not image and item.get("imageUris"):
+            image = item["imageUris"][0]
+
+        location = item.get("location") or {}
+        coordinates = location.get("coordinates") or {}
+        position = item.get("pos") or {}
+
+        return Listing(
+            title=item.get("title") or desc or address,
+            price=price,
+            address=address,
+            desc=desc,
+            specs=specs,
+            image=image,
+            url=url,
+            source="Zoopla",
+            listing_id=str(item.get("listingId") or ""),
+            price_value=to_int(item.get("priceUnformatted")) or to_int(price),
+            bedrooms=bedrooms,
+            bathrooms=bathrooms,
+            latitude=coordinates.get("latitude", position.get("lat")),
+            longitude=coordinates.get("longitude", position.get("lng")),
+            property_type=item.get("propertyType") or ""
+        )
+    except Exception as e:
+        logger.error(f"[Zoopla] Failed to parse listing JSON: {str(e)}")
+        return None
+
+def matches_keywords(listing, keywords):
+    """Whether a listing mentions the search keywords"""
+    if not keywords:
+        return True
+    text_to_search = " ".join([listing["price"], listing["specs"], listing["address"], listing["desc"]]).lower()
+    return keywords.lower() in text_to_search
+
+def parse_zoopla_next_data(html, keywords=""):
+    """Parse listings and pagination from the page's __NEXT_DATA__ blob.
+    Returns (listings, total_pages), or None if the page doesn't carry one."""
+    data = extract_next_data(html)
+    items = find_key(data, "regularListingsFormatted") if data else None
+    if not isinstance(items, list):
+        return None
+
+    listings = []
+    for item in items:
+        listing = parse_json_listing(item) if isinstance(item, dict) else None
+        if listing and matches_keywords(listing, keywords):
+            listings.append(listing)
+
+    pagination = find_key(data, "pagination") or {}
+    total_pages = to_int(pagination.get("pageNumberMax")) if isinstance(pagination, dict) else None
+    if not total_pages:
+        total_results = to_int(find_key(data, "totalResults") or find_key(data, "numberOfResults"))
+        total_pages = -(-total_results // ZOOPLA_PAGE_SIZE) if total_results else 1
+
+    logger.info(f"[Zoopla] Parsed {len(listings)} listings from __NEXT_DATA__")
+    return listings, total_pages
+
+def parse_zoopla_html(html, keywords=""):
+    """Parse a Zoopla results page (text or raw bytes). Returns (listings, total_pages)"""
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+    parsed = parse_zoopla_next_data(html, keywords)
+    if parsed is not None:
+        normalize_listings(parsed[0])
+        return parsed
+
+    # No embedded payload, fall back to reading the rendered cards
+    root = parse_partial(html, ZOOPLA_STRAINER, required=ZOOPLA_RESULTS_LIST)
+    cards = ZOOPLA_CARDS.all(root)
+
+    logger.info(f"[Zoopla] Found {len(cards)} cards on page")
+    if not cards:
+        diagnostics.capture("Zoopla", "no listing cards", None, html)
+
+    images = build_image_map(root.css_first(ZOOPLA_RESULTS_LIST) or root)
+    listings = []
+    for card in cards:
+        listing = parse_card(card, images)
+        if listing and matches_keywords(listing, keywords):
+            listings.append(listing)
+
+    normalize_listings(listings)
+    logger.info(f"[Zoopla] Parsed {len(listings)} listings")
+
+    # Get total pages
+    total_pages = 1
+    pagination = root.css_first('div[data-testid="pagination"]')
+    if pagination:
+        page_links = pagination.css("a")
+        if page_links:
+            for link in reversed(page_links):
+                try:
+                    total_pages = int(link.text().strip())
+                    break
+                except ValueError:
+                    continue
+
+    return listings, total_pages
+
+async def scrape_zoopla_first_page(location, min_price="", max_price="", min_beds="", max_beds="", keywords="", listing_type="sale", page_number=1, sort_by="newest", deadline=None):
+    """Scrape only the first page of Zoopla listings and return total pages.
+    Identical concurrent calls share one upstream fetch."""
+    key = "zoopla_first_page:" + search_key("zoopla", location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page_number, sort_by)
+    return await singleflight.do(
+        key, _scrape_zoopla_first_page,
+        location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page_number, sort_by, deadline
     )
 
-    filters = []
-    # Convert price values to strings and ensure they're not empty
-    if min_price and str(min_price).strip() and float(min_price) > 0:
-        filters.append(f"price_min={str(min_price)}")
-    if max_price and str(max_price).strip() and float(max_price) < float('inf'):
-        filters.append(f"price_max={str(max_price)}")
-    
-    if min_beds and str(min_beds).strip():
-        filters.append(f"beds_min={str(min_beds)}")
-    if max_beds and str(max_beds).strip():
-        filters.append(f"beds_max={str(max_beds)}")
-    
-    filters.extend([
-        "q=" + location.replace(" ", "%20"),
-        "search_source=for-sale" if listing_type == "sale" else "search_source=to-rent",
-        f"pn={page_num}",
-        f"results_sort={ZOOPLA_SORT_OPTIONS.get(sort_by, 'newest_listings')}"  # Add sort option
-    ])
+async def _scrape_zoopla_first_page(location, min_price="", max_price="", min_beds="", max_beds="", keywords="", listing_type="sale", page_number=1, sort_by="newest", deadline=None):
+    logger.info("[Zoopla] Starting scrape_zoopla_first_page function with sort_by: %s", sort_by)
 
-    query = "?" + "&".join(filters) if filters else ""
-    page_url = base_url + query
+    full_url = build_zoopla_url(location, min_price, max_price, min_beds, max_beds, listing_type, page_number, sort_by)
+    logger.info(f"[Zoopla] Full URL: {full_url}")
     
+    html = await fetch_page(full_url, deadline)
+    if not html:
+        logger.error("[Zoopla] Failed to fetch page")
+        return [], 0
+
+    # Parse in a worker process so concurrent searches don't queue on the GIL
+    first_page_listings, total_pages = await parse_pool.run(parse_zoopla_html, html, keywords)
+
+    logger.info(f"[Zoopla] Total pages found: {total_pages}")
+    return first_page_listings, total_pages
+
+async def scrape_zoopla_page(location, min_price="", max_price="", min_beds="", max_beds="", keywords="", listing_type="sale", page_num=1, sort_by="newest", deadline=None):
+    """Scrape a specific page of Zoopla listings"""
+    logger.info(f"[Zoopla] Starting scrape_zoopla_page function for page {page_num} with sort_by: {sort_by}")
+
+    page_url = build_zoopla_url(location, min_price, max_price, min_beds, max_beds, listing_type, page_num, sort_by)
     logger.info(f"[Zoopla] Page URL: {page_url}")
     
-    async with aiohttp.ClientSession() as session:
-        html = await fetch_page(session, page_url)
-        if not html:
-            logger.error("[Zoopla] Failed to fetch page")
-            return []
-
-        soup = BeautifulSoup(html, "html.parser")
-        cards = (
-            soup.find_all("a", {"data-testid": "listing-card-content"}) or
-            soup.find_all("div", class_="listing-results-wrapper") or
-            soup.find_all("div", {"data-listing-id": True})
-        )
-        
-        logger.info(f"[Zoopla] Found {len(cards)} cards on page {page_num}")
-
-        page_listings = []
-        for card in cards:
-            listing = parse_card(card)
-            if listing:
-                text_to_search = " ".join([listing["price"], listing["specs"], listing["address"], listing["desc"]]).lower()
-                if not keywords or keywords.lower() in text_to_search:
-                    page_listings.append(listing)
+    html = await fetch_page(page_url, deadline)
+    if not html:
+        logger.error("[Zoopla] Failed to fetch page")
+        return []
 
-        logger.info(f"[Zoopla] Parsed {len(page_listings)} listings from page {page_num}")
-        return page_listings
+    page_listings, _ = await parse_pool.run(parse_zoopla_html, html, keywords)
+    logger.info(f"[Zoopla] Parsed {len(page_listings)} listings from page {page_num}")
+    return page_listings
 
-async def scrape_zoopla(location, min_price="", max_price="", min_beds="", max_beds="", keywords="", listing_type="sale"):
+async def scrape_zoopla(location, min_price="", max_price="", min_beds="", max_beds="", keywords="", listing_type="sale", deadline=None):
     """Scrape all Zoopla listings (for backward compatibility)"""
     first_page_results, total_pages = await scrape_zoopla_first_page(
-        location, min_price, max_price, min_beds, max_beds, keywords, listing_type
+        location, min_price, max_price, min_beds, max_beds, keywords, listing_type, deadline=deadline
     )
     return first_page_results
@@ -758,6 +758,8 @@ let currentListings = [];
 let currentSearchParams = null;
 let isLoadingMore = false;
 let lastScrapedPage = 1; // Track the last page scraped from the server
+let searchSessionToken = null; // Combined searches: the server remembers listings already sent
+let combinedCursor = null; // Combined searches: where each source's results left off
 
 // Cache the property grid template
 const propertyGridTemplate = document.createElement('div');
@@ -1064,39 +1066,36 @@ function clearAllFilters() {
     currentSearchParams = null;
     isLoadingMore = false;
     lastScrapedPage = 1;
+    searchSessionToken = null;
+    combinedCursor = null;
     
     // Focus on location field
     document.getElementById("location").focus();
 }
 
+// Typed values come from the scraper; older cached listings only have the display strings
+function listingPrice(listing) {
+    if (listing.price_value != null) return listing.price_value;
+    return parseInt((listing.price || '').replace(/[^0-9]/g, '')) || 0;
+}
+
+function listingBedrooms(listing) {
+    if (listing.bedrooms != null) return listing.bedrooms;
+    return parseInt(listing.specs?.match(/(\d+)\s*bed/i)?.[1] || 0);
+}
+
 function sortListings(listings, sortBy) {
     const sortedListings = [...listings]; // Create a copy to avoid mutating original array
     
     switch(sortBy) {
         case 'price_asc':
-            return sortedListings.sort((a, b) => {
-                const priceA = parseInt(a.price.replace(/[^0-9]/g, ''));
-                const priceB = parseInt(b.price.replace(/[^0-9]/g, ''));
-                return priceA - priceB;
-            });
+            return sortedListings.sort((a, b) => listingPrice(a) - listingPrice(b));
         case 'price_desc':
-            return sortedListings.sort((a, b) => {
-                const priceA = parseInt(a.price.replace(/[^0-9]/g, ''));
-                const priceB = parseInt(b.price.replace(/[^0-9]/g, ''));
-                return priceB - priceA;
-            });
+            return sortedListings.sort((a, b) => listingPrice(b) - listingPrice(a));
         case 'beds_asc':
-            return sortedListings.sort((a, b) => {
-                const bedsA = parseInt(a.specs?.match(/(\d+)\s*bed/i)?.[1] || 0);
-                const bedsB = parseInt(b.specs?.match(/(\d+)\s*bed/i)?.[1] || 0);
-                return bedsA - bedsB;
-            });
+            return sortedListings.sort((a, b) => listingBedrooms(a) - listingBedrooms(b));
         case 'beds_desc':
-            return sortedListings.sort((a, b) => {
-                const bedsA = parseInt(a.specs?.match(/(\d+)\s*bed/i)?.[1] || 0);
-                const bedsB = parseInt(b.specs?.match(/(\d+)\s*bed/i)?.[1] || 0);
-                return bedsB - bedsA;
-            });
+            return sortedListings.sort((a, b) => listingBedrooms(b) - listingBedrooms(a));
         case 'newest':
             return sortedListings; // Assuming API returns in newest first order
         case 'oldest':
@@ -1215,6 +1214,8 @@ async function performSearch() {
         currentListings = data.listings || [];
         currentPage = 1;
         lastScrapedPage = data.current_page || 1;
+        searchSessionToken = data.session_token || null;
+        combinedCursor = data.cursor || null;
 
         // Update results display
         updateResults(
@@ -1548,7 +1549,8 @@ async function loadMoreResults() {
             max_price: document.getElementById('max_price').value || '10000000',
             min_beds: document.getElementById('min_beds').value || '0',
             max_beds: document.getElementById('max_beds').value || '10',
-            keywords: document.getElementById('keywords').value || ''
+            keywords: document.getElementById('keywords').value || '',
+            sort_by: sortBy.value
         };
         
         console.log('Loading more results:', {
@@ -1567,7 +1569,9 @@ async function loadMoreResults() {
             },
             body: JSON.stringify({
                 search_params: searchParams,
-                current_page: nextScrapedPage // Use nextScrapedPage for backend communication
+                current_page: nextScrapedPage, // Use nextScrapedPage for backend communication
+                session_token: searchSessionToken,
+                cursor: combinedCursor
             })
         });
 
@@ -1580,6 +1584,14 @@ async function loadMoreResults() {
         const data = await response.json();
         console.log('Received data:', data);
         
+        // The server may start a new session (e.g. the old one expired)
+        if (data.session_token) {
+            searchSessionToken = data.session_token;
+        }
+        if (site === 'combined') {
+            combinedCursor = data.cursor || null;
+        }
+        
         if (data.listings && data.listings.length > 0) {
             // For Zoopla, check if the new listings are valid
             if (site === 'zoopla') {
@@ -1609,8 +1621,11 @@ async function loadMoreResults() {
                 }
             }
 
-            // Add new listings to existing ones and sort all listings
-            currentListings = sortListings([...currentListings, ...data.listings], sortBy.value);
+            // Combined pages arrive merged in sort order, so they only need appending;
+            // other sites' pages are sorted with what we already have
+            currentListings = site === 'combined'
+                ? [...currentListings, ...data.listings]
+                : sortListings([...currentListings, ...data.listings], sortBy.value);
             
             // Update the results count
             resultsCount.textContent = `Found ${currentListings.length} properties`;
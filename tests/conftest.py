@@ -1,5 +1,14 @@
+import os
+import tempfile
 import pytest
 import asyncio
+
+# Keep test runs out of the app's listings.db. Every store resolves
+# DATABASE_PATH when it is created, including the module-level ones main
+# imports below, and creates its tables on first use
+_test_db_dir = tempfile.TemporaryDirectory(prefix="pacas-tests-")
+os.environ["DATABASE_PATH"] = os.path.join(_test_db_dir.name, "listings.db")
+
 from main import app
 from flask.testing import FlaskClient
 from werkzeug.test import TestResponse
@@ -0,0 +1,151 @@
+import asyncio
+import pytest
+from utils.combined_pager import CombinedPager, decode_cursor, encode_cursor
+from utils.deadline import Deadline
+from utils.listing import Listing
+
+def make_source(name, prices, page_size):
+    """Pages of listings sorted by price, as a site would return them"""
+    listings = [Listing(source=name, url=f"https://{name}/{n}", address=f"{n} {name} Road", price_value=price,
+                        price_period="pcm", bedrooms=n % 4)
+                for n, price in enumerate(prices)]
+    return [listings[start:start + page_size] for start in range(0, len(listings), page_size)]
+
+def make_fetch(sources, fetched, delays=None):
+    async def fetch(source, page):
+        fetched.append((source, page))
+        await asyncio.sleep((delays or {}).get(source, 0))
+        pages = sources[source]
+        if page > len(pages):
+            return None
+        return {"listings": list(pages[page - 1]), "total_pages": len(pages)}
+    return fetch
+
+def crawl(pager, sort_by):
+    """Every page of a search, following cursors"""
+    pages, cursor = [], None
+    while True:
+        listings, _, cursor, _ = asyncio.run(pager.page(sort_by, cursor))
+        pages.append(listings)
+        if cursor is None:
+            return pages
+
+def test_pages_are_merged_in_price_order_across_sources():
+    sources = {
+        "Rightmove": make_source("Rightmove", range(500, 2000, 100), page_size=4),
+        "Zoopla": make_source("Zoopla", range(550, 2050, 150), page_size=3)
+    }
+    pager = CombinedPager(make_fetch(sources, []), sources, page_size=5)
+    pages = crawl(pager, "price_asc")
+
+    merged = [listing["price_value"] for page in pages for listing in page]
+    assert merged == sorted(merged)
+    assert len(merged) == 15 + 10
+    assert all(len(page) == 5 for page in pages)
+
+def test_price_desc_and_missing_prices_last():
+    sources = {
+        "Rightmove": [[Listing(source="Rightmove", url="r1", price_value=900),
+                       Listing(source="Rightmove", url="r2", price_value=None)]],
+        "Zoopla": [[Listing(source="Zoopla", url="z1", price_value=1200), Listing(source="Zoopla", url="z2", price_value=700)]]
+    }
+    pager = CombinedPager(make_fetch(sources, []), sources, page_size=10)
+    listings, _, cursor, _ = asyncio.run(pager.page("price_desc"))
+    assert [l["url"] for l in listings] == ["z1", "r1", "z2", "r2"]
+    assert cursor is None
+
+def test_next_upstream_page_is_fetched_only_when_a_buffer_runs_dry():
+    sources = {
+        "Rightmove": make_source("Rightmove", [100, 200, 300, 400, 500, 600], page_size=3),
+        "Zoopla": make_source("Zoopla", [1000, 1100, 1200, 1300], page_size=2)
+    }
+    fetched = []
+    pager = CombinedPager(make_fetch(sources, fetched), sources, page_size=4)
+    listings, _, cursor, _ = asyncio.run(pager.page("price_asc"))
+
+    assert [l["price_value"] for l in listings] == [100, 200, 300, 400]
+    # Zoopla's first page was enough to know its listings come later
+    assert fetched == [("Rightmove", 1), ("Zoopla", 1), ("Rightmove", 2)]
+    assert decode_cursor(cursor) == ("price_asc", {"Rightmove": {"page": 2, "offset": 1, "last": (0, 400)},
+                                                   "Zoopla": {"page": 1, "offset": 0}})
+
+def test_unsortable_orders_interleave_by_position():
+    sources = {
+        "Rightmove": make_source("Rightmove", [1, 2, 3], page_size=3),
+        "Zoopla": make_source("Zoopla", [1, 2, 3], page_size=3)
+    }
+    pager = CombinedPager(make_fetch(sources, []), sources, page_size=10)
+    listings, _, _, _ = asyncio.run(pager.page("newest"))
+    assert [l["source"][0] for l in listings] == ["R", "Z", "R", "Z", "R", "Z"]
+
+def test_cross_source_duplicates_are_dropped_and_reported():
+    rightmove = Listing(source="Rightmove", url="r1", address="12 Canal Street, M1", price_value=1000)
+    zoopla = Listing(source="Zoopla", url="z1", address="12 Canal Street, M1", price_value=1000)
+    sources = {"Rightmove": [[rightmove]], "Zoopla": [[zoopla]]}
+    pager = CombinedPager(make_fetch(sources, []), sources, page_size=10)
+    listings, duplicates, _, _ = asyncio.run(pager.page("price_asc"))
+    assert listings == [rightmove]
+    assert duplicates == [(zoopla, rightmove)]
+
+def test_source_that_misses_the_deadline_keeps_its_place():
+    sources = {
+        "Rightmove": make_source("Rightmove", [100, 200, 300, 400], page_size=2),
+        "Zoopla": make_source("Zoopla", [150, 250], page_size=2)
+    }
+    pager = CombinedPager(make_fetch(sources, [], delays={"Zoopla": 0.5}), sources, page_size=10)
+    listings, _, cursor, stalled = asyncio.run(pager.page("price_asc", deadline=Deadline(0.1)))
+
+    assert stalled == ["Zoopla"]
+    # Nothing is known about Zoopla's first price, so anything merged could overtake it
+    assert listings == []
+    assert decode_cursor(cursor)[1] == {"Rightmove": {"page": 1, "offset": 0}, "Zoopla": {"page": 1, "offset": 0}}
+
+    # Once Zoopla has answered, the pages carry on in order
+    pager = CombinedPager(make_fetch(sources, []), sources, page_size=10)
+    listings, _, cursor, _ = asyncio.run(pager.page("price_asc", cursor))
+    assert [l["price_value"] for l in listings] == [100, 150, 200, 250, 300, 400]
+    assert cursor is None
+
+def test_stalled_source_bounds_the_page_at_its_last_listing():
+    sources = {
+        "Rightmove": make_source("Rightmove", [100, 150, 150, 200, 300], page_size=5),
+        "Zoopla": make_source("Zoopla", [150, 160, 170], page_size=3)
+    }
+    listings, _, cursor, _ = asyncio.run(CombinedPager(make_fetch(sources, []), sources, page_size=2).page("price_asc"))
+    assert [l["url"] for l in listings] == ["https://Rightmove/0", "https://Zoopla/0"]
+
+    pager = CombinedPager(make_fetch(sources, [], delays={"Zoopla": 0.5}), sources, page_size=10)
+    listings, _, cursor, stalled = asyncio.run(pager.page("price_asc", cursor, deadline=Deadline(0.1)))
+
+    assert stalled == ["Zoopla"]
+    # Zoopla's next listing costs at least its last one (150), and on a tie
+    # it goes before Rightmove's later positions
+    assert [l["url"] for l in listings] == ["https://Rightmove/1"]
+    assert decode_cursor(cursor)[1] == {"Rightmove": {"page": 1, "offset": 2, "last": (0, 150)},
+                                        "Zoopla": {"page": 1, "offset": 1, "last": (0, 150)}}
+
+def test_stalled_source_keeps_its_turn_in_position_orders():
+    sources = {
+        "Rightmove": make_source("Rightmove", [1, 2, 3], page_size=3),
+        "Zoopla": make_source("Zoopla", [1, 2, 3], page_size=3)
+    }
+    pager = CombinedPager(make_fetch(sources, [], delays={"Zoopla": 0.5}), sources, page_size=10)
+    listings, _, cursor, stalled = asyncio.run(pager.page("newest", deadline=Deadline(0.1)))
+
+    assert stalled == ["Zoopla"]
+    assert [l["url"] for l in listings] == ["https://Rightmove/0"]
+    assert decode_cursor(cursor)[1] == {"Rightmove": {"page": 1, "offset": 1}, "Zoopla": {"page": 1, "offset": 0}}
+
+def test_invalid_cursors_are_rejected_and_other_sorts_restart():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("newest", {"Zoopla": {"page": 0, "offset": 0}}))
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("price_asc", {"Zoopla": {"page": 1, "offset": 0, "last": ["cheap"]}}))
+
+    sources = {"Rightmove": make_source("Rightmove", [1, 2, 3], page_size=3), "Zoopla": []}
+    pager = CombinedPager(make_fetch(sources, []), sources, page_size=10)
+    cursor = encode_cursor("price_asc", {"Rightmove": {"page": 1, "offset": 2}, "Zoopla": {"done": True}})
+    assert len(asyncio.run(pager.page("price_asc", cursor))[0]) == 1
+    assert len(asyncio.run(pager.page("beds_asc", cursor))[0]) == 3
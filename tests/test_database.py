@@ -1,15 +1,13 @@
 import pytest
+import sqlite3
 from utils.database import Database
 import json
 from datetime import datetime
 
 @pytest.fixture
-def db():
+def db(tmp_path):
     """Create a test database instance"""
-    database = Database()
-    database.db_path = "test_listings.db"  # Use a separate test database
-    database.init_db()
-    return database
+    return Database(str(tmp_path / "test_listings.db"))  # Use a separate test database
 
 def test_cache_and_retrieve_results(db):
     """Test caching and retrieving results"""
@@ -98,4 +96,69 @@ def test_null_parameter_handling(db):
     )
     
     assert cached is not None
-    assert cached["listings"][0]["title"] == "Test Property" 
\ No newline at end of file
+    assert cached["listings"][0]["title"] == "Test Property" 
+
+
+SEARCH = dict(site="Zoopla", location="Manchester", min_price="100000", max_price="", min_beds="2", max_beds="4",
+              keywords="", listing_type="sale", page_number=1)
+
+def test_equivalent_parameters_share_a_cache_key(db):
+    """Parameters differing only in case, padding or empty spelling hit the same row"""
+    db.cache_results(results={"listings": [], "total_found": 7}, **SEARCH)
+    cached = db.get_cached_results(**dict(SEARCH, site="zoopla", location=" manchester ", max_price=None, keywords="0"))
+    assert cached is not None
+    assert cached["total_found"] == 7
+
+def test_upsert_replaces_only_the_same_sort_order(db):
+    """Re-caching a page updates its row; other sort orders keep theirs"""
+    search = dict(SEARCH, location="Salford")
+    db.cache_results(results={"total_found": 1}, sort_by="newest", **search)
+    db.cache_results(results={"total_found": 2}, sort_by="price_asc", **search)
+    db.cache_results(results={"total_found": 3}, sort_by="newest", **search)
+
+    assert db.get_cached_results(sort_by="newest", **search)["total_found"] == 3
+    assert db.get_cached_results(sort_by="price_asc", **search)["total_found"] == 2
+    with sqlite3.connect(db.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM listings WHERE location = 'Salford'").fetchone()[0] == 2
+
+def test_lookup_seeks_the_cache_key_index(db):
+    """The cache lookup is an index seek, not a scan"""
+    db.init_db()
+    with sqlite3.connect(db.db_path) as conn:
+        plan = conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT results, created_at FROM listings
+            WHERE cache_key = ? AND created_at > datetime('now', '-24 hours')
+        """, ("key",)).fetchall()
+    assert any("USING INDEX idx_listings_cache_key (cache_key=?)" in row[-1] for row in plan)
+
+def test_legacy_table_is_migrated(tmp_path):
+    """Rows cached under the old column-matched schema get keys, newest row per key kept"""
+    path = str(tmp_path / "legacy.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE listings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, site TEXT, location TEXT, min_price TEXT, max_price TEXT,
+                min_beds TEXT, max_beds TEXT, keywords TEXT, listing_type TEXT, page_number INTEGER, results TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, sort_by TEXT,
+                UNIQUE(site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page_number)
+            )
+        """)
+        rows = [("Zoopla", "Manchester", "100000", None, "2", "4", None, "sale", 1, '{"total_found": 1}', "newest"),
+                ("zoopla", "manchester", "100000", "0", "2", "4", "", "sale", 1, '{"total_found": 2}', "newest"),
+                ("Zoopla", "Leeds", None, None, None, None, None, "rent", 2, '{"total_found": 3}', None)]
+        conn.executemany("""
+            INSERT INTO listings (site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type,
+                                  page_number, results, sort_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+    database = Database()
+    database.db_path = path
+    database.init_db()
+
+    assert database.get_cached_results(**SEARCH)["total_found"] == 2
+    assert database.get_cached_results(site="Zoopla", location="Leeds", min_price=None, max_price=None, min_beds=None,
+                                       max_beds=None, keywords=None, listing_type="rent", page_number=2)["total_found"] == 3
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0] == 2
@@ -0,0 +1,84 @@
+import json
+import os
+import pytest
+from scrapers.normalize import normalize_listing
+from utils.dedup import DedupIndex, FuzzyDedupIndex, normalize_address
+from utils.listing import Listing
+
+def test_normalize_address():
+    assert normalize_address("12 High St., Manchester M1") == "12highstmanchesterm1"
+    assert normalize_address(None) == ""
+
+def test_matches_on_address_or_url():
+    seen = DedupIndex()
+    assert seen.add({"address": "12 High Street, Leeds", "url": "https://www.rightmove.co.uk/properties/1"})
+    assert seen.is_duplicate({"address": "12 high street leeds", "url": "https://www.zoopla.co.uk/x/"})
+    assert seen.is_duplicate({"address": "", "url": "HTTPS://WWW.RIGHTMOVE.CO.UK/properties/1"})
+    assert not seen.is_duplicate({"address": "14 High Street, Leeds", "url": ""})
+
+def test_empty_keys_never_match():
+    seen = DedupIndex()
+    assert seen.add(Listing(address="", url=None))
+    assert seen.add(Listing(address="", url=None))
+
+def test_add_all_keeps_first_of_each_in_order():
+    seen = DedupIndex()
+    rightmove = [{"address": "1 A Road", "url": "r1"}, {"address": "2 B Road", "url": "r2"}]
+    zoopla = [{"address": "2 b road", "url": "z1"}, {"address": "3 C Road", "url": "z2"}, {"address": "", "url": "z2"}]
+    merged = seen.add_all(rightmove) + seen.add_all(zoopla)
+    assert [l["url"] for l in merged] == ["r1", "r2", "z2"]
+
+def labelled_pairs():
+    with open(os.path.join(os.path.dirname(__file__), "fixtures", "dedup_pairs.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+@pytest.mark.parametrize("pair", labelled_pairs(), ids=lambda pair: pair["note"])
+def test_fuzzy_index_on_labelled_pairs(pair):
+    a = normalize_listing(dict(pair["a"], url="a"))
+    b = normalize_listing(dict(pair["b"], url="b"))
+    seen = FuzzyDedupIndex()
+    assert seen.add(a)
+    assert seen.is_duplicate(b) == pair["duplicate"]
+
+def test_fuzzy_index_blocks_reach_neighbouring_price_buckets():
+    seen = FuzzyDedupIndex(price_tolerance=0.05)
+    listings = [
+        normalize_listing({"source": "Rightmove", "url": "r", "title": "2 bed flat", "price": "£1,000 pcm",
+                           "address": "Canal Street, Manchester M1"}),
+        normalize_listing({"source": "Zoopla", "url": "z", "title": "2 bed flat", "price": "£1,040 pcm",
+                           "address": "Canal St, Manchester M1 3HE"})
+    ]
+    assert seen._bucket(1000) != seen._bucket(1040)
+    assert seen.add_all(listings) == listings[:1]
+
+def test_fuzzy_index_keeps_same_site_listings_on_one_street():
+    seen = FuzzyDedupIndex()
+    listings = [
+        normalize_listing({"source": "Rightmove", "url": f"r{n}", "title": "1 bed flat", "price": "£900 pcm",
+                           "address": "Deansgate, Manchester M3"})
+        for n in range(3)
+    ]
+    assert seen.add_all(listings) == listings
+
+@pytest.mark.parametrize("rightmove, zoopla, duplicate", [
+    ("Flat 3, 12 High St, London SW1", "High Street, London SW1A", True),
+    ("King's Rd, Chelsea, London SW3", "Kings Road, London SW3", True),
+    ("14 Marylebone High Street, London W1", "Marlebone High St, W1U", True),
+    ("Hill Street, Manchester M1", "Mill Street, Manchester M1", False),
+    ("Park Road, Manchester M1", "Park Lane, Manchester M1", False),
+])
+def test_fuzzy_index_matches_differently_written_addresses(rightmove, zoopla, duplicate):
+    seen = FuzzyDedupIndex()
+    listings = [
+        normalize_listing({"source": source, "url": source, "title": "2 bed flat", "price": "£1,500 pcm",
+                           "address": address})
+        for source, address in (("Rightmove", rightmove), ("Zoopla", zoopla))
+    ]
+    assert seen.add_all(listings) == (listings[:1] if duplicate else listings)
+
+def test_add_all_reports_what_each_dropped_listing_matched():
+    seen = DedupIndex()
+    first = {"address": "1 A Road", "url": "r1"}
+    dropped = []
+    seen.add_all([first, {"address": "1 a road", "url": "z1"}, {"address": "2 B Road", "url": "z2"}], dropped)
+    assert [(l["url"], match["url"]) for l, match in dropped] == [("z1", "r1")]
@@ -0,0 +1,27 @@
+import os
+from scrapers.diagnostics import ParseDiagnostics
+
+def make_diagnostics(tmp_path, monkeypatch, enabled="true"):
+    monkeypatch.setenv("SCRAPER_DIAGNOSTICS", enabled)
+    monkeypatch.setenv("SCRAPER_DIAGNOSTICS_SAMPLE_RATE", "1")
+    monkeypatch.setenv("SCRAPER_DIAGNOSTICS_DIR", str(tmp_path))
+    monkeypatch.setenv("SCRAPER_DIAGNOSTICS_MAX_FILES", "2")
+    return ParseDiagnostics()
+
+def test_disabled_by_default(tmp_path, monkeypatch):
+    diagnostics = make_diagnostics(tmp_path, monkeypatch, enabled="false")
+    assert diagnostics.capture("Rightmove", "no property cards", "https://rm/x", "<html></html>") is None
+    assert os.listdir(tmp_path) == []
+
+def test_captures_are_bounded(tmp_path, monkeypatch):
+    diagnostics = make_diagnostics(tmp_path, monkeypatch)
+    paths = []
+    for i in range(3):
+        path = diagnostics.capture("Zoopla", "no listing cards", None, f"<html>{i}</html>")
+        os.utime(path, (i, i))
+        paths.append(path)
+    diagnostics._prune()
+
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(p) for path in paths[1:] for p in (path, path[:-5] + ".json")
+    )
@@ -0,0 +1,71 @@
+import asyncio
+from scrapers import extraction_rules
+from scrapers.extraction_rules import ExtractionRule, ExtractionStats
+from scrapers.html_parser import parse_html
+from scrapers.parse_pool import ParsePool
+
+OLD_LAYOUT = "<div><span class='old-price'>£100</span></div>"
+NEW_LAYOUT = "<div><span class='old-price'>£90</span><b data-test='price'>£200</b></div>"
+
+def count_lookups(node):
+    """Wrap a node so every css_first call is counted"""
+    calls = []
+
+    class Counted:
+        def css_first(self, selector):
+            calls.append(selector)
+            return node.css_first(selector)
+
+    return Counted(), calls
+
+def test_rule_tries_last_winner_first(monkeypatch):
+    monkeypatch.setattr(extraction_rules, "extraction_stats", ExtractionStats())
+    rule = ExtractionRule("test", "price", "[data-test='price']", ".old-price")
+    old = parse_html(OLD_LAYOUT)
+
+    wrapped, calls = count_lookups(old)
+    assert rule.first(wrapped).text() == "£100"
+    assert calls == ["[data-test='price']", ".old-price"]
+
+    wrapped, calls = count_lookups(old)
+    assert rule.first(wrapped).text() == "£100"
+    assert calls == [".old-price"]
+
+    # Both match on the new layout; the remembered selector still wins
+    assert rule.first(parse_html(NEW_LAYOUT)).text() == "£90"
+
+def test_rule_counts_hits_and_misses(monkeypatch):
+    stats = ExtractionStats()
+    monkeypatch.setattr(extraction_rules, "extraction_stats", stats)
+    rule = ExtractionRule("test", "price", "[data-test='price']", ".old-price")
+
+    rule.first(parse_html(OLD_LAYOUT))
+    rule.first(parse_html(OLD_LAYOUT))
+    rule.first(parse_html("<div></div>"))
+    assert rule.all(parse_html(OLD_LAYOUT))
+
+    assert stats.snapshot() == {"test": {"price": {"hits": {".old-price": 3}, "misses": 1}}}
+
+def test_drained_counts_merge_into_parent():
+    worker, parent = ExtractionStats(), ExtractionStats()
+    worker.record("zoopla", "price", ".a")
+    parent.record("zoopla", "price", ".a")
+    parent.merge(worker.drain())
+    assert worker.snapshot() == {}
+    assert parent.snapshot()["zoopla"]["price"]["hits"] == {".a": 2}
+
+def record_hit(value):
+    extraction_rules.extraction_stats.record("test", "field", ".worker")
+    return value
+
+def test_pool_sends_worker_counts_back(monkeypatch):
+    stats = ExtractionStats()
+    monkeypatch.setattr(extraction_rules, "extraction_stats", stats)
+    monkeypatch.setattr("scrapers.parse_pool.extraction_stats", stats)
+    pool = ParsePool()
+    pool.size = 1
+    try:
+        assert asyncio.run(pool.run(record_hit, 7)) == 7
+    finally:
+        pool.shutdown()
+    assert stats.snapshot() == {"test": {"field": {"hits": {".worker": 1}, "misses": 0}}}
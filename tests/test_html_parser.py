@@ -0,0 +1,72 @@
+import os
+import pytest
+from scrapers import html_parser
+from scrapers.openrent import parse_openrent_html
+from scrapers.rightmove_scrape import parse_rightmove_dom
+from scrapers.zoopla import parse_zoopla_html
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+PARSERS = {
+    "zoopla_results.html": lambda html: parse_zoopla_html(html),
+    "rightmove_results.html": lambda html: parse_rightmove_dom(html, "https://www.rightmove.co.uk/property-for-sale/find.html"),
+    "openrent_results.html": lambda html: parse_openrent_html(html)
+}
+
+@pytest.mark.parametrize("backend", ["selectolax", "lxml"])
+@pytest.mark.parametrize("fixture", sorted(PARSERS))
+def test_backends_extract_identical_output(backend, fixture, monkeypatch):
+    """Every backend must produce exactly what the stdlib parser produces"""
+    if html_parser.resolve_backend(backend) != backend:
+        pytest.skip(f"{backend} is not installed")
+    html = read_fixture(fixture)
+
+    monkeypatch.setattr(html_parser, "HTML_PARSER_BACKEND", "html.parser")
+    expected = PARSERS[fixture](html)
+    monkeypatch.setattr(html_parser, "HTML_PARSER_BACKEND", backend)
+    assert PARSERS[fixture](html) == expected
+
+def test_fixtures_yield_listings():
+    listings, total_pages = parse_zoopla_html(read_fixture("zoopla_results.html"))
+    assert len(listings) == 25 and total_pages == 7
+    assert listings[0]["image"].startswith("https://lid.zoocdn.com/u/645/430/0000.jpg")
+
+    results = parse_rightmove_dom(read_fixture("rightmove_results.html"), "https://www.rightmove.co.uk/x")
+    assert len(results["listings"]) == 24 and results["total_pages"] == 52
+
+    results = parse_openrent_html(read_fixture("openrent_results.html"))
+    assert len(results["listings"]) == 20 and results["total_pages"] == 18
+
+def test_unknown_backend_falls_back():
+    assert html_parser.resolve_backend("nope") in html_parser.BACKENDS
+
+@pytest.mark.parametrize("backend", ["selectolax", "lxml", "html.parser"])
+@pytest.mark.parametrize("fixture", ["zoopla_results.html", "rightmove_results.html"])
+def test_partial_parse_matches_full_parse(backend, fixture, monkeypatch):
+    if html_parser.resolve_backend(backend) != backend:
+        pytest.skip(f"{backend} is not installed")
+    html = read_fixture(fixture)
+    monkeypatch.setattr(html_parser, "HTML_PARSER_BACKEND", backend)
+
+    monkeypatch.setattr(html_parser, "PARTIAL_PARSE", False)
+    expected = PARSERS[fixture](html)
+    monkeypatch.setattr(html_parser, "PARTIAL_PARSE", True)
+    assert PARSERS[fixture](html) == expected
+
+def test_partial_parse_falls_back_without_results_container():
+    strainer = html_parser.Strainer("[data-testid='regular-listings']")
+    html = "<html><body><div class='card'>x</div></body></html>"
+    root = html_parser.parse_partial(html, strainer, required=".card")
+    assert root.css_first(".card").text() == "x"
+
+def test_strainer_matches_simple_selectors():
+    strainer = html_parser.Strainer("div.card.featured", "[data-test*='propertyCard']", "span[class='count']")
+    assert strainer.matches("div", {"class": ["card", "featured", "x"]})
+    assert not strainer.matches("div", {"class": ["card"]})
+    assert strainer.matches("article", {"data-test": "propertyCard-3"})
+    assert strainer.matches("span", {"class": "count"})
+    assert not strainer.matches("p", {"class": "count"})
@@ -0,0 +1,83 @@
+import asyncio
+import time
+import pytest
+from scrapers import http_client as http_client_module
+from scrapers.http_client import HTTPClient
+from scrapers.proxy_rotator import ProxyRotator
+from utils.security import ScraperAPIMonitor
+
+@pytest.fixture
+def rotator(monkeypatch):
+    monkeypatch.setenv("SCRAPER_API_KEY", "key-a")
+    monkeypatch.setenv("SCRAPINGBEE_KEY", "key-b")
+    monkeypatch.delenv("BRIGHTDATA_KEY", raising=False)
+    monkeypatch.setenv("PROXY_EXPLORE_RATE", "0")
+    rotator = ProxyRotator()
+    monkeypatch.setattr(http_client_module, "get_proxy_rotator", lambda: rotator)
+    return rotator
+
+@pytest.fixture
+def monitor(monkeypatch):
+    monitor = ScraperAPIMonitor()
+    monkeypatch.setattr(http_client_module, "scraper_api_monitor", monitor)
+    return monitor
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("HEDGE_MIN_DELAY", "0.1")
+    monkeypatch.setenv("HEDGE_DEFAULT_DELAY", "0.1")
+    client = HTTPClient()
+
+    async def fake_get(url, headers=None, timeout=None, raw=False):
+        # ScraperAPI is stuck on this page, ScrapingBee answers quickly
+        await asyncio.sleep(5 if "scraperapi" in url else 0.05)
+        return 200, url
+
+    client._get = fake_get
+    yield client
+    client.close()
+
+def test_slow_request_is_hedged_through_another_provider(client, rotator, monitor):
+    start = time.monotonic()
+    status, body = asyncio.run(client.fetch_upstream("https://www.zoopla.co.uk/for-sale/"))
+    elapsed = time.monotonic() - start
+
+    assert status == 200
+    assert "scrapingbee" in body
+    assert elapsed < 1
+    assert client.hedge_wins == 1
+    assert monitor.hedged_today == 1
+    assert monitor.requests_today == 1
+
+def test_hedging_respects_budget(client, rotator, monitor):
+    monitor.hedge_budget_fraction = 0
+    client.timeout = 10
+
+    async def fetch():
+        return await asyncio.wait_for(client.fetch_upstream("https://www.zoopla.co.uk/for-sale/"), 0.5)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(fetch())
+    assert client.hedged_count == 0
+
+def test_hedge_reservations_are_thread_safe(monitor):
+    import threading
+    monitor.daily_limit = 1000
+    monitor.hourly_limit = 1000
+    monitor.hedge_budget_fraction = 0.1
+    granted = []
+
+    def reserve():
+        for _ in range(50):
+            if monitor.reserve_hedge():
+                granted.append(1)
+
+    threads = [threading.Thread(target=reserve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(granted) == 100
+    assert monitor.hedged_today == 100
+    assert monitor.requests_today == 100
@@ -0,0 +1,43 @@
+import json
+import pickle
+import pytest
+from utils.listing import Listing, LISTING_FIELDS, dumps, loads
+
+def test_dict_style_access():
+    listing = Listing(title="2 bed flat", price="£1,250 pcm", url="https://www.zoopla.co.uk/x/")
+    assert listing["title"] == "2 bed flat"
+    assert listing.get("url") == "https://www.zoopla.co.uk/x/"
+    assert listing.get("nope", "default") == "default"
+    listing["source"] = "Zoopla"
+    assert listing.source == "Zoopla" and "source" in listing
+    with pytest.raises(KeyError):
+        listing["nope"] = 1
+    assert not hasattr(listing, "__dict__")
+
+def test_dumps_matches_plain_json():
+    listing = Listing(title="Flat", price="£950 pcm", price_value=950, bedrooms=1)
+    results = {"listings": [listing], "total_pages": 3}
+    encoded = dumps(results)
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded) == {"listings": [listing.to_dict()], "total_pages": 3}
+    assert list(loads(encoded)["listings"][0]) == list(LISTING_FIELDS)
+
+def test_from_dict_ignores_unknown_keys():
+    listing = Listing.from_dict({"title": "Studio", "description": "Near the station", "extra": 1})
+    assert listing.desc == "Near the station"
+    assert Listing.from_dict(listing.to_dict()) == listing
+
+def test_pickles_for_the_parse_pool():
+    listing = Listing(title="House", bedrooms=3)
+    assert pickle.loads(pickle.dumps(listing)) == listing
+
+def test_search_responses_encode_listings_and_other_responses_use_flask_json():
+    from flask import jsonify
+    from main import app, listing_json
+
+    with app.app_context():
+        response = listing_json({"listings": [Listing(source="Zoopla", url="https://z/1", price_value=1200)]})
+        assert response.mimetype == "application/json"
+        assert json.loads(response.get_data())["listings"][0]["price_value"] == 1200
+        # Flask's own provider, which orjson's str-keys-only encoding would break
+        assert json.loads(jsonify({1: "a"}).get_data()) == {"1": "a"}
@@ -0,0 +1,47 @@
+import pytest
+from scrapers.normalize import normalize_listing, normalize_listings
+
+@pytest.mark.parametrize("price, value, period", [
+    ("£1,250 pcm", 1250, "pcm"),
+    ("£295 pw", 295, "pw"),
+    ("£1,100 per calendar month", 1100, "pcm"),
+    ("£325,000", 325000, "total"),
+    ("Offers over £1,000,000", 1000000, "total"),
+    ("POA", None, "total"),
+])
+def test_price_value_and_period(price, value, period):
+    listing = normalize_listing({"price": price})
+    assert (listing["price_value"], listing["price_period"]) == (value, period)
+
+def test_rooms_type_and_outcode_from_text():
+    listing = normalize_listing({
+        "price": "£325,000",
+        "title": "3 bedroom semi-detached house for sale",
+        "specs": "",
+        "address": "Kings Road, London SW3 4UT"
+    })
+    assert listing["bedrooms"] == 3 and listing["bathrooms"] is None
+    assert listing["specs"] == "3 beds"
+    assert listing["outcode"] == "SW3"
+    assert listing["property_type"] == "semi-detached"
+
+    studio = normalize_listing({"price": "£950 pcm", "title": "Studio to rent", "address": "Oxford Road, Manchester"})
+    assert studio["bedrooms"] == 0 and studio["property_type"] == "studio"
+    assert studio["outcode"] == "" and "specs" not in studio
+
+def test_structured_values_are_kept():
+    listing = normalize_listing({
+        "price": "£1,250 pcm",
+        "specs": "5 beds",
+        "price_value": 1200,
+        "bedrooms": 2,
+        "bathrooms": 1,
+        "property_type": "semi_detached"
+    })
+    assert (listing["price_value"], listing["bedrooms"], listing["bathrooms"]) == (1200, 2, 1)
+    assert listing["property_type"] == "semi-detached"
+
+def test_normalize_listings_updates_page_in_place():
+    listings = [{"price": "£900 pcm", "specs": "1 bed 1 bath"}, {"price": "£200,000", "title": "2 bed flat"}]
+    assert normalize_listings(listings) is listings
+    assert [l["bedrooms"] for l in listings] == [1, 2]
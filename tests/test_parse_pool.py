@@ -0,0 +1,26 @@
+import asyncio
+import os
+from scrapers.parse_pool import ParsePool
+from scrapers.zoopla import parse_zoopla_html
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def test_pool_parses_raw_bytes_like_inline():
+    with open(os.path.join(FIXTURES, "zoopla_results.html"), "rb") as f:
+        body = f.read()
+
+    pool = ParsePool()
+    pool.size = 1
+    try:
+        listings, total_pages = asyncio.run(pool.run(parse_zoopla_html, body, ""))
+    finally:
+        pool.shutdown()
+
+    assert (listings, total_pages) == parse_zoopla_html(body.decode("utf-8"))
+    assert len(listings) == 25
+
+def test_zero_size_parses_in_process():
+    pool = ParsePool()
+    pool.size = 0
+    assert asyncio.run(pool.run(parse_zoopla_html, b"<html></html>", "")) == ([], 1)
+    assert pool._executor is None
@@ -0,0 +1,63 @@
+import sqlite3
+import pytest
+from utils.dedup import FuzzyDedupIndex
+from utils.listing import Listing
+from utils.property_registry import PropertyRegistry, source_key
+
+@pytest.fixture
+def registry(tmp_path):
+    return PropertyRegistry(db_path=str(tmp_path / "identity.db"))
+
+def test_source_key_prefers_site_ids_then_url_ids():
+    assert source_key(Listing(source="Rightmove", property_id="140000000")) == ("rightmove", "140000000")
+    assert source_key(Listing(source="Zoopla", url="https://www.zoopla.co.uk/for-sale/details/6500000/?search=1")) == \
+        ("zoopla", "6500000")
+    assert source_key(Listing(source="Zoopla", listing_id="6500000")) == ("zoopla", "6500000")
+    assert source_key({"source": "OpenRent", "url": "https://www.openrent.co.uk/Flat-A/"}) == \
+        ("openrent", "https://www.openrent.co.uk/flat-a")
+    assert source_key(Listing(source="Zoopla")) is None
+
+def test_ids_are_stable_across_price_changes(registry):
+    first = [Listing(source="Rightmove", property_id="1", price="£1,000 pcm"),
+             Listing(source="Rightmove", property_id="2", price="£900 pcm")]
+    assert registry.assign(first) == 2
+    assert first[0]["id"] != first[1]["id"]
+
+    relisted = [Listing(source="Rightmove", property_id="1", price="£950 pcm")]
+    assert registry.assign(relisted) == 0
+    assert relisted[0]["id"] == first[0]["id"]
+    assert registry.lookup(Listing(source="Rightmove", property_id="2")) == first[1]["id"]
+
+def test_cross_site_duplicates_share_an_id(registry):
+    rightmove = Listing(source="Rightmove", property_id="1", address="12 Canal Street, Manchester M1",
+                        price_value=1000, price_period="pcm", bedrooms=2, outcode="M1")
+    zoopla = Listing(source="Zoopla", listing_id="9", address="12 Canal St, Manchester M1 3HE",
+                     price_value=1000, price_period="pcm", bedrooms=2, outcode="M1")
+    duplicates = []
+    page = FuzzyDedupIndex().add_all([rightmove, zoopla], duplicates)
+    assert page == [rightmove] and duplicates == [(zoopla, rightmove)]
+
+    registry.assign(page, duplicates)
+    # Zoopla's copy on its own later resolves to the same property
+    later = [Listing(source="Zoopla", listing_id="9")]
+    registry.assign(later)
+    assert later[0]["id"] == rightmove["id"]
+
+def test_known_ids_are_never_relinked(registry):
+    a, b = Listing(source="Rightmove", property_id="1"), Listing(source="Zoopla", listing_id="2")
+    registry.assign([a, b])
+    registry.assign([a], [(b, a)])
+    assert registry.lookup(b) == b["id"] != a["id"]
+
+def test_large_pages_are_looked_up_in_batches(registry):
+    listings = [Listing(source="Zoopla", listing_id=str(n)) for n in range(1200)]
+    assert registry.assign(listings) == 1200
+    again = [Listing(source="Zoopla", listing_id=str(n)) for n in range(1200)]
+    assert registry.assign(again) == 0
+    assert [l["id"] for l in again] == [l["id"] for l in listings]
+    with sqlite3.connect(registry.db_path) as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT property_id FROM property_sources WHERE source = ? AND source_key = ?",
+            ("zoopla", "1")
+        ).fetchall()
+    assert "PRIMARY KEY" in plan[0][-1]
@@ -0,0 +1,59 @@
+import pytest
+from scrapers.proxy_rotator import ProxyRotator
+
+@pytest.fixture
+def rotator(monkeypatch):
+    monkeypatch.setenv("SCRAPER_API_KEY", "key-a")
+    monkeypatch.setenv("SCRAPINGBEE_KEY", "key-b")
+    monkeypatch.delenv("BRIGHTDATA_KEY", raising=False)
+    monkeypatch.setenv("PROXY_EXPLORE_RATE", "0")
+    monkeypatch.setenv("PROXY_FAILURE_THRESHOLD", "3")
+    monkeypatch.setenv("PROXY_OPEN_SECONDS", "0")
+    return ProxyRotator()
+
+def test_prefers_fastest_healthy_provider(rotator):
+    for _ in range(5):
+        rotator.record_result("scraperapi", True, 8.0)
+        rotator.record_result("scrapingbee", True, 2.0)
+    assert rotator.choose_provider() == "scrapingbee"
+    assert rotator.get_stats()["scrapingbee"]["p50_latency"] == 2.0
+
+def test_circuit_opens_and_half_open_probe_recovers(rotator):
+    for _ in range(5):
+        rotator.record_result("scraperapi", True, 1.0)
+    for _ in range(3):
+        rotator.record_result("scrapingbee", False, 30.0)
+    assert rotator.get_stats()["scrapingbee"]["state"] == "open"
+
+    # Cooldown is zero, so the next pick is a single half-open probe
+    assert rotator.choose_provider() == "scrapingbee"
+    assert rotator.choose_provider() == "scraperapi"
+
+    rotator.record_result("scrapingbee", True, 0.5)
+    assert rotator.get_stats()["scrapingbee"]["state"] == "closed"
+
+def test_failed_probe_reopens_circuit(rotator):
+    for _ in range(3):
+        rotator.record_result("scrapingbee", False, 30.0)
+    assert rotator.choose_provider() == "scrapingbee"
+    rotator.record_result("scrapingbee", False, 30.0)
+    assert rotator.get_stats()["scrapingbee"]["state"] == "open"
+
+def test_target_url_is_encoded(rotator):
+    url = rotator.build_proxy_url("scraperapi", "https://www.zoopla.co.uk/for-sale/?q=london&pn=2")
+    assert "url=https%3A%2F%2Fwww.zoopla.co.uk%2Ffor-sale%2F%3Fq%3Dlondon%26pn%3D2" in url
+
+def test_abandoned_requests_do_not_count_as_successes(rotator):
+    # Hedge losers cut short while scrapingbee is failing most requests
+    for _ in range(12):
+        rotator.record_result("scrapingbee", True, 4.0, abandoned=True)
+    for _ in range(4):
+        rotator.record_result("scrapingbee", True, 1.0)
+        rotator.record_result("scrapingbee", False, 30.0)
+        rotator.record_result("scrapingbee", False, 30.0)
+
+    stats = rotator.get_stats()["scrapingbee"]
+    assert stats["samples"] == 12
+    assert stats["success_rate"] == 0.333
+    assert stats["state"] == "open"
+    assert stats["p50_latency"] == 4.0
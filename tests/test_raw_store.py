@@ -0,0 +1,59 @@
+import sqlite3
+import pytest
+import reparse_cache
+from utils.database import Database
+from utils.raw_store import RawPageStore
+from utils.result_codec import result_codec
+from scrapers.parser_version import parser_version_for
+from tests.test_scrapers import RIGHTMOVE_HTML
+
+@pytest.fixture
+def store(tmp_path):
+    return RawPageStore(db_path=str(tmp_path / "raw.db"))
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database()
+    database.db_path = str(tmp_path / "raw.db")
+    database.init_db()
+    return database
+
+def test_pages_are_stored_once_per_content(store):
+    store.save("https://www.zoopla.co.uk/a", "<html>same</html>")
+    store.save("https://www.zoopla.co.uk/b", "<html>same</html>")
+
+    assert store.get("https://www.zoopla.co.uk/a") == "<html>same</html>"
+    assert store.get("https://www.zoopla.co.uk/missing") is None
+    with sqlite3.connect(store.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM raw_blobs").fetchone()[0] == 1
+
+def test_cleanup_drops_expired_pages_and_orphaned_blobs(store):
+    store.save("https://www.zoopla.co.uk/a", "<html>a</html>")
+    assert store.cleanup(max_age_hours=0) == 1
+    with sqlite3.connect(store.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM raw_blobs").fetchone()[0] == 0
+
+def test_stale_rows_are_rebuilt_from_raw_pages(db, store):
+    # store shares db's file; the job must read pages from the database it was given
+    params = dict(location="London", min_price="", max_price="", min_beds="1", max_beds="2",
+                  keywords="", listing_type="sale", page_number=1)
+    stale = {"listings": [{"title": "broken", "source": "Rightmove"}], "total_pages": 1}
+    db.cache_results(site="Rightmove", results=stale, parser_version="rightmove:0", **params)
+    db.cache_results(site="Combined", results=stale, parser_version="rightmove:0+zoopla:0", **params)
+
+    url = reparse_cache.source_url("rightmove", {
+        "location": "London", "min_price": None, "max_price": None, "min_beds": "1", "max_beds": "2",
+        "listing_type": "sale", "sort_by": "newest", "page_number": 1
+    })
+    store.save(url, RIGHTMOVE_HTML)
+
+    assert reparse_cache.reparse_cache(db.db_path) == (1, 1, 0)
+
+    with sqlite3.connect(db.db_path) as conn:
+        rows = conn.execute("SELECT site, results, parser_version FROM listings").fetchall()
+    assert len(rows) == 1
+    site, results, version = rows[0]
+    results = result_codec.decode(results)
+    assert version == parser_version_for("Rightmove")
+    assert results["listings"][0]["property_id"] == "123456"
+    assert results["listings"][0]["source"] == "Rightmove"
@@ -0,0 +1,62 @@
+import json
+import sqlite3
+import pytest
+import compress_cache
+from utils.database import Database
+from utils.listing import Listing
+from utils.result_codec import FORMAT_ZLIB, ResultCodec
+
+RESULTS = {
+    "listings": [Listing(source="Zoopla", url=f"https://www.zoopla.co.uk/for-sale/details/{n}/", address=f"{n} Canal Street, M1",
+                         price="£250,000", price_value=250000, desc="Bright two bedroom flat " * 5)
+                 for n in range(25)],
+    "total_found": 25,
+    "total_pages": 4
+}
+
+SEARCH = dict(site="Zoopla", location="Manchester", min_price="", max_price="", min_beds="1", max_beds="2",
+              keywords="", listing_type="sale", page_number=1)
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database()
+    database.db_path = str(tmp_path / "cache.db")
+    database.init_db()
+    return database
+
+@pytest.mark.parametrize("codec", ["none", "zlib", "zstd"])
+def test_round_trip_with_a_format_byte(codec):
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    result_codec = ResultCodec(codec, level=3)
+    encoded = result_codec.encode(RESULTS)
+    assert encoded[0] == result_codec.format
+    assert result_codec.is_current(encoded)
+    decoded = result_codec.decode(encoded)
+    assert decoded["total_pages"] == 4
+    assert decoded["listings"][3]["url"] == "https://www.zoopla.co.uk/for-sale/details/3/"
+
+def test_plain_json_rows_still_decode_and_unknown_formats_fail():
+    codec = ResultCodec("zlib")
+    assert codec.decode('{"total_found": 3}') == {"total_found": 3}
+    assert codec.decode(b'{"total_found": 3}') == {"total_found": 3}
+    assert not codec.is_current('{"total_found": 3}')
+    with pytest.raises(ValueError):
+        codec.decode(b"\x09payload")
+
+def test_pages_are_cached_compressed(db):
+    db.cache_results(results=RESULTS, **SEARCH)
+    with sqlite3.connect(db.db_path) as conn:
+        payload = conn.execute("SELECT results FROM listings").fetchone()[0]
+    assert payload[0] == FORMAT_ZLIB
+    assert len(payload) * 4 < len(json.dumps(db.get_cached_results(**SEARCH)))
+
+def test_migration_rewrites_text_rows(db):
+    db.cache_results(results=RESULTS, **SEARCH)
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE listings SET results = ?", (json.dumps({"total_found": 9}),))
+
+    rewritten, before, after, _, _ = compress_cache.compress_cache(db.db_path, codec=ResultCodec("zlib"))
+    assert rewritten == 1 and after > 0
+    assert db.get_cached_results(**SEARCH) == {"total_found": 9}
+    assert compress_cache.compress_cache(db.db_path, codec=ResultCodec("zlib"))[0] == 0
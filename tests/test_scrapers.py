@@ -0,0 +1,248 @@
+import pytest
+import asyncio
+import json
+import time
+from unittest.mock import patch
+from scrapers import rightmove_scrape, zoopla
+from scrapers.html_parser import parse_html
+
+RIGHTMOVE_HTML = """
+<html><body>
+<span class="searchHeader-resultCount">30</span>
+<div data-test="propertyCard">
+    <a data-test="property-link" href="/properties/123456.html">
+        <span data-test="property-price">£250,000</span>
+        <address data-test="property-address">High Street, London</address>
+    </a>
+    <h2 data-test="property-title">2 bedroom flat for sale</h2>
+    <p data-test="property-description">A lovely flat</p>
+</div>
+</body></html>
+"""
+
+RIGHTMOVE_MODEL = {
+    "resultCount": "1,234",
+    "pagination": {"total": 42},
+    "properties": [{
+        "id": 987654,
+        "bedrooms": 3,
+        "bathrooms": 2,
+        "summary": "Family home with garden",
+        "displayAddress": "Park Road, Leeds",
+        "propertySubType": "Semi-Detached",
+        "propertyTypeFullDescription": "3 bedroom semi-detached house for sale",
+        "price": {"amount": 325000, "frequency": "not specified", "displayPrices": [{"displayPrice": "£325,000"}]},
+        "propertyImages": {"mainImageSrc": "https://media.rightmove.co.uk/1.jpeg"},
+        "location": {"latitude": 53.8, "longitude": -1.55},
+        "propertyUrl": "/properties/987654#/?channel=RES_BUY"
+    }]
+}
+
+ZOOPLA_NEXT_DATA = {
+    "props": {"pageProps": {
+        "regularListingsFormatted": [{
+            "listingId": 654321,
+            "price": "£1,250 pcm",
+            "priceUnformatted": 1250,
+            "address": "Deansgate, Manchester M3",
+            "title": "2 bed flat to rent",
+            "summaryDescription": "Bright flat close to the station",
+            "features": [{"iconId": "bed", "content": 2}, {"iconId": "bath", "content": 1}],
+            "listingUris": {"detail": "/to-rent/details/654321/"},
+            "image": {"src": "https://lid.zoocdn.com/645/430/abc.jpg"},
+            "location": {"coordinates": {"latitude": 53.48, "longitude": -2.25}},
+            "propertyType": "flat"
+        }],
+        "pagination": {"pageNumber": 1, "pageNumberMax": 12}
+    }}
+}
+
+ZOOPLA_HTML = (
+    '<html><body><script id="__NEXT_DATA__" type="application/json">'
+    + json.dumps(ZOOPLA_NEXT_DATA) +
+    '</script></body></html>'
+)
+
+ZOOPLA_DOM_HTML = """
+<html><body>
+<div><div><picture><source srcset="https://lid.zoocdn.com/1.jpg 1x, https://lid.zoocdn.com/2.jpg 2x"></picture>
+<a data-testid="listing-card-content" href="/to-rent/details/111/">
+    <p data-testid="listing-price">£950 pcm</p>
+    <address>Oxford Road, Manchester</address>
+    <p>Studio near the university</p>
+</a></div></div>
+<div data-testid="pagination"><a>1</a><a>2</a><a>3</a><a>Next</a></div>
+</body></html>
+"""
+
+@pytest.fixture(autouse=True)
+def scraper_api_key(monkeypatch):
+    monkeypatch.setenv("SCRAPER_API_KEY", "test-key")
+
+@pytest.fixture(autouse=True)
+def inline_parsing(monkeypatch):
+    """Parse on a thread rather than spinning up worker processes"""
+    from scrapers.parse_pool import parse_pool
+    monkeypatch.setattr(parse_pool, "size", 0)
+
+def test_async_rightmove_matches_sync_parser():
+    """The async path should produce the same results as parsing the page directly"""
+    async def fake_fetch(url, timeout=None, raw=False):
+        return 200, RIGHTMOVE_HTML
+
+    with patch.object(rightmove_scrape.http_client, "fetch_upstream", side_effect=fake_fetch):
+        results = asyncio.run(rightmove_scrape.async_scrape_rightmove_from_url("https://www.rightmove.co.uk/x", page=1))
+
+    assert results == rightmove_scrape.parse_rightmove_html(RIGHTMOVE_HTML, "https://www.rightmove.co.uk/x", 1)
+    assert results["listings"][0]["property_id"] == "123456"
+    assert results["total_pages"] == 2
+
+def test_rightmove_fetch_error_returns_empty_results():
+    """A failed fetch is reported as an empty page, not an exception"""
+    with patch.object(rightmove_scrape.http_client, "fetch_upstream_sync", side_effect=ConnectionError("refused")):
+        results = rightmove_scrape.scrape_rightmove_from_url("https://www.rightmove.co.uk/x", page=2)
+
+    assert results == rightmove_scrape.error_results(2)
+
+def test_async_rightmove_does_not_block_event_loop():
+    """Two slow fetches awaited together should take roughly as long as one"""
+    async def slow_fetch(url, timeout=None, raw=False):
+        await asyncio.sleep(0.3)
+        return 200, RIGHTMOVE_HTML
+
+    async def run_two():
+        return await asyncio.gather(
+            rightmove_scrape.async_scrape_rightmove_from_url("https://www.rightmove.co.uk/a", page=1),
+            rightmove_scrape.async_scrape_rightmove_from_url("https://www.rightmove.co.uk/b", page=1)
+        )
+
+    with patch.object(rightmove_scrape.http_client, "fetch_upstream", side_effect=slow_fetch):
+        start = time.monotonic()
+        results = asyncio.run(run_two())
+        elapsed = time.monotonic() - start
+
+    assert len(results) == 2
+    assert elapsed < 0.55
+
+def test_combined_returns_partial_results_at_deadline():
+    """A source that misses the deadline is reported and left to finish in the background"""
+    from unittest.mock import MagicMock
+    from scraper_bot import ScraperBot
+    from utils.deadline import Deadline
+
+    bot = ScraperBot()
+    bot.db = MagicMock()
+    bot.db.get_cached_results.return_value = None
+    finished = []
+
+    async def fast_rightmove(*args, **kwargs):
+        return {"listings": [{"address": "1 High St", "url": "https://rm/1"}], "total_pages": 3}
+
+    async def slow_zoopla(*args, **kwargs):
+        await asyncio.sleep(0.5)
+        finished.append("Zoopla")
+        return {"listings": [{"address": "2 Low St", "url": "https://z/2"}], "total_pages": 2}
+
+    bot.scrape_rightmove = fast_rightmove
+    bot.scrape_zoopla = slow_zoopla
+
+    start = time.monotonic()
+    results = asyncio.run(bot.scrape_combined("london", "", "", "1", "2", "sale", deadline=Deadline(0.2)))
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.45
+    assert results["partial"] is True
+    assert results["timed_out_sources"] == ["Zoopla"]
+    assert [listing["url"] for listing in results["listings"]] == ["https://rm/1"]
+    bot.db.cache_results.assert_not_called()
+
+    time.sleep(0.5)
+    assert finished == ["Zoopla"]
+
+def test_cache_lookups_do_not_block_the_event_loop():
+    """A slow cache query runs in a thread, so other fetches on the loop keep moving"""
+    from unittest.mock import MagicMock
+    from scraper_bot import ScraperBot
+
+    bot = ScraperBot()
+    bot.db = MagicMock()
+    bot.db.get_cached_results.side_effect = lambda **kwargs: time.sleep(0.3) or {"listings": []}
+
+    async def run():
+        start = time.monotonic()
+
+        async def ticker():
+            for _ in range(5):
+                await asyncio.sleep(0.02)
+            return time.monotonic() - start
+
+        _, ticked = await asyncio.gather(bot.scrape_rightmove("london", "", "", "1", "2", "sale"), ticker())
+        return ticked
+
+    # The ticker finishes while the lookup is still running
+    assert asyncio.run(run()) < 0.25
+
+def test_zoopla_reads_embedded_json():
+    """Listings and pagination come from __NEXT_DATA__ with structured fields"""
+    listings, total_pages = zoopla.parse_zoopla_html(ZOOPLA_HTML)
+
+    assert total_pages == 12
+    assert listings[0]["url"] == "https://www.zoopla.co.uk/to-rent/details/654321/"
+    assert listings[0]["price_value"] == 1250
+    assert (listings[0]["bedrooms"], listings[0]["bathrooms"]) == (2, 1)
+    assert (listings[0]["latitude"], listings[0]["longitude"]) == (53.48, -2.25)
+    assert listings[0]["specs"] == "2 beds 1 bath"
+    assert zoopla.parse_zoopla_html(ZOOPLA_HTML, keywords="garden") == ([], 12)
+
+def test_zoopla_falls_back_to_dom_without_embedded_json():
+    listings, total_pages = zoopla.parse_zoopla_html(ZOOPLA_DOM_HTML)
+
+    assert total_pages == 3
+    assert listings[0]["url"] == "https://www.zoopla.co.uk/to-rent/details/111/"
+    assert listings[0]["price"] == "£950 pcm"
+    assert listings[0]["image"] == "https://lid.zoocdn.com/1.jpg"
+
+def test_zoopla_image_map_picks_nearest_picture():
+    """Each card takes the first picture under its nearest ancestor that has one"""
+    root = parse_html("""
+    <div id="list">
+      <div><div><picture><source srcset="https://img/a.jpg 1x"></picture></div><div><a class="card" href="/a">A</a></div></div>
+      <div><div><picture><img src="https://img/plain.jpg"></picture></div>
+           <div><div><picture><source srcset="https://img/b.jpg 1x"></picture></div><a class="card" href="/b">B</a></div></div>
+      <div><a class="card" href="/c">C</a></div>
+    </div>
+    """)
+    images = zoopla.build_image_map(root)
+    cards = root.css("a.card")
+    found = [zoopla.parse_card(card, images)["image"] for card in cards]
+    # C has no picture of its own, so like the old walk it reaches the list's first
+    assert found == ["https://img/a.jpg", "https://img/b.jpg", "https://img/a.jpg"]
+
+def test_rightmove_reads_json_model():
+    """Listings and an exact page count come from window.jsonModel, not the cards"""
+    html = "<html><script>window.jsonModel = " + json.dumps(RIGHTMOVE_MODEL) + "</script></html>"
+    results = rightmove_scrape.parse_rightmove_html(html, "https://www.rightmove.co.uk/x", page=2)
+
+    assert results["total_found"] == 1234
+    assert results["total_pages"] == 42
+    assert results["has_next_page"] is True
+    listing = results["listings"][0]
+    assert listing["property_id"] == "987654"
+    assert listing["price"] == "£325,000"
+    assert listing["price_value"] == 325000
+    assert (listing["bedrooms"], listing["bathrooms"]) == (3, 2)
+    assert listing["url"] == "https://www.rightmove.co.uk/properties/987654#/?channel=RES_BUY"
+
+def test_rightmove_reads_search_api_response():
+    model = dict(RIGHTMOVE_MODEL, pagination={})
+    results = rightmove_scrape.parse_rightmove_html(json.dumps(model), "https://www.rightmove.co.uk/x")
+
+    assert results["total_pages"] == 52
+    assert results["listings"][0]["address"] == "Park Road, Leeds"
+
+def test_rightmove_without_count_does_not_guess_pages():
+    html = RIGHTMOVE_HTML.replace('<span class="searchHeader-resultCount">30</span>', "")
+    results = rightmove_scrape.parse_rightmove_html(html, "https://www.rightmove.co.uk/x", page=3)
+
+    assert results["total_pages"] == 3
+    assert results["has_next_page"] is False
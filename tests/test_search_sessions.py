@@ -0,0 +1,71 @@
+from unittest.mock import patch
+from utils.dedup import DedupIndex
+from utils.search_sessions import SearchSessionStore
+
+def listing(n, source="Rightmove"):
+    return {"address": f"{n} High Street, Leeds", "url": f"https://{source.lower()}/{n}", "source": source}
+
+def test_later_pages_only_return_unseen_listings():
+    store = SearchSessionStore(index_factory=DedupIndex)
+    token = store.create([listing(1), listing(2)], search="leeds")
+    # Zoopla's copy of listing 2 turns up on page 2
+    same_token, unseen = store.filter(token, [listing(2, "Zoopla"), listing(3)], search="leeds")
+    assert same_token == token
+    assert [l["url"] for l in unseen] == ["https://rightmove/3"]
+    _, unseen = store.filter(token, [listing(3, "Zoopla"), listing(4)], search="leeds")
+    assert [l["url"] for l in unseen] == ["https://rightmove/4"]
+
+def test_unknown_token_or_other_search_starts_a_new_session():
+    store = SearchSessionStore(index_factory=DedupIndex)
+    token = store.create([listing(1)], search="leeds")
+    new_token, unseen = store.filter("bogus", [listing(1)], search="leeds")
+    assert new_token != token and len(unseen) == 1
+    other_token, unseen = store.filter(token, [listing(1)], search="york")
+    assert other_token != token and len(unseen) == 1
+
+def test_sessions_expire_after_ttl():
+    store = SearchSessionStore(ttl_minutes=1, index_factory=DedupIndex)
+    with patch("utils.search_sessions.time.monotonic", return_value=1000.0):
+        token = store.create([listing(1)], search="leeds")
+    with patch("utils.search_sessions.time.monotonic", return_value=1061.0):
+        new_token, unseen = store.filter(token, [listing(1)], search="leeds")
+    assert new_token != token and len(unseen) == 1
+    assert len(store) == 1
+
+def test_least_recently_used_sessions_are_evicted():
+    store = SearchSessionStore(max_sessions=2, index_factory=DedupIndex)
+    first = store.create([listing(1)])
+    second = store.create([listing(1)])
+    store.filter(first, [])
+    store.create([listing(1)])
+    assert len(store) == 2
+    assert store.filter(first, [listing(1)]) == (first, [])
+    assert store.filter(second, [listing(1)])[0] != second
+
+def test_full_session_still_filters_but_stops_remembering():
+    store = SearchSessionStore(max_listings=2, index_factory=DedupIndex)
+    token = store.create([listing(1), listing(2)])
+    _, unseen = store.filter(token, [listing(2), listing(3)])
+    assert [l["url"] for l in unseen] == ["https://rightmove/3"]
+    _, unseen = store.filter(token, [listing(3)])
+    assert len(unseen) == 1
+
+def test_combined_pages_with_a_cursor_or_token_continue_the_session():
+    from main import track_combined_page
+
+    params = dict(location="Leeds", min_price="0", max_price="500000", min_beds="1", max_beds="2",
+                  keywords="", listing_type="sale")
+    first = track_combined_page({"listings": [listing(1), listing(2)]}, {}, params)
+    token = first["session_token"]
+
+    # The next page repeats a listing the first page already sent
+    page = {"listings": [listing(2, "Zoopla"), listing(3)]}
+    second = track_combined_page(page, {"session_token": token, "cursor": "next"}, params)
+    assert second["session_token"] == token
+    assert [l["url"] for l in second["listings"]] == ["https://rightmove/3"]
+    assert second["total_found"] == 1
+
+    # A first page without a token starts over
+    fresh = track_combined_page({"listings": [listing(2)]}, {}, params)
+    assert fresh["session_token"] != token
+    assert len(fresh["listings"]) == 1
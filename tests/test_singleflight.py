@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import pytest
+from utils.singleflight import SingleFlight, search_key
+
+def test_search_key_is_canonical():
+    """Equivalent parameters should map to the same key"""
+    assert search_key("zoopla", "London ", "0", None, "2", "", "", "sale", 1, None) == \
+        search_key("Zoopla", "london", "", "", "2", None, None, "sale", "1", "newest")
+    assert search_key("zoopla", "london", "", "", "2", "", "", "sale", 1) != \
+        search_key("zoopla", "london", "", "", "2", "", "", "sale", 2)
+
+def test_concurrent_calls_share_one_fetch():
+    """Identical calls from different event loops should run the function once"""
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    async def fetch():
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.2)
+        return {"listings": [{"title": "Flat"}]}
+
+    results = []
+
+    def worker():
+        results.append(asyncio.run(flight.do("key", fetch)))
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert len(calls) == 1
+    assert flight.coalesced_count == 3
+    assert all(result == {"listings": [{"title": "Flat"}]} for result in results)
+    # Each caller gets its own copy to decorate
+    assert len({id(result) for result in results}) == 4
+
+def test_errors_are_shared_and_key_is_released():
+    flight = SingleFlight()
+
+    async def failing():
+        raise ValueError("upstream down")
+
+    with pytest.raises(ValueError):
+        asyncio.run(flight.do("key", failing))
+    assert flight.in_flight() == 0
+
+def test_follower_takes_over_when_the_leader_is_cancelled():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"listings": [{"title": "Flat"}]}
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(flight.do("key", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        # e.g. the leader's request was torn down
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(main()) == [{"listings": [{"title": "Flat"}]}] * 2
+    # The followers still share one call between them
+    assert len(calls) == 2
+    assert flight.in_flight() == 0
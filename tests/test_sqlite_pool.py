@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import threading
+import pytest
+from utils.sqlite_pool import ConnectionPool, connection, database_path, get_pool
+
+@pytest.fixture
+def pool(tmp_path):
+    return ConnectionPool(str(tmp_path / "pool.db"))
+
+def test_connections_are_reused_and_tuned(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x)")
+        first = id(conn)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+    with pool.connection() as conn:
+        assert id(conn) == first
+    assert pool.opened == 1
+
+def test_commits_on_success_and_rolls_back_on_error(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x)")
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO t VALUES (2)")
+            raise ValueError
+    with sqlite3.connect(pool.db_path) as other:
+        assert other.execute("SELECT x FROM t").fetchall() == [(1,)]
+
+def test_row_factory_does_not_leak_to_the_next_borrower(pool):
+    with pool.connection() as conn:
+        conn.row_factory = sqlite3.Row
+    with pool.connection() as conn:
+        assert conn.row_factory is None
+
+def test_replaced_file_gets_fresh_connections(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE old (x)")
+    pool.close()
+    os.remove(pool.db_path)
+    with pool.connection() as conn:
+        assert conn.execute("SELECT name FROM sqlite_master").fetchall() == []
+    assert pool.opened == 2
+
+def test_threads_share_one_pool_per_file(tmp_path):
+    path = str(tmp_path / "shared.db")
+    assert get_pool(path) is get_pool(os.path.join(str(tmp_path), ".", "shared.db"))
+    with connection(path) as conn:
+        conn.execute("CREATE TABLE t (x)")
+
+    def writer(n):
+        for i in range(50):
+            with connection(path) as conn:
+                conn.execute("INSERT INTO t VALUES (?)", (n * 100 + i,))
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with connection(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 200
+    assert get_pool(path).opened <= 4
+
+def test_stores_create_their_tables_on_first_use(tmp_path, monkeypatch):
+    from utils.database import Database
+    from utils.property_registry import PropertyRegistry
+    from utils.raw_store import RawPageStore
+
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "app.db"))
+    assert database_path() == str(tmp_path / "app.db")
+    db, store, registry = Database(), RawPageStore(), PropertyRegistry()
+    assert db.db_path == store.db_path == registry.db_path == database_path()
+    assert not os.path.exists(database_path())
+
+    assert store.get("https://www.zoopla.co.uk/a") is None
+    with connection(database_path()) as conn:
+        tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"raw_pages", "raw_blobs"} <= tables
+    assert "listings" not in tables and "property_sources" not in tables
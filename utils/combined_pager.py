@@ -0,0 +1,229 @@
+"""
+Sort-aware pagination of combined results
+
+Each source is a stream of listings its site has already sorted by the
+requested sort_by. A combined page is a k-way merge of those streams on the
+same key: the pager buffers the current upstream page of each source, always
+takes the smallest head, and fetches a source's next page only when its
+buffer runs dry, so a page costs the fewest upstream fetches. Where the next
+page starts is an opaque cursor holding each source's page and offset, and
+the key of the last listing taken from it, so nothing is kept server side
+(re-reading a partly used page hits the per-source cache, not the site).
+
+A source that misses the deadline can't have its next listing sort before the
+last one taken from it, so the page only takes listings from the others that
+sort before that bound. Before anything has been taken from the stalled source
+no bound is known under price_* and beds_*, and the page comes back empty
+(marked partial) rather than out of order.
+
+price_* compares the monthly price (weekly rents converted) and beds_* the
+bedroom count, missing values last. The other orders (newest, reduced, ...)
+have no value comparable across sites, so the streams are interleaved by
+position.
+"""
+import asyncio
+import base64
+import heapq
+import json
+import math
+import os
+from collections import deque
+from utils.dedup import DedupIndex, monthly_price
+
+CURSOR_VERSION = 1
+
+# sort_by -> (value compared across sources, descending)
+SORT_VALUES = {
+    "price_asc": (monthly_price, False),
+    "price_desc": (monthly_price, True),
+    "beds_asc": (lambda listing: listing.get('bedrooms'), False),
+    "beds_desc": (lambda listing: listing.get('bedrooms'), True)
+}
+
+
+def sort_key(sort_by):
+    """Merge key of a listing under sort_by. Ties, and orders with no
+    comparable value, fall back to stream position."""
+    value, descending = SORT_VALUES.get(sort_by, (None, False))
+    if value is None:
+        return lambda listing: ()
+
+    def key(listing):
+        found = value(listing)
+        if found is None:
+            return (1, 0)
+        return (0, -found if descending else found)
+    return key
+
+
+def lowest_key(sort_by):
+    """A key sorting before every listing's key under sort_by"""
+    return (0, -math.inf) if sort_by in SORT_VALUES else ()
+
+
+def encode_cursor(sort_by, positions):
+    """Cursor for {source: {"page": n, "offset": n[, "last": key]} or {"done": True}}"""
+    data = json.dumps({"v": CURSOR_VERSION, "sort": sort_by, "sources": positions}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(sort_by, positions) from a cursor. Raises ValueError if it isn't one"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if data["v"] != CURSOR_VERSION:
+            raise ValueError
+        positions = {}
+        for source, position in data["sources"].items():
+            if position.get("done"):
+                positions[source] = {"done": True}
+                continue
+            page, offset = int(position["page"]), int(position["offset"])
+            if page < 1 or offset < 0:
+                raise ValueError
+            positions[source] = {"page": page, "offset": offset}
+            if "last" in position:
+                last = tuple(position["last"])
+                if not all(isinstance(part, (int, float)) and not isinstance(part, bool) for part in last):
+                    raise ValueError
+                positions[source]["last"] = last
+        return data["sort"], positions
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("Invalid cursor")
+
+
+class SourceStream:
+    """One source's position in its sorted stream, and the rest of its current page"""
+    __slots__ = ("name", "index", "page", "offset", "last", "done", "pages", "buffer")
+
+    def __init__(self, name, index, page=1, offset=0, last=None, done=False):
+        self.name = name
+        self.index = index
+        self.page = page
+        self.offset = offset
+        # Merge key of the last listing taken, a lower bound for the next one
+        self.last = last
+        self.done = done
+        self.pages = None
+        self.buffer = deque()
+
+    def load(self, results):
+        """Buffer a fetched page from the current offset. A page with nothing
+        left ends the stream, as does a source that returned nothing."""
+        listings = (results or {}).get('listings') or []
+        self.pages = (results or {}).get('total_pages')
+        self.buffer = deque(listings[self.offset:])
+        if not self.buffer:
+            self.next_page()
+            if not self.done and not listings:
+                self.done = True
+
+    def take(self, key):
+        listing = self.buffer.popleft()
+        self.offset += 1
+        self.last = key(listing)
+        return listing
+
+    def next_page(self):
+        """Move past the current page; the stream ends after the last one"""
+        self.page += 1
+        self.offset = 0
+        if self.pages is not None and self.page > self.pages:
+            self.done = True
+
+    def position(self):
+        if self.done:
+            return {"done": True}
+        position = {"page": self.page, "offset": self.offset}
+        if self.last:
+            position["last"] = self.last
+        return position
+
+
+class CombinedPager:
+    """Merge sorted per-source streams into combined pages.
+
+    fetch(source, page) returns an awaitable of that source's results dict
+    ({"listings": [...], "total_pages": n}) or None when it has nothing.
+    """
+
+    def __init__(self, fetch, sources, page_size=None, dedup_factory=DedupIndex):
+        self.fetch = fetch
+        self.sources = tuple(sources)
+        self.page_size = int(page_size if page_size is not None else os.getenv('COMBINED_PAGE_SIZE', '48'))
+        self.dedup_factory = dedup_factory
+
+    async def _load(self, streams, deadline):
+        """Fetch each stream's current page concurrently. Returns the streams
+        that missed the deadline; they keep their position for the next cursor."""
+        if not streams:
+            return []
+        pending = {stream: asyncio.ensure_future(self.fetch(stream.name, stream.page)) for stream in streams}
+        # Late fetches are deliberately not cancelled; they finish and cache their page
+        await asyncio.wait(pending.values(), timeout=deadline.remaining() if deadline else None)
+        stalled, used_up = [], []
+        for stream, future in pending.items():
+            if not future.done():
+                stalled.append(stream)
+                continue
+            stream.load(None if future.exception() else future.result())
+            # The page shrank below the cursor's offset since it was read
+            if not stream.buffer and not stream.done:
+                used_up.append(stream)
+        return stalled + await self._load(used_up, deadline)
+
+    @staticmethod
+    def _push(heap, stream, key):
+        heapq.heappush(heap, (key(stream.buffer[0]), stream.page, stream.offset, stream.index, stream))
+
+    @staticmethod
+    def _bound(stalled, sort_by):
+        """Heap entries below this sort before every stalled source's next listing"""
+        if not stalled:
+            return None
+        return min((stream.last if stream.last is not None else lowest_key(sort_by), stream.page, stream.offset, stream.index)
+                   for stream in stalled)
+
+    async def page(self, sort_by, cursor=None, deadline=None):
+        """The next merged page: (listings, duplicates dropped, next cursor or None,
+        names of sources that missed the deadline). A cursor for another sort
+        order starts from the beginning."""
+        positions = {}
+        if cursor:
+            cursor_sort, positions = decode_cursor(cursor)
+            if cursor_sort != sort_by:
+                positions = {}
+        streams = [SourceStream(name, index, **positions.get(name, {})) for index, name in enumerate(self.sources)]
+        stalled = await self._load([stream for stream in streams if not stream.done], deadline)
+
+        key = sort_key(sort_by)
+        heap = []
+        for stream in streams:
+            if stream.buffer:
+                self._push(heap, stream, key)
+
+        seen = self.dedup_factory()
+        listings, duplicates = [], []
+        # Listings past a stalled source's next one would overtake it
+        bound = self._bound(stalled, sort_by)
+        while heap and len(listings) < self.page_size:
+            if bound is not None and heap[0][:4] >= bound:
+                break
+            stream = heapq.heappop(heap)[-1]
+            listings += seen.add_all([stream.take(key)], duplicates)
+            if not stream.buffer:
+                stream.next_page()
+                if stream.done:
+                    continue
+                # The deadline has passed; don't fetch further pages
+                if stalled:
+                    break
+                stalled = await self._load([stream], deadline)
+                bound = self._bound(stalled, sort_by)
+            if stream.buffer:
+                self._push(heap, stream, key)
+
+        next_cursor = None
+        if not all(stream.done for stream in streams):
+            next_cursor = encode_cursor(sort_by, {stream.name: stream.position() for stream in streams})
+        return listings, duplicates, next_cursor, [stream.name for stream in stalled]
@@ -1,39 +1,42 @@
-import sqlite3
-import json
 from datetime import datetime, timedelta
 from utils.logger import logger
+from utils.result_codec import result_codec
+from utils.singleflight import search_key
+from utils.sqlite_pool import SQLiteStore, connection
 
-class Database:
-    def __init__(self):
-        """Initialize database connection"""
-        self.db_path = 'listings.db'  # Changed from 'utils/listings.db'
-        self.init_db()
+# Columns of a cached page, in table order
+LISTINGS_COLUMNS = ['id', 'site', 'location', 'min_price', 'max_price', 'min_beds', 'max_beds', 'keywords',
+                    'listing_type', 'sort_by', 'page_number', 'results', 'parser_version', 'created_at']
 
+LISTINGS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cache_key TEXT NOT NULL,
+        site TEXT,
+        location TEXT,
+        min_price TEXT,
+        max_price TEXT,
+        min_beds TEXT,
+        max_beds TEXT,
+        keywords TEXT,
+        listing_type TEXT,
+        sort_by TEXT,
+        page_number INTEGER,
+        results BLOB,
+        parser_version TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+class Database(SQLiteStore):
     def init_db(self):
         """Initialize the database and create tables if they don't exist"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # Create listings table if it doesn't exist
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS listings (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        site TEXT,
-                        location TEXT,
-                        min_price TEXT,
-                        max_price TEXT,
-                        min_beds TEXT,
-                        max_beds TEXT,
-                        keywords TEXT,
-                        listing_type TEXT,
-                        sort_by TEXT,
-                        page_number INTEGER,
-                        results TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, sort_by, page_number)
-                    )
-                ''')
+                cursor.execute(LISTINGS_TABLE.format(name='listings'))
                 
                 # Check if page_number column exists
                 cursor.execute("PRAGMA table_info(listings)")
@@ -51,11 +54,15 @@ class Database:
                     # Update existing rows to have sort_by = 'newest'
                     cursor.execute("UPDATE listings SET sort_by = 'newest' WHERE sort_by IS NULL")
                 
-                # Create index for faster lookups
-                cursor.execute('''
-                    CREATE INDEX IF NOT EXISTS idx_listings_search 
-                    ON listings(site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, sort_by, page_number)
-                ''')
+                if 'parser_version' not in columns:
+                    # Rows cached before this column existed have an unknown parser version
+                    cursor.execute('ALTER TABLE listings ADD COLUMN parser_version TEXT')
+                
+                if 'cache_key' not in columns:
+                    self._migrate_cache_keys(cursor)
+                
+                # Lookups and upserts go through the one canonical key
+                cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_listings_cache_key ON listings(cache_key)')
                 
                 conn.commit()
                 logger.info("Database initialized successfully")
@@ -64,70 +71,59 @@ class Database:
             logger.error("Error initializing database: %s", str(e))
             raise
 
+    @staticmethod
+    def _migrate_cache_keys(cursor):
+        """Rebuild the listings table keyed by cache_key.
+
+        Older tables matched rows on ten nullable columns under a UNIQUE
+        constraint that NULLs slip past (and that left out sort_by, so caching
+        one order replaced another). Each row gets the key its search would
+        look up now; where several rows share a key the newest is kept.
+        """
+        cursor.execute('DROP TABLE IF EXISTS listings_migrating')
+        cursor.execute(LISTINGS_TABLE.format(name='listings_migrating'))
+        cursor.execute(f"SELECT {', '.join(LISTINGS_COLUMNS)} FROM listings ORDER BY created_at, id")
+        rows = {}
+        for row in cursor.fetchall():
+            values = dict(zip(LISTINGS_COLUMNS, row))
+            key = search_key(values['site'], values['location'], values['min_price'], values['max_price'],
+                             values['min_beds'], values['max_beds'], values['keywords'], values['listing_type'],
+                             values['page_number'], values['sort_by'])
+            rows[key] = (key,) + row
+
+        cursor.executemany(
+            f"INSERT INTO listings_migrating (cache_key, {', '.join(LISTINGS_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * (len(LISTINGS_COLUMNS) + 1))})",
+            sorted(rows.values(), key=lambda row: row[1])
+        )
+        cursor.execute('DROP TABLE listings')
+        cursor.execute('ALTER TABLE listings_migrating RENAME TO listings')
+        logger.info("Migrated %d cached pages to canonical cache keys", len(rows))
+
     def get_cached_results(self, site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page_number, sort_by='newest'):
         """Get cached results if they exist and are not too old"""
         try:
-            # Convert empty strings to NULL for SQL
-            def clean_param(param):
-                if param == "" or param == "0" or param is None:
-                    return None
-                return param
-
-            params = [
-                clean_param(site),
-                clean_param(location),
-                clean_param(min_price),
-                clean_param(max_price),
-                clean_param(min_beds),
-                clean_param(max_beds),
-                clean_param(keywords),
-                clean_param(listing_type),
-                clean_param(sort_by) or 'newest',
-                page_number
-            ]
-            
-            # Log the parameters being used
-            logger.info("Checking cache with parameters: %s", params)
+            # One indexed equality on the canonical key; parameters that differ only
+            # in case, padding or ""/"0"/None spelling share a key
+            cache_key = search_key(site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page_number, sort_by)
+            logger.info("Checking cache for %s page %s (key %s)", site, page_number, cache_key)
             
-            # Use parameterized query with proper NULL handling
             query = """
                 SELECT results, created_at
                 FROM listings
-                WHERE site = ?
-                AND (location = ? OR (location IS NULL AND ? IS NULL))
-                AND (min_price = ? OR (min_price IS NULL AND ? IS NULL))
-                AND (max_price = ? OR (max_price IS NULL AND ? IS NULL))
-                AND min_beds = ?
-                AND max_beds = ?
-                AND (keywords = ? OR (keywords IS NULL AND ? IS NULL))
-                AND (listing_type = ? OR (listing_type IS NULL AND ? IS NULL))
-                AND (sort_by = ? OR (sort_by IS NULL AND ? IS NULL))
-                AND page_number = ?
+                WHERE cache_key = ?
                 AND created_at > datetime('now', '-24 hours')
             """
             
-            # Double the parameters for NULL comparison (except site, min_beds, max_beds, and page_number)
-            query_params = [params[0]]  # Add site parameter first
-            for i, param in enumerate(params[1:-1]):  # Exclude site and page_number
-                if i in [3, 4]:  # min_beds and max_beds
-                    query_params.append(param)  # Add once
-                else:
-                    query_params.extend([param, param])  # Add twice for NULL comparison
-            query_params.append(params[-1])  # Add page_number last
-            
-            # Log the query and parameters
-            logger.info("Executing query: %s", query)
-            logger.info("With parameters: %s", query_params)
-            
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute(query, query_params)
+                cursor.execute(query, (cache_key,))
                 result = cursor.fetchone()
                 
                 if result:
                     results, created_at = result
                     logger.info("Found cached results from %s", created_at)
-                    return json.loads(results)
+                    return result_codec.decode(results)
                 else:
                     logger.info("No valid cached results found")
                     return None
@@ -136,8 +132,8 @@ class Database:
             logger.error("Error getting cached results: %s", str(e))
             return None
 
-    def cache_results(self, site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page_number, results, sort_by='newest'):
-        """Cache search results"""
+    def cache_results(self, site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page_number, results, sort_by='newest', parser_version=None):
+        """Cache search results, recording the parser version that produced them"""
         try:
             # Convert empty strings to NULL for SQL
             def clean_param(param):
@@ -146,6 +142,7 @@ class Database:
                 return param
 
             params = [
+                search_key(site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page_number, sort_by),
                 clean_param(site),
                 clean_param(location),
                 clean_param(min_price),
@@ -156,20 +153,25 @@ class Database:
                 clean_param(listing_type),
                 clean_param(sort_by) or 'newest',
                 page_number,
-                json.dumps(results)
+                result_codec.encode(results),
+                parser_version
             ]
             
             # Log the parameters being cached
-            logger.info("Attempting to cache results with parameters: %s", params[:-1])  # Exclude results from log
+            logger.info("Attempting to cache results with parameters: %s", params[1:-2])  # Exclude results from log
             
-            # Use INSERT OR REPLACE to handle duplicates
+            # Upsert on the canonical key, refreshing the page and its timestamp
             query = """
-                INSERT OR REPLACE INTO listings 
-                (site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, sort_by, page_number, results, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                INSERT INTO listings 
+                (cache_key, site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, sort_by, page_number, results, parser_version, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    results = excluded.results,
+                    parser_version = excluded.parser_version,
+                    created_at = excluded.created_at
             """
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute(query, params)
                 conn.commit()
@@ -183,7 +185,7 @@ class Database:
     def cleanup_old_results(self, max_age_hours=24):
         """Remove results older than max_age_hours"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
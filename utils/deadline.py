@@ -0,0 +1,29 @@
+"""
+Request deadlines
+
+A Deadline is created when a search request arrives and passed down to every
+scraper call, so slow upstream fetches are cut off in time to answer the user.
+"""
+import os
+import time
+
+
+class Deadline:
+    """An absolute point in time by which a request must be answered"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def for_search(cls):
+        """Deadline for a search request (SEARCH_DEADLINE_SECONDS, default 25s)"""
+        return cls(float(os.getenv('SEARCH_DEADLINE_SECONDS', '25')))
+
+    def remaining(self):
+        """Seconds left before the deadline (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
@@ -0,0 +1,246 @@
+"""
+Duplicate detection for merged listings
+
+DedupIndex finds exact duplicates: two listings are the same property if their
+addresses match once reduced to lowercase letters and digits, or if their URLs
+match case-insensitively. It normalizes each accepted listing once and keeps
+both keys in hash maps, so checking a listing costs the same however many have
+been accepted.
+
+FuzzyDedupIndex catches the same property listed on two sites with
+differently written addresses ("Flat 3, 12 High St, London SW1" vs "High
+Street, London SW1A"). Listings are blocked by postcode district, bedrooms and
+a price bucket, and only compared with listings from other sources in the
+neighbouring blocks, so matching stays close to linear. Within a block two
+listings match when most of the street/area words of the shorter address
+appear in the other, their house numbers don't contradict each other and
+their prices are within FUZZY_DEDUP_PRICE_TOLERANCE.
+
+Words are compared by character trigram shingles rather than whole-address
+shingles or MinHash. A word counts as present when the other address has it
+or a spelling of it whose shingles mostly overlap ("Kings"/"King's",
+"Marylebone"/"Marlebone"). Shingling the whole address would let different
+streets with similar names ("Hill Street"/"Mill Street") share most of their
+trigrams. MinHash only estimates shingle overlap, to save comparing large
+sets; blocks hold a handful of listings with a few short words each, so the
+exact sets are cheaper than computing signatures.
+"""
+import math
+import os
+import re
+from functools import lru_cache
+from itertools import product
+
+NON_ALNUM_RE = re.compile(r"[\W_]+")
+WORD_RE = re.compile(r"[a-z0-9]+")
+POSTCODE_PART_RE = re.compile(r"^(?:[a-z]{1,2}\d[a-z\d]?|\d[a-z]{2})$")
+DISTRICT_RE = re.compile(r"^([A-Z]{1,2}\d+)")
+
+# Characters per word shingle, and the shingle overlap (Jaccard) at which two
+# words with the same first letter are spellings of one word ("Kings"/"King",
+# "Marylebone"/"Marlebone") rather than different names ("Hill"/"Mill")
+SHINGLE_SIZE = 3
+WORD_SIMILARITY = 0.5
+
+# Spellings the sites use interchangeably
+ADDRESS_ABBREVIATIONS = {
+    "st": "street", "rd": "road", "ave": "avenue", "av": "avenue", "ln": "lane", "dr": "drive",
+    "ct": "court", "pl": "place", "sq": "square", "cres": "crescent", "gdns": "gardens",
+    "tce": "terrace", "terr": "terrace", "cl": "close", "gr": "grove", "pk": "park", "hse": "house"
+}
+ADDRESS_STOP_WORDS = frozenset(("flat", "apartment", "apt", "unit", "the", "at", "of", "and"))
+
+# Property types that can describe the same home on different sites
+PROPERTY_TYPE_GROUPS = {
+    "flat": "flat", "studio": "flat", "maisonette": "flat",
+    "detached": "house", "semi-detached": "house", "terraced": "house", "house": "house", "bungalow": "house",
+    "land": "land"
+}
+
+
+def normalize_address(address):
+    """Address reduced to lowercase letters and digits, for comparison"""
+    if not address:
+        return ""
+    return NON_ALNUM_RE.sub("", address).lower()
+
+
+class DedupIndex:
+    """Addresses and URLs of the listings accepted so far"""
+
+    def __init__(self):
+        self.addresses = {}
+        self.urls = {}
+
+    @staticmethod
+    def keys(listing):
+        return normalize_address(listing.get('address')), (listing.get('url') or '').lower()
+
+    def _match(self, address, url):
+        match = self.addresses.get(address) if address else None
+        if match is None and url:
+            match = self.urls.get(url)
+        return match
+
+    def find_match(self, listing):
+        """The accepted listing this one duplicates, or None"""
+        return self._match(*self.keys(listing))
+
+    def is_duplicate(self, listing):
+        return self.find_match(listing) is not None
+
+    def _add(self, listing):
+        """Accept a listing unless it duplicates one already accepted. Returns the match, or None if accepted"""
+        address, url = self.keys(listing)
+        match = self._match(address, url)
+        if match is not None:
+            return match
+        if address:
+            self.addresses[address] = listing
+        if url:
+            self.urls[url] = listing
+        return None
+
+    def add(self, listing):
+        """Accept a listing unless it duplicates one already accepted. Returns whether it was new"""
+        return self._add(listing) is None
+
+    def add_all(self, listings, duplicates=None):
+        """The listings not already accepted, in order (later repeats within the batch are dropped too).
+        Dropped listings are appended to duplicates, if given, as (listing, accepted match) pairs."""
+        new = []
+        for listing in listings:
+            match = self._add(listing)
+            if match is None:
+                new.append(listing)
+            elif duplicates is not None:
+                duplicates.append((listing, match))
+        return new
+
+
+class ListingFeatures:
+    """What fuzzy matching compares, computed once per listing"""
+    __slots__ = ("source", "district", "bedrooms", "price", "property_group", "words", "numbers")
+
+    def __init__(self, listing):
+        self.source = listing.get('source') or ""
+        outcode = DISTRICT_RE.match((listing.get('outcode') or "").upper())
+        self.district = outcode.group(1) if outcode else None
+        self.bedrooms = listing.get('bedrooms')
+        self.price = monthly_price(listing)
+        self.property_group = PROPERTY_TYPE_GROUPS.get(listing.get('property_type') or "")
+        words, numbers = set(), set()
+        for word in WORD_RE.findall((listing.get('address') or "").lower().replace("'", "")):
+            if word[0].isdigit() and not POSTCODE_PART_RE.match(word):
+                numbers.add(word)
+            elif word not in ADDRESS_STOP_WORDS and not POSTCODE_PART_RE.match(word):
+                words.add(ADDRESS_ABBREVIATIONS.get(word, word))
+        self.words = frozenset(words)
+        self.numbers = frozenset(numbers)
+
+    def has_word_like(self, word):
+        """Whether this address has the word, or a spelling variant of it"""
+        if word in self.words:
+            return True
+        return any(other[0] == word[0] and jaccard(shingles(word), shingles(other)) >= WORD_SIMILARITY
+                   for other in self.words)
+
+
+@lru_cache(maxsize=65536)
+def shingles(word):
+    """Character trigrams of a word, padded so its start and end count"""
+    padded = f" {word} "
+    return frozenset(padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1))
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def monthly_price(listing):
+    """Price in pounds per month for rents, or the asking price for sales"""
+    price = listing.get('price_value')
+    if not price:
+        return None
+    return price * 52 / 12 if listing.get('price_period') == "pw" else price
+
+
+class FuzzyDedupIndex(DedupIndex):
+    """Exact URL dedup plus fuzzy matching of the same property across sources.
+    Equal addresses alone don't make a duplicate here: "Deansgate, Manchester"
+    is a street, not a home, so the fuzzy rules decide."""
+
+    def __init__(self, threshold=None, price_tolerance=None):
+        super().__init__()
+        self.threshold = float(threshold if threshold is not None else os.getenv('FUZZY_DEDUP_THRESHOLD', '0.8'))
+        self.price_tolerance = float(price_tolerance if price_tolerance is not None
+                                     else os.getenv('FUZZY_DEDUP_PRICE_TOLERANCE', '0.05'))
+        # Neighbouring buckets overlap the tolerance, so near-equal prices always meet
+        self._bucket_base = math.log1p(self.price_tolerance)
+        self.blocks = {}
+        self.districts = set()
+        self.bedroom_counts = set()
+
+    def _bucket(self, price):
+        return int(math.log(price) / self._bucket_base) if price else None
+
+    def _block_keys(self, features):
+        """Blocks a listing could have a duplicate in. An unknown district or
+        bedroom count matches any; an unknown price only other unknown prices."""
+        districts = (features.district, None) if features.district else tuple(self.districts) + (None,)
+        bedrooms = (features.bedrooms, None) if features.bedrooms is not None else tuple(self.bedroom_counts) + (None,)
+        bucket = self._bucket(features.price)
+        buckets = (bucket - 1, bucket, bucket + 1) if bucket is not None else (None,)
+        return product(districts, bedrooms, buckets)
+
+    def matches(self, a, b):
+        """Whether two listings' features describe the same property"""
+        if a.source == b.source or not a.words or not b.words:
+            return False
+        if a.property_group and b.property_group and a.property_group != b.property_group:
+            return False
+        if a.price and b.price and abs(a.price - b.price) > self.price_tolerance * max(a.price, b.price):
+            return False
+        # "12 High St" and "Flat 3, 12 High St" agree; "Flat 3, 12" and "Flat 5, 12" don't
+        if a.numbers and b.numbers and not (a.numbers <= b.numbers or b.numbers <= a.numbers):
+            return False
+        # Most words of the shorter address must appear in the other, exactly or
+        # as a spelling variant: one site often drops parts the other keeps
+        # ("High Street, London SW1A" vs "Flat 3, 12 High St, London SW1")
+        if len(a.words) > len(b.words):
+            a, b = b, a
+        shared = sum(1 for word in a.words if b.has_word_like(word))
+        return shared >= 2 and shared >= self.threshold * len(a.words)
+
+    def find_match(self, listing, features=None):
+        """An accepted listing from another source that is the same property, or None"""
+        features = features or ListingFeatures(listing)
+        blocks = self.blocks
+        for key in self._block_keys(features):
+            for other, other_features in blocks.get(key, ()):
+                if self.matches(features, other_features):
+                    return other
+        return None
+
+    def is_duplicate(self, listing):
+        url = (listing.get('url') or '').lower()
+        return bool(url and url in self.urls) or self.find_match(listing) is not None
+
+    def _add(self, listing):
+        url = (listing.get('url') or '').lower()
+        match = self.urls.get(url) if url else None
+        if match is not None:
+            return match
+        features = ListingFeatures(listing)
+        match = self.find_match(listing, features)
+        if match is not None:
+            return match
+        if url:
+            self.urls[url] = listing
+        key = (features.district, features.bedrooms, self._bucket(features.price))
+        self.blocks.setdefault(key, []).append((listing, features))
+        if features.district:
+            self.districts.add(features.district)
+        if features.bedrooms is not None:
+            self.bedroom_counts.add(features.bedrooms)
+        return None
@@ -3,6 +3,7 @@ Lead capture utilities for tracking user interest in properties
 """
 import sqlite3
 from datetime import datetime
+from utils.sqlite_pool import connection, database_path
 
 # Import logger setup
 import logging
@@ -10,127 +11,125 @@ logger = logging.getLogger('PACAS')
 
 def init_leads_table():
     """Initialize the leads table and users/favorites tables in the database"""
-    conn = sqlite3.connect('listings.db')
-    cursor = conn.cursor()
+    with connection(database_path()) as conn:
+        cursor = conn.cursor()
     
-    # Create users table for authentication
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            name TEXT,
-            phone TEXT,
-            email_verified INTEGER DEFAULT 0,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            last_login DATETIME
-        )
-    """)
+        # Create users table for authentication
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                name TEXT,
+                phone TEXT,
+                email_verified INTEGER DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                last_login DATETIME
+            )
+        """)
     
-    # Create favorites table for saved properties
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS favorites (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            property_url TEXT NOT NULL,
-            property_title TEXT,
-            property_price TEXT,
-            property_image TEXT,
-            site TEXT,
-            bedrooms TEXT,
-            location TEXT,
-            added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(user_id, property_url),
-            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-        )
-    """)
+        # Create favorites table for saved properties
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS favorites (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                property_url TEXT NOT NULL,
+                property_title TEXT,
+                property_price TEXT,
+                property_image TEXT,
+                site TEXT,
+                bedrooms TEXT,
+                location TEXT,
+                added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(user_id, property_url),
+                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+            )
+        """)
     
-    # Create indexes for favorites
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_favorites_user ON favorites(user_id)
-    """)
+        # Create indexes for favorites
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_favorites_user ON favorites(user_id)
+        """)
     
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_favorites_added ON favorites(added_at)
-    """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_favorites_added ON favorites(added_at)
+        """)
     
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS leads (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT NOT NULL,
-            property_url TEXT NOT NULL,
-            property_title TEXT,
-            property_price TEXT,
-            site TEXT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            ip_address TEXT,
-            phone TEXT,
-            name TEXT,
-            wants_callback INTEGER DEFAULT 0,
-            lead_type TEXT DEFAULT 'property_view'
-        )
-    """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS leads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT NOT NULL,
+                property_url TEXT NOT NULL,
+                property_title TEXT,
+                property_price TEXT,
+                site TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                ip_address TEXT,
+                phone TEXT,
+                name TEXT,
+                wants_callback INTEGER DEFAULT 0,
+                lead_type TEXT DEFAULT 'property_view'
+            )
+        """)
     
-    # Add new columns if they don't exist (for existing databases)
-    try:
-        cursor.execute("ALTER TABLE leads ADD COLUMN phone TEXT")
-        logger.info("Added phone column to leads table")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+        # Add new columns if they don't exist (for existing databases)
+        try:
+            cursor.execute("ALTER TABLE leads ADD COLUMN phone TEXT")
+            logger.info("Added phone column to leads table")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
     
-    try:
-        cursor.execute("ALTER TABLE leads ADD COLUMN name TEXT")
-        logger.info("Added name column to leads table")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+        try:
+            cursor.execute("ALTER TABLE leads ADD COLUMN name TEXT")
+            logger.info("Added name column to leads table")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
     
-    try:
-        cursor.execute("ALTER TABLE leads ADD COLUMN wants_callback INTEGER DEFAULT 0")
-        logger.info("Added wants_callback column to leads table")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+        try:
+            cursor.execute("ALTER TABLE leads ADD COLUMN wants_callback INTEGER DEFAULT 0")
+            logger.info("Added wants_callback column to leads table")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
     
-    try:
-        cursor.execute("ALTER TABLE leads ADD COLUMN lead_type TEXT DEFAULT 'property_view'")
-        logger.info("Added lead_type column to leads table")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
+        try:
+            cursor.execute("ALTER TABLE leads ADD COLUMN lead_type TEXT DEFAULT 'property_view'")
+            logger.info("Added lead_type column to leads table")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
     
-    # Create indexes for faster queries
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_leads_email ON leads(email)
-    """)
+        # Create indexes for faster queries
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_leads_email ON leads(email)
+        """)
     
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_leads_timestamp ON leads(timestamp)
-    """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_leads_timestamp ON leads(timestamp)
+        """)
     
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_leads_phone ON leads(phone)
-    """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_leads_phone ON leads(phone)
+        """)
     
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_leads_type ON leads(lead_type)
-    """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_leads_type ON leads(lead_type)
+        """)
     
-    conn.commit()
-    conn.close()
+        conn.commit()
     logger.info("Leads table, users table, and favorites table initialized successfully")
 
 def create_user(email, password_hash, name, phone, email_verified=True):
     """Create a new user account"""
     try:
-        conn = sqlite3.connect('listings.db')
-        cursor = conn.cursor()
+        with connection(database_path()) as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO users (email, password_hash, name, phone, email_verified)
-            VALUES (?, ?, ?, ?, ?)
-        """, (email.lower(), password_hash, name, phone, 1 if email_verified else 0))
+            cursor.execute("""
+                INSERT INTO users (email, password_hash, name, phone, email_verified)
+                VALUES (?, ?, ?, ?, ?)
+            """, (email.lower(), password_hash, name, phone, 1 if email_verified else 0))
         
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            user_id = cursor.lastrowid
+            conn.commit()
         
         logger.info(f"User created: {email}")
         return user_id
@@ -144,16 +143,15 @@ def create_user(email, password_hash, name, phone, email_verified=True):
 def get_user_by_email(email):
     """Get user by email"""
     try:
-        conn = sqlite3.connect('listings.db')
-        cursor = conn.cursor()
+        with connection(database_path()) as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT id, email, password_hash, name, phone, email_verified, created_at, last_login
-            FROM users WHERE email = ?
-        """, (email.lower(),))
+            cursor.execute("""
+                SELECT id, email, password_hash, name, phone, email_verified, created_at, last_login
+                FROM users WHERE email = ?
+            """, (email.lower(),))
         
-        user = cursor.fetchone()
-        conn.close()
+            user = cursor.fetchone()
         
         if user:
             return {
@@ -174,31 +172,29 @@ def get_user_by_email(email):
 def update_last_login(user_id):
     """Update user's last login time"""
     try:
-        conn = sqlite3.connect('listings.db')
-        cursor = conn.cursor()
+        with connection(database_path()) as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?
-        """, (user_id,))
+            cursor.execute("""
+                UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?
+            """, (user_id,))
         
-        conn.commit()
-        conn.close()
+            conn.commit()
     except Exception as e:
         logger.error(f"Error updating last login: {str(e)}")
 
 def add_favorite(user_id, property_url, property_title, property_price, property_image, site, bedrooms='', location=''):
     """Add property to user's favorites"""
     try:
-        conn = sqlite3.connect('listings.db')
-        cursor = conn.cursor()
+        with connection(database_path()) as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO favorites (user_id, property_url, property_title, property_price, property_image, site, bedrooms, location)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (user_id, property_url, property_title, property_price, property_image, site, bedrooms, location))
+            cursor.execute("""
+                INSERT INTO favorites (user_id, property_url, property_title, property_price, property_image, site, bedrooms, location)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (user_id, property_url, property_title, property_price, property_image, site, bedrooms, location))
         
-        conn.commit()
-        conn.close()
+            conn.commit()
         
         logger.info(f"Favorite added for user {user_id}")
         return True
@@ -212,15 +208,14 @@ def add_favorite(user_id, property_url, property_title, property_price, property
 def remove_favorite(user_id, property_url):
     """Remove property from user's favorites"""
     try:
-        conn = sqlite3.connect('listings.db')
-        cursor = conn.cursor()
+        with connection(database_path()) as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            DELETE FROM favorites WHERE user_id = ? AND property_url = ?
-        """, (user_id, property_url))
+            cursor.execute("""
+                DELETE FROM favorites WHERE user_id = ? AND property_url = ?
+            """, (user_id, property_url))
         
-        conn.commit()
-        conn.close()
+            conn.commit()
         
         logger.info(f"Favorite removed for user {user_id}")
         return True
@@ -231,17 +226,16 @@ def remove_favorite(user_id, property_url):
 def get_user_favorites(user_id):
     """Get all favorites for a user"""
     try:
-        conn = sqlite3.connect('listings.db')
-        cursor = conn.cursor()
+        with connection(database_path()) as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT id, property_url, property_title, property_price, property_image, site, bedrooms, location, added_at
-            FROM favorites WHERE user_id = ?
-            ORDER BY added_at DESC
-        """, (user_id,))
+            cursor.execute("""
+                SELECT id, property_url, property_title, property_price, property_image, site, bedrooms, location, added_at
+                FROM favorites WHERE user_id = ?
+                ORDER BY added_at DESC
+            """, (user_id,))
         
-        favorites = cursor.fetchall()
-        conn.close()
+            favorites = cursor.fetchall()
         
         return [{
             'id': f[0],
@@ -261,15 +255,14 @@ def get_user_favorites(user_id):
 def is_favorite(user_id, property_url):
     """Check if property is in user's favorites"""
     try:
-        conn = sqlite3.connect('listings.db')
-        cursor = conn.cursor()
+        with connection(database_path()) as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT COUNT(*) FROM favorites WHERE user_id = ? AND property_url = ?
-        """, (user_id, property_url))
+            cursor.execute("""
+                SELECT COUNT(*) FROM favorites WHERE user_id = ? AND property_url = ?
+            """, (user_id, property_url))
         
-        count = cursor.fetchone()[0]
-        conn.close()
+            count = cursor.fetchone()[0]
         
         return count > 0
     except Exception as e:
@@ -296,16 +289,15 @@ def capture_lead(email, property_url, property_title, property_price, site, ip_a
         bool: True if successful, False otherwise
     """
     try:
-        conn = sqlite3.connect('listings.db')
-        cursor = conn.cursor()
+        with connection(database_path()) as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO leads (email, property_url, property_title, property_price, site, ip_address, phone, name, wants_callback, lead_type, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (email, property_url, property_title, property_price, site, ip_address, phone, name, 1 if wants_callback else 0, lead_type, datetime.now()))
+            cursor.execute("""
+                INSERT INTO leads (email, property_url, property_title, property_price, site, ip_address, phone, name, wants_callback, lead_type, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (email, property_url, property_title, property_price, site, ip_address, phone, name, 1 if wants_callback else 0, lead_type, datetime.now()))
         
-        conn.commit()
-        conn.close()
+            conn.commit()
         
         lead_quality = "PREMIUM" if phone else "BASIC"
         logger.info(f"Captured {lead_quality} lead: {email} ({lead_type}) for {site} property")
@@ -325,41 +317,40 @@ def get_all_leads(limit=None):
         list: List of lead dictionaries
     """
     try:
-        conn = sqlite3.connect('listings.db')
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with connection(database_path()) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+        
+            query = """
+                SELECT id, email, property_url, property_title, property_price, 
+                       site, timestamp, ip_address, phone, name, wants_callback, lead_type
+                FROM leads
+                ORDER BY timestamp DESC
+            """
+        
+            if limit:
+                query += f" LIMIT {limit}"
+        
+            cursor.execute(query)
+            rows = cursor.fetchall()
+        
+            leads = []
+            for row in rows:
+                leads.append({
+                    'id': row['id'],
+                    'email': row['email'],
+                    'property_url': row['property_url'],
+                    'property_title': row['property_title'],
+                    'property_price': row['property_price'],
+                    'site': row['site'],
+                    'timestamp': row['timestamp'],
+                    'ip_address': row['ip_address'],
+                    'phone': row['phone'] if 'phone' in row.keys() else '',
+                    'name': row['name'] if 'name' in row.keys() else '',
+                    'wants_callback': row['wants_callback'] if 'wants_callback' in row.keys() else 0,
+                    'lead_type': row['lead_type'] if 'lead_type' in row.keys() else 'property_view'
+                })
         
-        query = """
-            SELECT id, email, property_url, property_title, property_price, 
-                   site, timestamp, ip_address, phone, name, wants_callback, lead_type
-            FROM leads
-            ORDER BY timestamp DESC
-        """
-        
-        if limit:
-            query += f" LIMIT {limit}"
-        
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        
-        leads = []
-        for row in rows:
-            leads.append({
-                'id': row['id'],
-                'email': row['email'],
-                'property_url': row['property_url'],
-                'property_title': row['property_title'],
-                'property_price': row['property_price'],
-                'site': row['site'],
-                'timestamp': row['timestamp'],
-                'ip_address': row['ip_address'],
-                'phone': row['phone'] if 'phone' in row.keys() else '',
-                'name': row['name'] if 'name' in row.keys() else '',
-                'wants_callback': row['wants_callback'] if 'wants_callback' in row.keys() else 0,
-                'lead_type': row['lead_type'] if 'lead_type' in row.keys() else 'property_view'
-            })
-        
-        conn.close()
         return leads
     except Exception as e:
         logger.error(f"Error retrieving leads: {e}")
@@ -373,47 +364,46 @@ def get_leads_stats():
         dict: Statistics about leads
     """
     try:
-        conn = sqlite3.connect('listings.db')
-        cursor = conn.cursor()
-        
-        # Total leads
-        cursor.execute("SELECT COUNT(*) FROM leads")
-        total_leads = cursor.fetchone()[0]
-        
-        # Unique emails
-        cursor.execute("SELECT COUNT(DISTINCT email) FROM leads")
-        unique_emails = cursor.fetchone()[0]
-        
-        # Leads by site
-        cursor.execute("""
-            SELECT site, COUNT(*) as count
-            FROM leads
-            GROUP BY site
-        """)
-        by_site = dict(cursor.fetchall())
-        
-        # Leads today
-        cursor.execute("""
-            SELECT COUNT(*) FROM leads
-            WHERE DATE(timestamp) = DATE('now')
-        """)
-        today = cursor.fetchone()[0]
-        
-        # Premium leads (with phone)
-        cursor.execute("""
-            SELECT COUNT(*) FROM leads
-            WHERE phone IS NOT NULL AND phone != ''
-        """)
-        premium_leads = cursor.fetchone()[0]
-        
-        # Account creation leads
-        cursor.execute("""
-            SELECT COUNT(*) FROM leads
-            WHERE lead_type = 'account_creation'
-        """)
-        account_leads = cursor.fetchone()[0]
+        with connection(database_path()) as conn:
+            cursor = conn.cursor()
+        
+            # Total leads
+            cursor.execute("SELECT COUNT(*) FROM leads")
+            total_leads = cursor.fetchone()[0]
+        
+            # Unique emails
+            cursor.execute("SELECT COUNT(DISTINCT email) FROM leads")
+            unique_emails = cursor.fetchone()[0]
+        
+            # Leads by site
+            cursor.execute("""
+                SELECT site, COUNT(*) as count
+                FROM leads
+                GROUP BY site
+            """)
+            by_site = dict(cursor.fetchall())
+        
+            # Leads today
+            cursor.execute("""
+                SELECT COUNT(*) FROM leads
+                WHERE DATE(timestamp) = DATE('now')
+            """)
+            today = cursor.fetchone()[0]
+        
+            # Premium leads (with phone)
+            cursor.execute("""
+                SELECT COUNT(*) FROM leads
+                WHERE phone IS NOT NULL AND phone != ''
+            """)
+            premium_leads = cursor.fetchone()[0]
+        
+            # Account creation leads
+            cursor.execute("""
+                SELECT COUNT(*) FROM leads
+                WHERE lead_type = 'account_creation'
+            """)
+            account_leads = cursor.fetchone()[0]
         
-        conn.close()
         
         return {
             'total_leads': total_leads,
@@ -0,0 +1,91 @@
+"""
+Listing record shared by the scrapers, ScraperBot and the cache
+
+A slotted dataclass instead of a dict per listing: no per-instance hash table
+of repeated keys, so a deep crawl holds a fraction of the memory. It keeps the
+dict-style access (listing["price"], listing.get("url")) the rest of the code
+uses, and orjson serializes it straight to JSON bytes without building a dict
+first. Without orjson, dumps() falls back to the json module.
+"""
+import json
+from dataclasses import dataclass, fields
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@dataclass(slots=True)
+class Listing:
+    """One property listing from any source"""
+    title: str = ""
+    price: str = ""
+    address: str = ""
+    desc: str = ""
+    specs: str = ""
+    image: str = ""
+    url: str = ""
+    source: str = ""
+    property_id: str = None
+    listing_id: str = None
+    id: int = None
+    price_value: int = None
+    price_period: str = ""
+    bedrooms: int = None
+    bathrooms: int = None
+    outcode: str = ""
+    property_type: str = ""
+    latitude: float = None
+    longitude: float = None
+
+    def __getitem__(self, key):
+        if key not in FIELD_NAMES:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in FIELD_NAMES:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in FIELD_NAMES
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in FIELD_NAMES else default
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in LISTING_FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a Listing from a cached dict, ignoring keys it doesn't know"""
+        data = dict(data)
+        if "description" in data and not data.get("desc"):
+            data["desc"] = data["description"]
+        return cls(**{key: value for key, value in data.items() if key in FIELD_NAMES})
+
+
+LISTING_FIELDS = tuple(field.name for field in fields(Listing))
+FIELD_NAMES = frozenset(LISTING_FIELDS)
+
+
+def _default(obj):
+    if isinstance(obj, Listing):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Serialize results (listings included) to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, ensure_ascii=False).encode('utf-8')
+
+
+def loads(data):
+    """Parse JSON text or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
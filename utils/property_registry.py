@@ -0,0 +1,144 @@
+"""
+Stable property identity
+
+Maps each site's own identifier for a listing (Rightmove property ID, Zoopla
+listing ID, or the ID in the listing URL when the parser didn't find one) to
+an internal property ID that survives price and wording changes. Listings the
+combined dedup matched across sites are linked to the same ID.
+
+IDs are assigned a page at a time: one primary-key lookup per source for the
+page's keys and one batch insert for the keys not seen before. An ID, once
+given, never changes.
+"""
+import os
+import re
+from utils.logger import logger
+from utils.sqlite_pool import SQLiteStore, connection
+
+# Numeric ID in a listing URL, e.g. /for-sale/details/6500000/ or /properties/140000000#/
+URL_ID_RE = re.compile(r"/(\d{4,})(?=[/.#?]|$)")
+
+# Keys per lookup query, under SQLite's limit on bound parameters
+LOOKUP_BATCH_SIZE = 500
+
+
+def source_key(listing):
+    """(source, key) identifying a listing on its own site, or None"""
+    source = (listing.get('source') or '').lower()
+    key = listing.get('property_id') or listing.get('listing_id')
+    if not key:
+        url = listing.get('url') or ''
+        match = URL_ID_RE.search(url)
+        key = match.group(1) if match else url.split('#')[0].split('?')[0].rstrip('/').lower()
+    return (source, str(key)) if source and key else None
+
+
+class PropertyRegistry(SQLiteStore):
+    """Persistent map of (source, source key) to a stable property ID"""
+
+    def __init__(self, db_path=None):
+        super().__init__(db_path)
+        self.enabled = os.getenv('PROPERTY_REGISTRY', 'true').lower() == 'true'
+
+    def init_db(self):
+        """Create the identity table if it doesn't exist"""
+        with connection(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS property_sources (
+                    source TEXT NOT NULL,
+                    source_key TEXT NOT NULL,
+                    property_id INTEGER NOT NULL,
+                    first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (source, source_key)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_property_sources_property ON property_sources(property_id)')
+            conn.commit()
+
+    @staticmethod
+    def _lookup(cursor, keys):
+        """{(source, key): property_id} for the keys already registered"""
+        by_source = {}
+        for source, key in keys:
+            by_source.setdefault(source, []).append(key)
+        found = {}
+        for source, source_keys in by_source.items():
+            for start in range(0, len(source_keys), LOOKUP_BATCH_SIZE):
+                batch = source_keys[start:start + LOOKUP_BATCH_SIZE]
+                cursor.execute(
+                    f"SELECT source_key, property_id FROM property_sources "
+                    f"WHERE source = ? AND source_key IN ({','.join('?' * len(batch))})",
+                    [source] + batch
+                )
+                found.update(((source, key), property_id) for key, property_id in cursor.fetchall())
+        return found
+
+    def assign(self, listings, duplicates=()):
+        """Set each listing's 'id' to its stable property ID, registering new ones.
+
+        duplicates holds the (dropped listing, accepted match) pairs from the
+        combined dedup; the dropped listing's key is linked to its match's ID so
+        either site's copy resolves to the same property later. Returns the
+        number of keys registered.
+        """
+        if not self.enabled:
+            return 0
+        keyed = [(listing, source_key(listing)) for listing in listings]
+        links = [(source_key(dropped), source_key(match)) for dropped, match in duplicates]
+        keys = list(dict.fromkeys(
+            [key for _, key in keyed if key] + [key for pair in links for key in pair if key]
+        ))
+        if not keys:
+            return 0
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                # Take the write lock up front so concurrent pages can't hand out the same ID
+                cursor.execute('BEGIN IMMEDIATE')
+                ids = self._lookup(cursor, keys)
+                cursor.execute('SELECT COALESCE(MAX(property_id), 0) FROM property_sources')
+                next_id = cursor.fetchone()[0] + 1
+                new = {}
+
+                for dropped, match in links:
+                    if not dropped or not match:
+                        continue
+                    property_id = ids.get(match) or ids.get(dropped)
+                    if property_id is None:
+                        property_id = next_id
+                        next_id += 1
+                    for key in (dropped, match):
+                        if key not in ids:
+                            ids[key] = new[key] = property_id
+
+                for key in keys:
+                    if key not in ids:
+                        ids[key] = new[key] = next_id
+                        next_id += 1
+
+                cursor.executemany(
+                    'INSERT INTO property_sources (source, source_key, property_id) VALUES (?, ?, ?)',
+                    [(source, key, property_id) for (source, key), property_id in new.items()]
+                )
+                conn.commit()
+        except Exception as e:
+            logger.error("Error assigning property IDs: %s", str(e))
+            return 0
+
+        for listing, key in keyed:
+            if key:
+                listing['id'] = ids[key]
+        return len(new)
+
+    def lookup(self, listing):
+        """The property ID registered for a listing, or None"""
+        key = source_key(listing)
+        if not key:
+            return None
+        with self._connect() as conn:
+            return self._lookup(conn.cursor(), [key]).get(key)
+
+
+# Global instance
+property_registry = PropertyRegistry()
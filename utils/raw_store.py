@@ -0,0 +1,113 @@
+"""
+Raw upstream page store
+
+Keeps the HTML of every page we bought from a scraping provider, zlib
+compressed and keyed by the upstream URL, so cached results can be rebuilt
+with a fixed parser instead of paying for the page again (see reparse_cache.py).
+Page bodies are stored once per content hash, so identical responses for
+different URLs share a row.
+"""
+import hashlib
+import os
+import zlib
+from utils.logger import logger
+from utils.sqlite_pool import SQLiteStore, connection
+
+
+class RawPageStore(SQLiteStore):
+    """Compressed, content-addressed store of raw upstream responses"""
+
+    def __init__(self, db_path=None):
+        super().__init__(db_path)
+        self.ttl_hours = float(os.getenv('RAW_PAGE_TTL_HOURS', '72'))
+        self.compression_level = int(os.getenv('RAW_PAGE_COMPRESSION_LEVEL', '6'))
+        self.enabled = os.getenv('RAW_PAGE_STORE', 'true').lower() == 'true'
+
+    def init_db(self):
+        """Create the raw page tables if they don't exist"""
+        with connection(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS raw_blobs (
+                    content_hash TEXT PRIMARY KEY,
+                    content BLOB NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS raw_pages (
+                    url_hash TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_raw_pages_fetched ON raw_pages(fetched_at)')
+            conn.commit()
+
+    @staticmethod
+    def url_hash(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def save(self, url, html):
+        """Store the raw HTML (text or bytes) for an upstream URL, replacing any older copy"""
+        if not self.enabled or not html:
+            return
+        try:
+            raw = html if isinstance(html, bytes) else html.encode('utf-8')
+            content_hash = hashlib.sha256(raw).hexdigest()
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'INSERT OR IGNORE INTO raw_blobs (content_hash, content) VALUES (?, ?)',
+                    (content_hash, zlib.compress(raw, self.compression_level))
+                )
+                cursor.execute('''
+                    INSERT OR REPLACE INTO raw_pages (url_hash, url, content_hash, fetched_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (self.url_hash(url), url, content_hash))
+                conn.commit()
+        except Exception as e:
+            logger.error("Error storing raw page for %s: %s", url, str(e))
+
+    def get(self, url):
+        """Return the stored HTML for an upstream URL if it is within the TTL"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT b.content
+                    FROM raw_pages p JOIN raw_blobs b ON b.content_hash = p.content_hash
+                    WHERE p.url_hash = ?
+                    AND p.fetched_at > datetime('now', ?)
+                ''', (self.url_hash(url), f'-{self.ttl_hours} hours'))
+                row = cursor.fetchone()
+            if row is None:
+                return None
+            return zlib.decompress(row[0]).decode('utf-8', errors='replace')
+        except Exception as e:
+            logger.error("Error reading raw page for %s: %s", url, str(e))
+            return None
+
+    def cleanup(self, max_age_hours=None):
+        """Drop pages older than the TTL and any blobs no page points at"""
+        max_age_hours = self.ttl_hours if max_age_hours is None else max_age_hours
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM raw_pages WHERE fetched_at <= datetime('now', ?)",
+                               (f'-{max_age_hours} hours',))
+                deleted_pages = cursor.rowcount
+                cursor.execute('''
+                    DELETE FROM raw_blobs
+                    WHERE content_hash NOT IN (SELECT content_hash FROM raw_pages)
+                ''')
+                conn.commit()
+            logger.info(f"Cleaned up {deleted_pages} raw pages")
+            return deleted_pages
+        except Exception as e:
+            logger.error(f"Error cleaning up raw pages: {str(e)}")
+            return 0
+
+
+# Global instance
+raw_page_store = RawPageStore()
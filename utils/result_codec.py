@@ -0,0 +1,78 @@
+"""
+Cached result payloads
+
+A cached page is stored as a BLOB: one format byte followed by its JSON,
+compressed with zlib, or with zstd when the zstandard package is installed and
+CACHE_COMPRESSION=zstd. A page of listings is mostly repeated keys, addresses
+and image URLs, so it compresses several times over. Rows cached before
+payloads were compressed hold plain JSON text and are still read as they are;
+compress_cache.py rewrites them in the current format.
+"""
+import os
+import zlib
+from utils.listing import dumps, loads
+from utils.logger import logger
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is used instead
+    zstandard = None
+
+# Format byte at the start of every encoded payload
+FORMAT_JSON = 0
+FORMAT_ZLIB = 1
+FORMAT_ZSTD = 2
+
+CODECS = {'none': FORMAT_JSON, 'zlib': FORMAT_ZLIB, 'zstd': FORMAT_ZSTD}
+DEFAULT_LEVELS = {'none': 0, 'zlib': 6, 'zstd': 3}
+
+
+class ResultCodec:
+    """Encode results for the listings table and decode any stored format"""
+
+    def __init__(self, codec=None, level=None):
+        codec = (codec or os.getenv('CACHE_COMPRESSION', 'zlib')).lower()
+        if codec not in CODECS:
+            raise ValueError(f"Unknown cache compression: {codec}")
+        if codec == 'zstd' and zstandard is None:
+            logger.warning("CACHE_COMPRESSION=zstd but zstandard is not installed; using zlib")
+            codec = 'zlib'
+        if level is None:
+            level = os.getenv('CACHE_COMPRESSION_LEVEL') or DEFAULT_LEVELS[codec]
+        self.codec = codec
+        self.format = CODECS[codec]
+        self.level = int(level)
+
+    def encode(self, results):
+        """Format byte + (compressed) JSON bytes"""
+        body = dumps(results)
+        if self.format == FORMAT_ZLIB:
+            body = zlib.compress(body, self.level)
+        elif self.format == FORMAT_ZSTD:
+            body = zstandard.ZstdCompressor(level=self.level).compress(body)
+        return bytes([self.format]) + body
+
+    @staticmethod
+    def decode(value):
+        """Results from a stored payload, whichever format wrote it"""
+        if isinstance(value, str) or value[:1] in (b'{', b'['):
+            # Plain JSON from before payloads had a format byte
+            return loads(value)
+        fmt, body = value[0], value[1:]
+        if fmt == FORMAT_ZLIB:
+            body = zlib.decompress(body)
+        elif fmt == FORMAT_ZSTD:
+            if zstandard is None:
+                raise ValueError("Cached result is zstd compressed but zstandard is not installed")
+            body = zstandard.ZstdDecompressor().decompress(body)
+        elif fmt != FORMAT_JSON:
+            raise ValueError(f"Unknown cached result format: {fmt}")
+        return loads(body)
+
+    def is_current(self, value):
+        """Whether a stored payload already uses this codec"""
+        return isinstance(value, bytes) and value[:1] == bytes([self.format])
+
+
+# Global instance
+result_codec = ResultCodec()
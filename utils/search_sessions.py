@@ -0,0 +1,106 @@
+"""
+Per-search dedup state for combined "load more"
+
+A combined search hands the browser an opaque session token. Every later page
+of that search is filtered against the listings the session has already
+returned, so a home Rightmove shows on page 2 and Zoopla on page 3 is sent
+once, and the browser never posts its history back.
+
+Sessions are kept in memory, expire SEARCH_SESSION_TTL_MINUTES after their
+last use, and at most SEARCH_SESSION_MAX are held (the least recently used go
+first). A session remembers at most SEARCH_SESSION_MAX_LISTINGS listings;
+past that, pages are still filtered against what it holds but add nothing.
+"""
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from utils.dedup import DedupIndex, FuzzyDedupIndex
+from utils.logger import logger
+
+
+class SearchSession:
+    """Listings already returned for one search"""
+    __slots__ = ("search", "index", "remembered", "last_used")
+
+    def __init__(self, search, index):
+        self.search = search
+        self.index = index
+        self.remembered = 0
+        self.last_used = time.monotonic()
+
+
+class SearchSessionStore:
+    """Bounded, expiring map of session token to SearchSession"""
+
+    def __init__(self, ttl_minutes=None, max_sessions=None, max_listings=None, index_factory=None):
+        self.ttl = 60 * float(ttl_minutes if ttl_minutes is not None else os.getenv('SEARCH_SESSION_TTL_MINUTES', '30'))
+        self.max_sessions = int(max_sessions if max_sessions is not None else os.getenv('SEARCH_SESSION_MAX', '500'))
+        self.max_listings = int(max_listings if max_listings is not None
+                                else os.getenv('SEARCH_SESSION_MAX_LISTINGS', '2000'))
+        if index_factory is None:
+            fuzzy = os.getenv('FUZZY_DEDUP', 'true').lower() == 'true'
+            index_factory = FuzzyDedupIndex if fuzzy else DedupIndex
+        self.index_factory = index_factory
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def _expire(self, now):
+        """Drop idle sessions, then the least recently used ones over the limit"""
+        sessions = self._sessions
+        while sessions:
+            token, session = next(iter(sessions.items()))
+            if now - session.last_used < self.ttl and len(sessions) <= self.max_sessions:
+                break
+            del sessions[token]
+
+    def _remember(self, session, listings):
+        """The listings the session hasn't returned yet, remembering them while there is room"""
+        index = session.index
+        if session.remembered >= self.max_listings:
+            return [listing for listing in listings if not index.is_duplicate(listing)]
+        unseen = index.add_all(listings)
+        session.remembered += len(unseen)
+        if session.remembered >= self.max_listings:
+            logger.info("[SearchSession] Session is full at %d listings", session.remembered)
+        return unseen
+
+    def create(self, listings=(), search=None):
+        """Start a session that has returned these listings. Returns its token"""
+        token = secrets.token_urlsafe(16)
+        session = SearchSession(search, self.index_factory())
+        with self._lock:
+            self._remember(session, listings)
+            self._sessions[token] = session
+            self._expire(session.last_used)
+        return token
+
+    def filter(self, token, listings, search=None):
+        """(token, unseen listings) for the next page of a search.
+
+        An unknown or expired token, or one from a different search, starts a
+        new session holding this page, so the caller should keep the token
+        returned rather than the one it sent.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(token) if token else None
+            if session is None or session.search != search:
+                token = secrets.token_urlsafe(16)
+                session = SearchSession(search, self.index_factory())
+                self._sessions[token] = session
+                self._expire(now)
+            else:
+                self._sessions.move_to_end(token)
+            session.last_used = now
+            return token, self._remember(session, listings)
+
+
+# Global instance
+search_sessions = SearchSessionStore()
@@ -2,6 +2,7 @@
 Security utilities for rate limiting and API protection
 """
 import os
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, Optional
 from utils.logger import logger
@@ -16,52 +17,77 @@ class ScraperAPIMonitor:
         self.daily_limit = int(os.getenv('MAX_REQUESTS_PER_DAY', '1000'))
         self.hourly_limit = int(os.getenv('MAX_REQUESTS_PER_HOUR', '100'))
         self.hourly_requests = []
+        # Hedged requests (duplicate fetches fired for slow pages) are capped
+        # at a fraction of the daily budget
+        self.hedged_today = 0
+        self.hedge_budget_fraction = float(os.getenv('HEDGE_BUDGET_FRACTION', '0.1'))
+        # Request threads and the HTTP client loop both update the counters;
+        # reentrant because reserve_hedge checks and records under one hold
+        self._lock = threading.RLock()
         
     def check_limits(self) -> tuple[bool, Optional[str]]:
         """Check if we're within usage limits"""
-        # Reset daily counter if it's a new day
-        today = datetime.now().date()
-        if today > self.last_reset:
-            self.requests_today = 0
-            self.last_reset = today
-            logger.info("ScraperAPI daily counter reset")
+        with self._lock:
+            # Reset daily counter if it's a new day
+            today = datetime.now().date()
+            if today > self.last_reset:
+                self.requests_today = 0
+                self.hedged_today = 0
+                self.last_reset = today
+                logger.info("ScraperAPI daily counter reset")
         
-        # Check daily limit
-        if self.requests_today >= self.daily_limit:
-            logger.warning(f"Daily ScraperAPI limit reached: {self.requests_today}/{self.daily_limit}")
-            return False, f"Daily API limit reached ({self.daily_limit} requests). Try again tomorrow."
+            # Check daily limit
+            if self.requests_today >= self.daily_limit:
+                logger.warning(f"Daily ScraperAPI limit reached: {self.requests_today}/{self.daily_limit}")
+                return False, f"Daily API limit reached ({self.daily_limit} requests). Try again tomorrow."
         
-        # Check hourly limit
-        now = datetime.now()
-        one_hour_ago = now - timedelta(hours=1)
-        self.hourly_requests = [req for req in self.hourly_requests if req > one_hour_ago]
+            # Check hourly limit
+            now = datetime.now()
+            one_hour_ago = now - timedelta(hours=1)
+            self.hourly_requests = [req for req in self.hourly_requests if req > one_hour_ago]
         
-        if len(self.hourly_requests) >= self.hourly_limit:
-            logger.warning(f"Hourly ScraperAPI limit reached: {len(self.hourly_requests)}/{self.hourly_limit}")
-            return False, f"Hourly API limit reached ({self.hourly_limit} requests). Try again later."
+            if len(self.hourly_requests) >= self.hourly_limit:
+                logger.warning(f"Hourly ScraperAPI limit reached: {len(self.hourly_requests)}/{self.hourly_limit}")
+                return False, f"Hourly API limit reached ({self.hourly_limit} requests). Try again later."
         
-        return True, None
+            return True, None
     
     def record_request(self):
         """Record a new API request"""
-        self.requests_today += 1
-        self.hourly_requests.append(datetime.now())
-        logger.info(f"ScraperAPI request recorded. Daily: {self.requests_today}, Hourly: {len(self.hourly_requests)}")
+        with self._lock:
+            self.requests_today += 1
+            self.hourly_requests.append(datetime.now())
+            logger.info(f"ScraperAPI request recorded. Daily: {self.requests_today}, Hourly: {len(self.hourly_requests)}")
     
+    def reserve_hedge(self) -> bool:
+        """Reserve budget for a hedged request, recording it if allowed"""
+        with self._lock:
+            can_proceed, _ = self.check_limits()
+            hedge_limit = int(self.daily_limit * self.hedge_budget_fraction)
+            if not can_proceed or self.hedged_today >= hedge_limit:
+                logger.info(f"Hedge budget exhausted: {self.hedged_today}/{hedge_limit}")
+                return False
+            self.hedged_today += 1
+            self.record_request()
+            return True
+
     def get_usage_stats(self) -> Dict:
         """Get current usage statistics"""
-        now = datetime.now()
-        one_hour_ago = now - timedelta(hours=1)
-        hourly_count = len([req for req in self.hourly_requests if req > one_hour_ago])
+        with self._lock:
+            now = datetime.now()
+            one_hour_ago = now - timedelta(hours=1)
+            hourly_count = len([req for req in self.hourly_requests if req > one_hour_ago])
         
-        return {
-            'daily_requests': self.requests_today,
-            'daily_limit': self.daily_limit,
-            'hourly_requests': hourly_count,
-            'hourly_limit': self.hourly_limit,
-            'daily_remaining': self.daily_limit - self.requests_today,
-            'hourly_remaining': self.hourly_limit - hourly_count
-        }
+            return {
+                'daily_requests': self.requests_today,
+                'daily_limit': self.daily_limit,
+                'hourly_requests': hourly_count,
+                'hourly_limit': self.hourly_limit,
+                'daily_remaining': self.daily_limit - self.requests_today,
+                'hourly_remaining': self.hourly_limit - hourly_count,
+                'hedged_requests': self.hedged_today,
+                'hedge_limit': int(self.daily_limit * self.hedge_budget_fraction)
+            }
 
 # Global instance
 scraper_api_monitor = ScraperAPIMonitor()
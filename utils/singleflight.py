@@ -0,0 +1,95 @@
+"""
+Single-flight request coalescing
+
+Concurrent callers asking for the same search share one upstream fetch instead
+of each spending ScraperAPI credits. Flask runs every async view on its own
+event loop and thread, so in-flight calls are tracked with thread-safe
+concurrent futures that any loop can await.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from utils.logger import logger
+
+
+def search_key(site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, page=1, sort_by="newest"):
+    """Build a canonical key for a search so equivalent parameters coalesce"""
+    def clean(value):
+        if value is None:
+            return ""
+        value = str(value).strip().lower()
+        return "" if value == "0" else value
+
+    params = [site, location, min_price, max_price, min_beds, max_beds, keywords, listing_type, sort_by or "newest"]
+    canonical = json.dumps([clean(param) for param in params] + [int(page or 1)])
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+class LeaderCancelled(Exception):
+    """The call a follower joined was cancelled with its caller's request"""
+
+
+class SingleFlight:
+    """Run at most one call per key at a time and share its result"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced_count = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs), or join an identical call already in flight"""
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.coalesced_count += 1
+
+        if not is_leader:
+            logger.info("[SingleFlight] Joining in-flight call %s", key[:12])
+            try:
+                # Shield so a cancelled follower doesn't cancel the shared future
+                result = await asyncio.shield(asyncio.wrap_future(future))
+            except LeaderCancelled:
+                # Our own request is still live: run the call, or join whoever
+                # got there first
+                logger.info("[SingleFlight] In-flight call %s was cancelled, retrying", key[:12])
+                return await self.do(key, fn, *args, **kwargs)
+            return copy.deepcopy(result)
+
+        # The key is released before the future resolves, so a follower
+        # retrying after a cancellation starts a new call instead of rejoining
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            self._release(key, future)
+            future.set_exception(e)
+            raise
+        except BaseException:
+            self._release(key, future)
+            future.set_exception(LeaderCancelled(key))
+            raise
+        self._release(key, future)
+        future.set_result(result)
+        # Callers decorate their results, so nobody gets the shared object
+        return copy.deepcopy(result)
+
+    def _release(self, key, future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def in_flight(self):
+        """Number of distinct calls currently running"""
+        with self._lock:
+            return len(self._calls)
+
+
+# Global instance
+singleflight = SingleFlight()
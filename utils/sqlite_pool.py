@@ -0,0 +1,152 @@
+"""
+Pooled SQLite connections
+
+Opening a connection per query costs a file open and a schema read on every
+cache hit, and with the default rollback journal a writer blocks every
+reader. connection(db_path) instead lends out a long-lived connection to the
+file for the length of a with block, committing on success and rolling back
+on error just like `with sqlite3.connect(...) as conn`, and takes it back
+afterwards (never call close() on it).
+
+Connections are opened in WAL mode, so readers and a writer don't block each
+other, with synchronous=NORMAL (safe under WAL; only the last commits can be
+lost on power failure), a larger page cache, memory-mapped reads and a busy
+timeout instead of failing at once on a locked database.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """Idle connections to one SQLite file, shared between threads"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.max_idle = int(os.getenv('SQLITE_POOL_SIZE', '8'))
+        self.busy_timeout = float(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')) / 1000
+        self.wal = os.getenv('SQLITE_WAL', 'true').lower() == 'true'
+        self.cache_size_kb = int(os.getenv('SQLITE_CACHE_SIZE_KB', '8192'))
+        self.mmap_size = int(os.getenv('SQLITE_MMAP_SIZE_MB', '64')) * 2 ** 20
+        self.opened = 0
+        self._idle = []
+        self._file_id = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+        if self.wal:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{self.cache_size_kb}')
+        conn.execute(f'PRAGMA mmap_size={self.mmap_size}')
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def _current_file(self):
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def _acquire(self):
+        file_id = self._current_file()
+        with self._lock:
+            if file_id != self._file_id:
+                # The file was replaced or deleted (e.g. restored from a backup);
+                # pooled connections would still point at the old one
+                stale, self._idle = self._idle, []
+                self._file_id = None
+                self._generation += 1
+            else:
+                stale = []
+            conn = self._idle.pop() if self._idle else None
+            generation = self._generation
+        for old in stale:
+            old.close()
+        if conn is None:
+            conn = self._open()
+            with self._lock:
+                # The first open creates the file
+                self._file_id = self._file_id or self._current_file()
+        return conn, generation
+
+    def _release(self, conn, generation):
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = None
+        with self._lock:
+            if generation == self._generation and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn, generation = self._acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._release(conn, generation)
+
+    def close(self):
+        """Close the idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def database_path():
+    """The app's database file: DATABASE_PATH, or listings.db in the working directory"""
+    return os.getenv('DATABASE_PATH', 'listings.db')
+
+
+def get_pool(db_path):
+    """The pool for a database file, created on first use"""
+    path = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+
+def connection(db_path):
+    """A pooled connection to db_path for a with block"""
+    return get_pool(db_path).connection()
+
+
+class SQLiteStore:
+    """Base for classes keeping their tables in the app database.
+
+    Subclasses create their tables in init_db(), which runs on the first
+    _connect() rather than at construction, so importing a module with a
+    global instance doesn't touch the file.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or database_path()
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def init_db(self):
+        raise NotImplementedError
+
+    def _connect(self):
+        """Pooled connection, running init_db first if it hasn't run yet"""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self.init_db()
+                    self._initialized = True
+        return connection(self.db_path)
@@ -1,6 +1,6 @@
 import sqlite3
 from datetime import datetime
-import json
+from utils.result_codec import result_codec
 
 def view_cache():
     conn = sqlite3.connect('listings.db')
@@ -23,7 +23,7 @@ def view_cache():
     
     for row in results:
         site, location, min_price, max_price, min_beds, max_beds, \
-        keywords, listing_type, page_number, created_at, results_json = row
+        keywords, listing_type, page_number, created_at, payload = row
         
         # Create a key for this search combination
         combo_key = f"{site}_{location}_{min_price}_{max_price}_{min_beds}_{max_beds}_{listing_type}"
@@ -42,11 +42,11 @@ def view_cache():
             }
         
         try:
-            data = json.loads(results_json)
+            data = result_codec.decode(payload)
             listings = data.get('listings', [])
             search_combinations[combo_key]['pages'].add(page_number)
             search_combinations[combo_key]['total_listings'] += len(listings)
-        except json.JSONDecodeError:
+        except ValueError:
             print(f"Error decoding JSON for {site} - {location} page {page_number}")
     
     # Print summary for each search combination
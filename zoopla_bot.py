@@ -5,7 +5,8 @@ import time
 from datetime import datetime
 from dotenv import load_dotenv
 from scrapers.zoopla import scrape_zoopla_first_page, scrape_zoopla_page
-from scrapers.proxy_rotator import ProxyRotator
+from scrapers.proxy_rotator import get_proxy_rotator
+from scrapers.parser_version import parser_version_for
 from utils.database import Database
 from utils.logger import logger
 
@@ -15,7 +16,7 @@ load_dotenv()
 class ZooplaBot:
     def __init__(self):
         self.db = Database()
-        self.proxy_rotator = ProxyRotator()
+        self.proxy_rotator = get_proxy_rotator()
         self.max_retries = 3
         self.retry_delay = 5
         self.max_pages = 247  # Maximum pages to scrape per combination
@@ -125,7 +126,8 @@ class ZooplaBot:
                 keywords=keywords,
                 listing_type=listing_type,
                 page_number=page,
-                results=structured_results
+                results=structured_results,
+                parser_version=parser_version_for("Zoopla")
             )
             
             return structured_results